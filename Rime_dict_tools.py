@@ -2,9 +2,13 @@ import tkinter as tk
 from tkinter import messagebox, filedialog
 from tkinter import ttk
 import os
-import re
 import subprocess
+import sys
 import configparser
+from concurrent.futures import ProcessPoolExecutor
+
+import rime_dict
+from rime_dict.virtual_tree import VirtualTreeview
 
 
 
@@ -36,9 +40,25 @@ def load_config():
     return []
 
 
+def load_deploy_command():
+    """配置文件 [Deploy] 节中的部署命令，没有时返回 None（使用环境变量或小狼毫的部署程序）"""
+    config = configparser.ConfigParser()
+    if os.path.exists(config_path):
+        try:
+            config.read(config_path)
+        except configparser.Error:
+            return None
+    return config.get("Deploy", "command", fallback=None) or None
+
+
 def save_config(dictionaries):
-    """保存配置文件"""
+    """保存配置文件（保留其他节，如 [Deploy]）"""
     config = configparser.ConfigParser()
+    if os.path.exists(config_path):
+        try:
+            config.read(config_path)
+        except configparser.Error:
+            config = configparser.ConfigParser()
     config["Dictionaries"] = {
         # 将词典文件路径存储为以 | 分隔的字符串
         "paths": "|".join(dictionaries)
@@ -60,210 +80,340 @@ def get_latest_dict(dictionaries):
     return latest_dict
 
 
-def load_dict_entries(dict_path, switch_order=False, enable_code2=False):
-    """加载词典文件中的词、编码、编码2和权重，并提取文件头部（包括分隔符如 '...' 及其之前的所有内容）"""
-    if not os.path.exists(dict_path):
-        print(f"词典文件不存在: {dict_path}")  # 调试信息
-        return [], "", ""
+# 当前打开的词典模型
+current_model = None
+# 编辑后自动保存的延迟（毫秒）
+AUTOSAVE_DELAY_MS = 2000
+# 修改先记入词典旁的 .journal 日志，保存前程序退出也能在下次打开时恢复
+USE_EDIT_JOURNAL = True
+# 撤销历史在保存后写入词典旁的 .history 文件，重新打开词典后仍可撤销
+PERSIST_UNDO_HISTORY = True
+# 解析结果缓存，设置环境变量 RIME_DICT_NO_CACHE=1 可跳过
+parse_cache = rime_dict.ParseCache() if rime_dict.cache_enabled() else None
+autosave_job = None
+# 表格中显示的是跨词典查询结果 (词典路径, 词条) 而不是当前词典的词条编号
+showing_search_all = False
+# 跨词典查询用的进程池，第一次使用时创建
+process_pool = None
+# 检查词典文件是否被其他程序修改的间隔（毫秒）
+WATCH_INTERVAL_MS = 1000
+file_watcher = None
+# 输入查询内容后停顿多久开始即时查询（毫秒）
+SEARCH_DELAY_MS = 250
+search_job = None
+# 当前词典通过 import_tables 导入的词典；导入的词典第一次查询时才加载，加载结果在切换词典后仍可复用
+current_graph = None
+table_cache = rime_dict.TableCache()
+# 编辑后停顿多久自动部署（毫秒）；每次编辑重新计时，连续编辑只部署一次
+DEPLOY_DELAY_MS = 30000
+deploy_job = None
+# 上次部署成功时各词典的内容哈希，内容没有变化时跳过部署
+deploy_state = rime_dict.DeployState()
+# 开启性能记录（环境变量 RIME_DICT_PROFILE 或命令行参数 --profile）时刷新耗时显示的间隔（毫秒）
+PROFILE_INTERVAL_MS = 500
+shown_profile_record = None
+
+
+def set_status(text):
+    """在状态栏显示当前状态"""
+    label_status.config(text=text)
+
+
+def show_profile():
+    """在状态栏下方显示最近一次计时的耗时和内存峰值"""
+    global shown_profile_record
+    record = rime_dict.profiler.latest()
+    if record is not None and record is not shown_profile_record:
+        shown_profile_record = record
+        label_profile.config(text=rime_dict.format_record(record))
+    root.after(PROFILE_INTERVAL_MS, show_profile)
+
+
+def progress_reporter(prefix):
+    """把后台任务的进度（小数或文字）显示到状态栏"""
+    def report(progress):
+        if isinstance(progress, float):
+            set_status(f"{prefix} {int(progress * 100)}%")
+        else:
+            set_status(progress)
+    return report
+
+
+def get_dict_model(dict_path):
+    """返回已加载的词典模型；尚未加载或正在后台加载时返回 None"""
+    model = current_model
+    if (model is not None and model.dict_path == dict_path and model.enable_code2 == enable_code2.get()
+            and model.read_only == browse_mode.get()):
+        model.switch_order = switch_order.get()
+        return model
+    return None
+
+
+def require_dict_model(dict_path, editable=False):
+    """获取已加载的词典模型，没有时提示用户；editable 为真时只读浏览的词典也视为没有"""
+    model = get_dict_model(dict_path)
+    if model is None:
+        if task_runner.busy("load"):
+            messagebox.showinfo("提示", "词典正在加载，请稍候")
+        else:
+            messagebox.showwarning("警告", "请选择有效的词典文件")
+    elif editable and model.read_only:
+        messagebox.showinfo("提示", "只读浏览模式下不能修改词典，请先取消勾选“只读浏览”")
+        return None
+    return model
 
-    entries = []
-    header = ""
-    first_entry = ""  # 第一条词条
-    
-    # 尝试不同的编码方式读取文件
-    encodings = ['utf-8', 'gbk', 'gb18030', 'utf-16']
-    content = None
-    
-    for encoding in encodings:
-        try:
-            with open(dict_path, "r", encoding=encoding) as f:
-                content = f.read()
-                break  # 如果成功读取，跳出循环
-        except UnicodeDecodeError:
-            continue
-    
-    if content is None:
-        messagebox.showerror("错误", "无法正确读取文件，请检查文件编码")
-        return [], "", ""
 
-    # 处理文件内容
-    lines = content.splitlines()
-    header_found = False
-    
-    # 根据文件扩展名判断处理方式
-    file_ext = os.path.splitext(dict_path)[1].lower()
-    
-    # 处理头部和词条
-    for line in lines:
-        if not header_found:
-            if file_ext == '.yaml' and line.strip() == "...":  # YAML 格式使用 ... 分隔
-                header += line + "\n"
-                header_found = True
-            elif file_ext == '.txt':  # TXT 格式直接处理词条
-                if line.startswith('#'):  # 保存注释作为头部
-                    header += line + "\n"
-                else:
-                    header_found = True
-                    # 不跳过当前行，继续处理
-                    if line.strip() and not line.strip().startswith("#"):
-                        parts = line.strip().split("\t")
-                        if len(parts) >= 2:
-                            word = parts[0].strip()
-                            second_field = parts[1].strip()
-                            if re.match(r"^\d+$", second_field):
-                                weight = second_field
-                                code = parts[2].strip() if len(parts) >= 3 else ""
-                                code2 = parts[3].strip() if len(parts) >= 4 and enable_code2 else ""
-                            else:
-                                code = second_field
-                                weight = parts[2].strip() if len(parts) >= 3 else "100"
-                                code2 = parts[3].strip() if len(parts) >= 4 and enable_code2 else ""
-                            entry = (word, weight, code, code2) if switch_order else (word, code, weight, code2)
-                            entries.append(entry)
-                            if not first_entry:
-                                first_entry = "\t".join(entry)
-            continue
-        
-        # 处理非头部内容
-        if line.strip() and not line.strip().startswith("#"):
-            parts = line.strip().split("\t")
-            if len(parts) >= 2:
-                word = parts[0].strip()
-                second_field = parts[1].strip()
-                if re.match(r"^\d+$", second_field):
-                    weight = second_field
-                    code = parts[2].strip() if len(parts) >= 3 else ""
-                    code2 = parts[3].strip() if len(parts) >= 4 and enable_code2 else ""
-                else:
-                    code = second_field
-                    weight = parts[2].strip() if len(parts) >= 3 else "100"
-                    code2 = parts[3].strip() if len(parts) >= 4 and enable_code2 else ""
-                entry = (word, weight, code, code2) if switch_order else (word, code, weight, code2)
-                entries.append(entry)
-                if not first_entry:
-                    first_entry = "\t".join(entry)
-
-    return entries, header, first_entry
-
-
-def save_dict_entries(dict_path, new_entries, header="", append=False, switch_order=False, enable_code2=False):
-    """保存词典条目到文件，先写入文件头部，再追加词条"""
-    mode = "w"  # 总是覆盖模式，先写入文件头部
-    with open(dict_path, mode, encoding="utf-8") as f:
-        # 写入文件头部
-        if header:
-            f.write(header)
-        # 写入词条
-        for entry in new_entries:
-            if switch_order:
-                # 切换次序：词汇 权重 编码 编码2
-                if enable_code2:
-                    f.write(f"{entry[0]}\t{entry[1]}\t{entry[2]}\t{entry[3]}\n")
-                else:
-                    f.write(f"{entry[0]}\t{entry[1]}\t{entry[2]}\n")
+def set_edit_buttons(model):
+    """只读浏览时禁用修改词典的按钮"""
+    state = tk.DISABLED if model is not None and model.read_only else tk.NORMAL
+    for button in (button_add, button_modify, button_delete, button_import, button_sort, button_save,
+                   button_undo, button_redo):
+        button.config(state=state)
+
+
+def load_dict_model(dict_path, on_loaded=None):
+    """在后台线程加载词典并建立索引，完成后显示全部词条
+
+    勾选“只读浏览”时改为映射文件，只建立行偏移索引，适合浏览和查询很大的基础词典。
+    """
+    if browse_mode.get():
+        model = rime_dict.MappedDict(dict_path, switch_order=switch_order.get(), enable_code2=enable_code2.get())
+    else:
+        model = rime_dict.DictModel(dict_path, switch_order=switch_order.get(), enable_code2=enable_code2.get(),
+                                    journal=USE_EDIT_JOURNAL, cache=parse_cache,
+                                    persist_history=PERSIST_UNDO_HISTORY)
+
+    def load_task(task):
+        model.load(progress=task.report)
+        if not model.read_only:
+            task.report("正在建立索引...")
+            model.build_indexes()
+        # 只读取各词典的头部，解析 import_tables 的导入关系
+        return model, rime_dict.DictGraph(dict_path, cache=table_cache, enable_code2=model.enable_code2)
+
+    def on_done(result):
+        global current_model, current_graph
+        model, current_graph = result
+        previous = current_model
+        current_model = model
+        if previous is not None and previous.read_only:
+            # 表格马上改为显示新词典，可以释放旧的映射
+            show_entries(None, [])
+            previous.close()
+        elif previous is not None and previous is not model:
+            # 整理旧词典的撤销历史文件
+            task_runner.submit(lambda task: previous.close_history())
+        set_edit_buttons(model)
+        watch_dict_file(model.dict_path)
+        show_all_entries(model)
+        set_status(f"已加载 {len(model)} 条词条")
+        if model.replayed:
+            schedule_autosave()
+            messagebox.showinfo("提示", f"已从编辑日志恢复 {model.replayed} 条上次未保存的修改")
+        if on_loaded is not None:
+            on_loaded(model)
+
+    def on_error(e):
+        set_status("")
+        if isinstance(e, rime_dict.DictEncodingError):
+            messagebox.showerror("错误", "无法正确读取文件，请检查文件编码")
+        else:
+            messagebox.showerror("错误", f"加载失败: {str(e)}")
+
+    set_status("正在加载...")
+    task_runner.submit(load_task, on_done=on_done, on_error=on_error,
+                       on_progress=progress_reporter("正在加载"), group="load")
+
+
+def watch_dict_file(dict_path):
+    """开始监视当前词典文件，第一次调用时启动定时检查"""
+    global file_watcher
+    first = file_watcher is None
+    if file_watcher is not None:
+        file_watcher.close()
+    file_watcher = rime_dict.create_watcher(dict_path)
+    if first:
+        root.after(WATCH_INTERVAL_MS, check_dict_file)
+
+
+def check_dict_file():
+    """定时检查：文件被其他程序修改时在后台同步，末尾追加的词条直接并入"""
+    root.after(WATCH_INTERVAL_MS, check_dict_file)
+    model = current_model
+    # 加载或同步进行中时先不取事件，留到下次检查，否则这次变化会被当作已处理而不再重新加载
+    if model is None or file_watcher is None or task_runner.busy("load") or task_runner.busy("sync"):
+        return
+    if not file_watcher.changed():
+        return
+
+    def on_done(result):
+        status, count = result
+        if model is not current_model:
+            return
+        if status == "appended":
+            show_all_entries(model)
+            set_status(f"已载入其他程序追加的 {count} 条词条")
+        elif status == "reloaded":
+            show_all_entries(model)
+            set_status(f"词典文件已被其他程序修改，已重新加载 {count} 条词条")
+        elif status == "conflict":
+            resolve_conflict(model)
+        elif status == "missing":
+            set_status("词典文件已被删除或移走")
+
+    task_runner.submit(lambda task: model.sync_with_file(), on_done=on_done,
+                       on_error=lambda e: set_status(f"同步失败: {e}"), group="sync")
+
+
+def resolve_conflict(model, wait=False):
+    """文件被其他程序修改而内存中还有未保存的修改时，由用户选择保留哪一方"""
+    choice = messagebox.askyesnocancel(
+        "文件冲突", f"词典文件已被其他程序修改，而当前还有未保存的修改。\n{model.dict_path}",
+        detail="选择 '是' 重新加载文件（放弃本地修改），'否' 用本地内容覆盖文件，'取消' 暂不处理。")
+    if choice is None:
+        set_status("未保存：词典文件有冲突")
+        return
+    if wait:
+        # 关闭窗口时同步处理；放弃本地修改时清掉编辑日志即可，不必重新加载
+        try:
+            if choice:
+                if model.journal is not None:
+                    model.journal.clear()
             else:
-                # 默认次序：词汇 编码 权重 编码2
-                if enable_code2:
-                    f.write(f"{entry[0]}\t{entry[1]}\t{entry[2]}\t{entry[3]}\n")
-                else:
-                    f.write(f"{entry[0]}\t{entry[1]}\t{entry[2]}\n")
-
-
-def check_existing_code(code, dict_path):
-    """检查是否存在相同编码的词，并返回其行号和权重"""
-    entries, _, _ = load_dict_entries(dict_path)
-    for i, entry in enumerate(entries):
-        if entry[1] == code:
-            return i, entry[2]  # 返回权重
-    return None, None
-
-
-def add_word_to_rime(word, code, code2, weight, dict_path, switch_order=False, enable_code2=False):
-    """添加新词或更新已有词的权重"""
-    entries, header, _ = load_dict_entries(dict_path, switch_order, enable_code2)
-    if enable_code2:
-        entries.append((word, code, str(weight), code2))  # 确保编码2被添加
+                model.save(force=True)
+        except OSError as e:
+            messagebox.showerror("错误", f"保存失败: {str(e)}")
+        return
+
+    def on_done(_):
+        if model is current_model:
+            show_all_entries(model)
+        set_status("已重新加载" if choice else "已覆盖保存")
+
+    def on_error(e):
+        messagebox.showerror("错误", f"处理冲突失败: {str(e)}")
+
+    task = model.revert if choice else lambda: model.save(force=True)
+    task_runner.submit(lambda _: task(), on_done=on_done, on_error=on_error, group="sync")
+
+
+def on_save_error(model, e):
+    """后台保存失败的提示；文件冲突时交给用户选择"""
+    if isinstance(e, rime_dict.DictConflictError):
+        resolve_conflict(model)
     else:
-        entries.append((word, code, str(weight)))
-    save_dict_entries(dict_path, entries, header, switch_order=switch_order, enable_code2=enable_code2)
+        messagebox.showerror("错误", f"保存失败: {str(e)}")
+
+
+def schedule_autosave():
+    """编辑后延迟保存，连续编辑只写一次文件"""
+    global autosave_job
+    if autosave_job is not None:
+        root.after_cancel(autosave_job)
+    autosave_job = root.after(AUTOSAVE_DELAY_MS, flush_autosave)
+    schedule_deploy()
+
+
+def schedule_deploy():
+    """开启自动部署时，在最后一次编辑停顿 DEPLOY_DELAY_MS 后部署一次"""
+    global deploy_job
+    if deploy_job is not None:
+        root.after_cancel(deploy_job)
+        deploy_job = None
+    if auto_deploy.get():
+        deploy_job = root.after(DEPLOY_DELAY_MS, run_scheduled_deploy)
+
+
+def run_scheduled_deploy():
+    global deploy_job
+    deploy_job = None
+    if task_runner.busy("deploy"):
+        # 正在部署时，等这次部署结束后再重新计时
+        schedule_deploy()
+        return
+    start_deploy(interactive=False)
+
+
+def flush_autosave(wait=False):
+    """写回当前词典未保存的修改；wait 为 False 时在后台线程保存"""
+    global autosave_job
+    if autosave_job is not None:
+        root.after_cancel(autosave_job)
+        autosave_job = None
+    model = current_model
+    if model is None or not model.dirty:
+        return
+    if wait:
+        try:
+            model.save()
+        except rime_dict.DictConflictError:
+            resolve_conflict(model, wait=True)
+        except OSError as e:
+            messagebox.showerror("错误", f"保存失败: {str(e)}")
+    else:
+        task_runner.submit(lambda task: model.save(), on_error=lambda e: on_save_error(model, e))
+
+
+def check_existing_code(code, model):
+    """检查是否存在相同编码的词，并返回其编号和权重"""
+    entry_id = model.find_code(code)
+    if entry_id is None:
+        return None, None
+    return entry_id, model.get(entry_id)[2]  # 返回权重
+
+
+def add_word_to_rime(word, code, code2, weight, model):
+    """添加新词"""
+    model.add(word, code, weight, code2)
+    schedule_autosave()
     messagebox.showinfo("成功", f"已成功添加词汇: {word} ({code}, {code2}), 权重: {weight}")
 
 
-def update_word_in_rime(word, code, code2, weight, dict_path, original_code, switch_order=False, enable_code2=False):
+def update_word_in_rime(word, code, code2, weight, model, entry_id):
     """修改已有词条"""
-    entries, header, _ = load_dict_entries(dict_path, switch_order, enable_code2)
+    original_code = model.get(entry_id)[1]
 
     # 检查新编码是否已存在
-    new_code_exists = any(entry[1] == code for entry in entries)
-    if new_code_exists and code != original_code:
+    if code != original_code and model.find_code(code) is not None:
         confirm = messagebox.askyesno("确认", f"编码 '{code}' 已存在。是否覆盖？")
         if not confirm:
             return
 
-    # 更新词条
-    for i, entry in enumerate(entries):
-        if entry[1] == original_code:
-            if enable_code2:
-                entries[i] = (word, code, str(weight), code2)
-            else:
-                entries[i] = (word, code, str(weight))
-            break
-
-    save_dict_entries(dict_path, entries, header, switch_order=switch_order, enable_code2=enable_code2)
+    model.update(entry_id, word, code, weight, code2)
+    schedule_autosave()
     messagebox.showinfo("成功", f"已成功修改词汇: {word} ({code}, {code2}), 权重: {weight}")
 
 
-def delete_word_from_rime(dict_path, selected_items, switch_order=False, enable_code2=False):
+def delete_word_from_rime(model, entry_ids):
     """删除选中的词条"""
-    if not selected_items:
+    if not entry_ids:
         messagebox.showwarning("警告", "请选择要删除的词条")
         return
 
-    # 如果是单个选择，转换为列表
-    if not isinstance(selected_items, list):
-        selected_items = [selected_items]
-
     # 构建确认消息
-    items_text = "\n".join([f"{item[0]} ({item[1]})" for item in selected_items])
+    items_text = "\n".join([f"{model.get(i)[0]} ({model.get(i)[1]})" for i in entry_ids])
     confirm = messagebox.askyesno("确认", f"确定要删除以下词汇吗？\n{items_text}")
     
     if confirm:
-        entries, header, _ = load_dict_entries(dict_path, switch_order, enable_code2)
-        # 创建要删除的条目集合
-        entries = [entry for entry in entries if not any(
-            (entry[0] == item[0] and entry[1] == item[1] and 
-             entry[2] == item[2] and entry[3] == item[3])
-            for item in selected_items
-        )]
-        
-        save_dict_entries(dict_path, entries, header, switch_order=switch_order, enable_code2=enable_code2)
-        messagebox.showinfo("成功", f"已成功删除 {len(selected_items)} 个词条")
+        model.delete(entry_ids)
+        schedule_autosave()
+        messagebox.showinfo("成功", f"已成功删除 {len(entry_ids)} 个词条")
 
 
-def deploy_rime():
-    """部署 Rime 输入法"""
-    try:
-        # 尝试使用注册表找到小狼毫安装路径
-        import winreg
-        try:
-            key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\\Rime\Weasel", 0, winreg.KEY_READ)
-            weasel_path = winreg.QueryValueEx(key, "WeaselRoot")[0]
-            deployer_path = os.path.join(weasel_path, "WeaselDeployer.exe")
-        except:
-            # 如果注册表查找失败，使用默认路径
-            deployer_path = r"D:\\soft\\Rime\Weasel-0.16.3\\WeaselDeployer.exe"
+def selected_entry_ids():
+    """表格中选中行对应的词条编号；显示跨词典查询结果时没有编号，返回空列表"""
+    if showing_search_all:
+        return []
+    # 导入词典中的词条以 (词典路径, 词条) 显示，不能修改
+    return [row for row in tree.selection() if not isinstance(row, tuple)]
         
-        if not os.path.exists(deployer_path):
-            raise FileNotFoundError(f"找不到小狼毫部署程序: {deployer_path}")
             
-        subprocess.run([deployer_path, "/deploy"], check=True)
-        messagebox.showinfo("成功", "小狼毫部署成功！")
-    except FileNotFoundError as e:
-        messagebox.showerror("错误", str(e))
-    except subprocess.CalledProcessError as e:
-        messagebox.showerror("错误", f"部署失败: {e}")
-    except Exception as e:
-        messagebox.showerror("错误", f"未知错误: {e}")
+def clear_input_fields():
+    """清空输入框"""
+    entry_word.delete(0, tk.END)
+    entry_code.delete(0, tk.END)
+    entry_code2.delete(0, tk.END)
+    entry_weight.delete(0, tk.END)
 
 
 def on_add_button_click():
@@ -277,38 +427,31 @@ def on_add_button_click():
         messagebox.showwarning("警告", "请填写词汇和编码")
         return
 
-    if not dict_path or not os.path.exists(dict_path):
-        messagebox.showwarning("警告", "请选择有效的词典文件")
+    model = require_dict_model(dict_path, editable=True)
+    if model is None:
         return
 
-    # 默认权重为 100
-    weight = int(weight) if weight.isdigit() else 100
+    # 默认权重为 100；保留输入的原样（如 "0012"），不转换成整数
+    weight = weight if weight.isdigit() else rime_dict.DEFAULT_WEIGHT
 
     # 检查是否已存在相同编码的词
-    line_num, existing_weight = check_existing_code(code, dict_path)
-    if line_num is not None:
+    entry_id, existing_weight = check_existing_code(code, model)
+    if entry_id is not None:
         # 弹出选项对话框
         choice = messagebox.askquestion("编码重复", f"编码 '{code}' 已存在，当前权重为 {existing_weight}。请选择操作：",
                                         icon='warning', type='yesnocancel',
                                         default='cancel', detail="选择 '是' 覆盖，'否' 添加，'取消' 放弃操作。")
         if choice == 'yes':  # 覆盖
-            update_word_in_rime(word, code, code2, weight, dict_path, code, switch_order=switch_order.get(),
-                                enable_code2=enable_code2.get())
+            update_word_in_rime(word, code, code2, weight, model, entry_id)
         elif choice == 'no':  # 添加
-            add_word_to_rime(word, code, code2, weight, dict_path, switch_order=switch_order.get(),
-                             enable_code2=enable_code2.get())
+            add_word_to_rime(word, code, code2, weight, model)
         else:  # 取消
             return
     else:
         # 如果编码不存在，直接添加
-        add_word_to_rime(word, code, code2, weight, dict_path, switch_order=switch_order.get(),
-                         enable_code2=enable_code2.get())
+        add_word_to_rime(word, code, code2, weight, model)
 
-    # 清空输入框
-    entry_word.delete(0, tk.END)
-    entry_code.delete(0, tk.END)
-    entry_code2.delete(0, tk.END)
-    entry_weight.delete(0, tk.END)
+    clear_input_fields()
 
     # 刷新词典条目列表
     refresh_dict_entries(dict_path)
@@ -317,34 +460,32 @@ def on_add_button_click():
 def on_modify_button_click():
     """修改选中的词条"""
     dict_path = combo_dict.get()  # 获取词典文件路径
-    selected_item = tree.item(tree.selection(), "values") if tree.selection() else None
+    entry_ids = selected_entry_ids()
+    model = get_dict_model(dict_path)
 
-    if not selected_item:
+    if not entry_ids or model is None:
         messagebox.showwarning("警告", "请选择要修改的词条")
         return
+    if model.read_only:
+        require_dict_model(dict_path, editable=True)
+        return
 
     word = entry_word.get().strip()
     code = entry_code.get().strip()
     code2 = entry_code2.get().strip()
     weight = entry_weight.get().strip()
-    original_code = selected_item[1] # 获取原始编码
 
     if not word or not code:
         messagebox.showwarning("警告", "请填写词汇和编码")
         return
 
-    # 默认权重为 100
-    weight = int(weight) if weight.isdigit() else 100
+    # 默认权重为 100；保留输入的原样（如 "0012"），不转换成整数
+    weight = weight if weight.isdigit() else rime_dict.DEFAULT_WEIGHT
 
     # 修改词条
-    update_word_in_rime(word, code, code2, weight, dict_path, original_code, switch_order=switch_order.get(),
-                        enable_code2=enable_code2.get())
+    update_word_in_rime(word, code, code2, weight, model, entry_ids[0])
 
-    # 清空输入框
-    entry_word.delete(0, tk.END)
-    entry_code.delete(0, tk.END)
-    entry_code2.delete(0, tk.END)
-    entry_weight.delete(0, tk.END)
+    clear_input_fields()
 
     # 刷新词典条目列表
     refresh_dict_entries(dict_path)
@@ -353,42 +494,248 @@ def on_modify_button_click():
 def on_delete_button_click():
     """删除选中的词条"""
     dict_path = combo_dict.get()  # 获取词典文件路径
-    selected_items = [tree.item(item, "values") for item in tree.selection()]
-    delete_word_from_rime(dict_path, selected_items, switch_order=switch_order.get(), enable_code2=enable_code2.get())
+    model = require_dict_model(dict_path, editable=True)
+    if model is None:
+        return
+    delete_word_from_rime(model, selected_entry_ids())
     refresh_dict_entries(dict_path)
 
 
 def on_deploy_button_click():
-    """部署 Rime 输入法"""
-    deploy_rime()
+    """立即部署，不再等待自动部署的计时"""
+    if task_runner.busy("deploy"):
+        messagebox.showinfo("提示", "正在部署，请稍候")
+        return
+    start_deploy()
+
+
+def start_deploy(force=False, interactive=True):
+    """在后台写回未保存的修改并部署 Rime
+
+    配置中的词典（含导入的词典）自上次部署成功后没有变化时跳过部署：手动部署时询问是否仍要部署，
+    自动部署时只在状态栏提示。interactive 为 False 时出错也只显示在状态栏。
+    """
+    global autosave_job, deploy_job
+    if autosave_job is not None:
+        root.after_cancel(autosave_job)
+        autosave_job = None
+    if deploy_job is not None:
+        root.after_cancel(deploy_job)
+        deploy_job = None
+    model = current_model
+    dictionaries = [path for path in load_config() if path]
+    command = load_deploy_command()
+
+    def deploy_task(task):
+        if model is not None and model.dirty:
+            task.report("正在保存...")
+            model.save()
+        task.report("正在检查词典内容...")
+        needed, digests = deploy_state.check(rime_dict.deploy_inputs(dictionaries))
+        if not needed and not force:
+            return False
+        task.report("正在部署...")
+        rime_dict.run_deploy(command)
+        deploy_state.record(digests)
+        return True
+
+    def on_done(deployed):
+        button_deploy.config(state=tk.NORMAL)
+        if deployed:
+            set_status("部署完成")
+            if interactive:
+                messagebox.showinfo("成功", "小狼毫部署成功！")
+        elif not interactive:
+            set_status("词典内容没有变化，跳过自动部署")
+        elif messagebox.askyesno("提示", "词典内容自上次部署成功后没有变化，仍要部署吗？"):
+            start_deploy(force=True)
+        else:
+            set_status("")
+
+    def on_error(e):
+        button_deploy.config(state=tk.NORMAL)
+        set_status("部署失败" if interactive else f"自动部署失败: {e}")
+        if isinstance(e, rime_dict.DictConflictError):
+            resolve_conflict(model)
+        elif not interactive:
+            return
+        elif isinstance(e, FileNotFoundError):
+            messagebox.showerror("错误", str(e))
+        elif isinstance(e, subprocess.CalledProcessError):
+            messagebox.showerror("错误", f"部署失败: {e}")
+        else:
+            messagebox.showerror("错误", f"未知错误: {e}")
+
+    button_deploy.config(state=tk.DISABLED)
+    set_status("正在部署...")
+    task_runner.submit(deploy_task, on_done=on_done, on_error=on_error, on_progress=set_status, group="deploy")
+
+
+def on_undo_button_click(redo=False):
+    """撤销（或重做）当前词典的上一步修改，只改内存中的词条，随后照常自动保存"""
+    if task_runner.busy("sort") or task_runner.busy("import"):
+        messagebox.showinfo("提示", "正在排序或导入，请稍候")
+        return
+    model = require_dict_model(combo_dict.get(), editable=True)
+    if model is None:
+        return
+    step = model.redo() if redo else model.undo()
+    if step is None:
+        set_status("没有可重做的修改" if redo else "没有可撤销的修改")
+        return
+    show_all_entries(model)
+    schedule_autosave()
+    set_status(f"{'已重做' if redo else '已撤销'}: {step.label}")
 
 
 def on_save_button_click():
-    """保存当前词典条目到文件"""
+    """在后台保存当前词典条目到文件"""
     dict_path = combo_dict.get()  # 获取词典文件路径
-    if not dict_path or not os.path.exists(dict_path):
-        messagebox.showwarning("警告", "请选择有效的词典文件")
+    model = require_dict_model(dict_path, editable=True)
+    if model is None:
         return
 
-    # 加载当前显示的条目
-    entries = []
-    for item in tree.get_children():
-        values = tree.item(item)["values"]
-        if enable_code2.get():
-            entries.append((values[0], values[1], values[2], values[3]))
-        else:
-            entries.append((values[0], values[1], values[2]))
+    def save_task(task):
+        # 只写入改动的行，保存前先统计改动供提示
+        changes = model.pending_changes()
+        model.save()
+        return changes
 
-    # 获取原文件的头部信息
-    _, header, _ = load_dict_entries(dict_path, switch_order=switch_order.get(), enable_code2=enable_code2.get())
+    def on_done(changes):
+        if changes is None:
+            summary = "词典条目已保存！"
+        else:
+            summary = (f"词典条目已保存：新增 {len(changes.added)} 条，"
+                       f"修改 {len(changes.modified)} 条，删除 {len(changes.deleted)} 条")
+        set_status(summary)
+        messagebox.showinfo("成功", summary)
+
+    def on_error(e):
+        set_status("")
+        on_save_error(model, e)
     
-    try:
-        save_dict_entries(dict_path, entries, header, switch_order=switch_order.get(), enable_code2=enable_code2.get())
-        messagebox.showinfo("成功", "词典条目已保存！")
-        # 保存后刷新显示
-        refresh_dict_entries(dict_path)
-    except Exception as e:
-        messagebox.showerror("错误", f"保存失败: {str(e)}")
+    set_status("正在保存...")
+    task_runner.submit(save_task, on_done=on_done, on_error=on_error)
+
+
+# 批量导入对话框中的选项
+IMPORT_FORMAT_NAMES = {"rime": "Rime 词典", "csv": "CSV（词汇,编码,权重）", "sogou": "搜狗拼音导出的 txt",
+                       "qq": "QQ 拼音导出的 txt"}
+IMPORT_POLICY_NAMES = {"skip": "跳过", "overwrite": "覆盖已有词条", "keep-both": "两条都保留",
+                       "max-weight": "保留权重较高的"}
+
+
+def ask_options(title, groups):
+    """弹出单选对话框，groups 为 [(分组标题, {值: 显示文字}, 默认值), ...]
+
+    返回各分组选中的值组成的元组，取消时返回 None。
+    """
+    dialog = tk.Toplevel(root)
+    dialog.title(title)
+    dialog.transient(root)
+    dialog.resizable(False, False)
+    variables = []
+    result = []
+
+    for column, (label, names, default) in enumerate(groups):
+        variable = tk.StringVar(value=default)
+        variables.append(variable)
+        group_frame = ttk.LabelFrame(dialog, text=label)
+        group_frame.grid(row=0, column=column, padx=PADDING, pady=PADDING, sticky='nsew')
+        for value, text in names.items():
+            ttk.Radiobutton(group_frame, text=text, variable=variable, value=value).pack(anchor='w', padx=PADDING)
+
+    def on_ok():
+        result.append(tuple(variable.get() for variable in variables))
+        dialog.destroy()
+
+    dialog_buttons = ttk.Frame(dialog)
+    dialog_buttons.grid(row=1, column=0, columnspan=len(groups), pady=PADDING)
+    ttk.Button(dialog_buttons, text="确定", command=on_ok).pack(side=tk.LEFT, padx=PADDING)
+    ttk.Button(dialog_buttons, text="取消", command=dialog.destroy).pack(side=tk.LEFT, padx=PADDING)
+
+    dialog.grab_set()
+    root.wait_window(dialog)
+    return result[0] if result else None
+
+
+def on_import_button_click():
+    """批量导入其他词库：在后台合并到当前词典，完成后只保存一次"""
+    dict_path = combo_dict.get()
+    model = require_dict_model(dict_path, editable=True)
+    if model is None:
+        return
+    source_path = filedialog.askopenfilename(
+        title="选择要导入的词库",
+        filetypes=[("Text Files", "*.txt"), ("YAML Files", "*.yaml"), ("CSV Files", "*.csv"), ("All Files", "*.*")],
+    )
+    if not source_path:
+        return
+    options = ask_options("批量导入", [("词库格式", IMPORT_FORMAT_NAMES, rime_dict.guess_format(source_path)),
+                                      ("编码已存在时", IMPORT_POLICY_NAMES, "skip")])
+    if options is None:
+        return
+    source_format, policy = options
+
+    def import_task(task):
+        entries = rime_dict.iter_source_entries(source_path, source_format, model.enable_code2)
+        return model.import_entries(entries, policy, progress=lambda n: task.report(f"正在导入，已读取 {n} 条..."))
+
+    def on_done(result):
+        show_all_entries(model)
+        schedule_autosave()
+        rate = result.read / result.seconds if result.seconds else 0
+        set_status(f"导入完成，{rate:.0f} 条/秒")
+        messagebox.showinfo("导入完成", f"读取 {result.read} 条，用时 {result.seconds:.1f} 秒\n"
+                                        f"新增 {result.added} 条，更新 {result.updated} 条，跳过 {result.skipped} 条\n"
+                                        f"其中编码冲突 {result.conflicts} 条")
+
+    def on_error(e):
+        show_all_entries(model)
+        set_status("")
+        messagebox.showerror("错误", f"导入失败: {str(e)}")
+
+    set_status("正在导入...")
+    task_runner.submit(import_task, on_done=on_done, on_error=on_error,
+                       on_progress=progress_reporter("正在导入"), group="import")
+
+
+SORT_KEY_NAMES = {"code": "按编码", "word": "按词汇", "weight": "按权重（从高到低）"}
+
+
+def on_sort_button_click():
+    """在后台把当前词典排序后重写文件（包括未保存的修改），排序期间禁用编辑按钮"""
+    dict_path = combo_dict.get()
+    model = require_dict_model(dict_path, editable=True)
+    if model is None:
+        return
+    options = ask_options("排序", [("排序方式", SORT_KEY_NAMES, "code")])
+    if options is None:
+        return
+    key, = options
+    edit_buttons = (button_add, button_modify, button_delete, button_import, button_sort)
+    for button in edit_buttons:
+        button.config(state=tk.DISABLED)
+
+    def finish():
+        for button in edit_buttons:
+            button.config(state=tk.NORMAL)
+
+    def on_done(_):
+        finish()
+        show_all_entries(model)
+        set_status("已排序并保存")
+
+    def on_error(e):
+        finish()
+        set_status("")
+        if isinstance(e, rime_dict.DictConflictError):
+            resolve_conflict(model)
+        else:
+            messagebox.showerror("错误", f"排序失败: {str(e)}")
+
+    set_status("正在排序...")
+    task_runner.submit(lambda task: model.sort(key), on_done=on_done, on_error=on_error, group="sort")
 
 
 def on_choose_dict_button_click():
@@ -418,31 +765,138 @@ def on_clear_button_click():
 
 def on_tree_select(event=None):  # 添加事件参数
     """选中词条时填充到输入框"""
-    selected_item = tree.item(tree.selection(), "values") if tree.selection() else None
-    if selected_item:
+    rows = tree.selection()
+    if showing_search_all or rows and isinstance(rows[0], tuple):
+        entry = rows[0][1] if rows else None
+    else:
+        entry_ids = selected_entry_ids()
+        # 直接取模型中的原始字符串，避免 Tk 把 "0012" 之类的值转换成数字
+        entry = current_model.get(entry_ids[0]) if entry_ids and current_model is not None else None
+    if entry is not None:
+        word, code, weight, code2 = entry
         entry_word.delete(0, tk.END)
-        entry_word.insert(0, selected_item[0])
+        entry_word.insert(0, word)
         entry_code.delete(0, tk.END)
-        entry_code.insert(0, selected_item[1])
+        entry_code.insert(0, code)
         entry_weight.delete(0, tk.END)
-        entry_weight.insert(0, selected_item[2])
+        entry_weight.insert(0, weight)
         entry_code2.delete(0, tk.END)
-        entry_code2.insert(0, selected_item[3])
-
-
-def refresh_dict_entries(dict_path):
-    """刷新词典条目列表"""
-    print(f"刷新词典文件: {dict_path}")  # 调试信息
-    for row in tree.get_children():
-        tree.delete(row)  # 清空表格
-    entries, _, first_entry = load_dict_entries(dict_path, switch_order=switch_order.get(), enable_code2=enable_code2.get())  # 加载词典条目
-    print(f"加载的条目数量: {len(entries)}")  # 调试信息
-    for entry in entries:
-        tree.insert("", tk.END, values=entry)  # 插入新条目
+        entry_code2.insert(0, code2)
+
+
+def show_entries(model, entry_ids):
+    """在表格中显示指定的词条，表格只绘制可见的几行"""
+    global showing_search_all
+    showing_search_all = False
+    with rime_dict.profiler.timer("treeview", rows=len(entry_ids)):
+        tree.set_rows(entry_ids, model.display_row if model is not None else None)
+
+
+def show_effective_entries(model, entry_ids, imported):
+    """显示当前词典的词条和导入词典中的 (词典路径, 词条)，后者标出所在词典"""
+    global showing_search_all
+    showing_search_all = False
+    rows = list(entry_ids) + imported
+
+    def display_row(row):
+        return search_all_row(row) if isinstance(row, tuple) else model.display_row(row)
+
+    with rime_dict.profiler.timer("treeview", rows=len(rows)):
+        tree.set_rows(rows, display_row)
+
+
+def search_all_row(row):
+    """跨词典查询结果的显示值：按界面列次序的词条加上所在词典的文件名"""
+    dict_path, (word, code, weight, code2) = row
+    name = os.path.basename(dict_path)
+    if switch_order.get():
+        return (word, weight, code, code2, name)
+    return (word, code, weight, code2, name)
+
+
+def get_process_pool():
+    global process_pool
+    if process_pool is None:
+        process_pool = ProcessPoolExecutor()
+    return process_pool
+
+
+def search_all_dicts(query_text):
+    """在配置中的所有词典里并行查询，结果标出所在词典"""
+    dictionaries = [path for path in load_config() if path and os.path.exists(path)]
+    if not query_text or not dictionaries:
+        messagebox.showwarning("警告", "请输入查询内容并添加词典")
+        return
+    mode = match_mode.get()
+    code2 = enable_code2.get()
+    # 先把当前词典未保存的修改写回，子进程读到的才是最新内容
+    flush_autosave(wait=True)
+
+    def query_task(task):
+        return rime_dict.search_files(dictionaries, query_text, mode, code2,
+                                      executor=get_process_pool(), progress=task.report)
+
+    def on_done(result):
+        global showing_search_all
+        results, errors = result
+        showing_search_all = True
+        tree.set_rows(results, search_all_row)
+        set_status(f"在 {len(dictionaries)} 个词典中找到 {len(results)} 条词条")
+        if errors:
+            messagebox.showwarning("警告", "以下词典无法读取：\n" + "\n".join(
+                f"{path}: {error}" for path, error in errors))
+        elif not results:
+            messagebox.showinfo("提示", "未找到匹配的词条")
+
+    set_status("正在查询全部词典...")
+    task_runner.submit(query_task, on_done=on_done, on_error=on_query_error,
+                       on_progress=progress_reporter("正在查询全部词典"), group="query")
+
+
+def show_all_entries(model):
+    """显示词典的全部词条和第一条词条"""
+    show_entries(model, model.all_ids())
     # 更新第一条词条显示
+    first_entry = model.first_entry()
     label_first_entry.config(text=f"第一条词条: {first_entry}" if first_entry else "第一条词条: 无")
 
 
+def refresh_dict_entries(dict_path, on_loaded=None):
+    """刷新词典条目列表；词典尚未加载或文件被外部修改过时在后台重新读取"""
+    model = get_dict_model(dict_path)
+    if model is not None and (model.dirty or not model.is_stale()):
+        show_all_entries(model)
+        if on_loaded is not None:
+            on_loaded(model)
+        return
+
+    if not dict_path or not os.path.exists(dict_path):
+        show_entries(None, [])
+        label_first_entry.config(text="第一条词条: 无")
+        return
+
+    if model is None:
+        # 切换词典前先写回未保存的修改
+        flush_autosave()
+        if current_model is None or current_model.dict_path != dict_path:
+            apply_declared_layout(dict_path)
+    load_dict_model(dict_path, on_loaded)
+
+
+def apply_declared_layout(dict_path):
+    """词典头部声明了 columns 时按其设置列次序和编码2，不必再手动勾选"""
+    try:
+        header = rime_dict.read_dict_header(dict_path)
+    except (OSError, ValueError):
+        return
+    layout = rime_dict.column_layout(header.columns)
+    weight_first = rime_dict.weight_before_code(layout)
+    if weight_first is not None:
+        switch_order.set(weight_first)
+    if layout is not None and layout[3] >= 0:
+        enable_code2.set(True)
+
+
 def update_combo_dict():
     """更新下拉菜单中的词典文件"""
     dictionaries = load_config()
@@ -456,194 +910,312 @@ def update_combo_dict():
             refresh_dict_entries(latest_dict)  # 刷新条目列表
 
 
-def on_query_button_click():
-    """查询功能：根据输入内容查询词条"""
-    query_text = entry_query.get().strip()  # 获取查询内容
-    dict_path = combo_dict.get()  # 获取词典文件路径
-
-    if not dict_path or not os.path.exists(dict_path):
-        messagebox.showwarning("警告", "请选择有效的词典文件")
+def on_query_key(event):
+    """输入查询内容时延迟查询：连续输入只在停顿后查询一次"""
+    global search_job
+    if event.keysym in ("Return", "KP_Enter"):
         return
+    if search_job is not None:
+        root.after_cancel(search_job)
+    search_job = root.after(SEARCH_DELAY_MS, run_live_query)
 
-    # 加载词典条目
-    entries, _, first_entry = load_dict_entries(dict_path, switch_order=switch_order.get(), enable_code2=enable_code2.get())
 
-    # 如果查询内容为空，显示所有词条
-    if not query_text:
-        results = entries
-    else:
-        # 根据匹配模式查询
-        if match_mode.get() == "exact":
-            # 全匹配
-            results = [entry for entry in entries if query_text == entry[0] or query_text == entry[1]]
-        else:
-            # 部分匹配
-            results = [entry for entry in entries if query_text in entry[0] or query_text in entry[1]]
-
-    # 清空表格并显示查询结果
-    for row in tree.get_children():
-        tree.delete(row)
-    if results:
-        for result in results:
-            tree.insert("", tk.END, values=result)
-    else:
-        messagebox.showinfo("提示", "未找到匹配的词条")
-    # 更新第一条词条显示
-    label_first_entry.config(text=f"第一条词条: {first_entry}" if first_entry else "第一条词条: 无")
-
-
-# 在文件开头添加常量定义
-BG_COLOR = "#f0f0f0"  # 浅灰色背景
-PADDING = 5  # 统一内边距
-
-# 主窗口设置
-root = tk.Tk()
-root.title("Rime 词典管理程序 by Boldan")
-root.configure(bg=BG_COLOR)    
-
-# 设置默认字体
-root.option_add("*Font", DEFAULT_FONT)
-style = ttk.Style()
-style.configure(".", font=DEFAULT_FONT)  # 设置 ttk 控件的默认字体
-
-# 添加变量定义
-switch_order = tk.BooleanVar(value=False)
-enable_code2 = tk.BooleanVar(value=False)
-match_mode = tk.StringVar(value="exact")  # 添加匹配模式变量
-
-# 添加变量定义
-switch_order = tk.BooleanVar(value=False)
-enable_code2 = tk.BooleanVar(value=False)
-match_mode = tk.StringVar(value="exact")  # 添加匹配模式变量
-
-# 创建顶部框架来容纳第1、2行
-top_frame = ttk.Frame(root)
-top_frame.grid(row=0, rowspan=2, column=0, columnspan=6, sticky='nsew', padx=PADDING, pady=PADDING)
-
-# 配置top_frame的列权重
-
-top_frame.grid_columnconfigure(1, weight=5)  # 第一列权重为5
-top_frame.grid_columnconfigure(2, weight=3)  # 第二列权重为3
-top_frame.grid_columnconfigure(3, weight=2)  # 第三列权重为2
+def run_live_query():
+    global search_job
+    search_job = None
+    # 跨词典查询要读取所有词典，只在点击查询时进行；未打开词典时也不提示
+    if search_all.get() or get_dict_model(combo_dict.get()) is None:
+        return
+    on_query_button_click(live=True)
 
-# 在top_frame中重新布局第1行控件
-label_dict = ttk.Label(top_frame, text="词       典:")
-label_dict.grid(row=0, column=0, padx=PADDING, pady=PADDING, sticky='e')
 
-combo_dict = ttk.Combobox(top_frame, width=40)
-combo_dict.grid(row=0, column=1, padx=PADDING, pady=PADDING, sticky='ew')
-# 添加下拉菜单选择事件绑定
-combo_dict.bind('<<ComboboxSelected>>', lambda e: refresh_dict_entries(combo_dict.get()))
+def on_query_button_click(live=False):
+    """查询功能：在后台根据输入内容查询词条，新的查询会取消尚未完成的旧查询
 
-button_choose_dict = ttk.Button(top_frame, text="选择文件", command=on_choose_dict_button_click)
-button_choose_dict.grid(row=0, column=2, padx=PADDING, pady=PADDING, sticky='ew')
+    live 为 True 时是输入过程中的即时查询，没有结果时不弹出提示。
+    """
+    global search_job
+    if search_job is not None and not live:
+        root.after_cancel(search_job)
+        search_job = None
+    query_text = entry_query.get().strip()  # 获取查询内容
+    dict_path = combo_dict.get()  # 获取词典文件路径
+    if search_all.get():
+        search_all_dicts(query_text)
+        return
 
-button_clear = ttk.Button(top_frame, text="清空历史", command=on_clear_button_click)
-button_clear.grid(row=0, column=3, padx=PADDING, pady=PADDING, sticky='ew')
+    model = require_dict_model(dict_path)
+    if model is None:
+        return
+    if not model.dirty and model.is_stale():
+        # 文件被外部修改过，重新加载后再查询
+        refresh_dict_entries(dict_path, on_loaded=lambda _: on_query_button_click(live))
+        return
+    mode = match_mode.get()
+    # 查询时一并查询 import_tables 导入的词典，即 Rime 实际使用的全部词汇
+    graph = current_graph if query_text and include_imports.get() and current_graph else None
+
+    def query_task(task):
+        # 查询内容为空时显示所有词条；最近的结果有缓存，扩展上一次的查询时只在其结果中筛选
+        ids = model.query(query_text, mode, progress=task.report)
+        if graph is None:
+            return ids, []
+        return ids, graph.search(query_text, mode, progress=task.report)
+
+    def on_done(result):
+        ids, imported = result
+        # 显示查询结果
+        if imported:
+            show_effective_entries(model, ids, imported)
+            set_status(f"找到 {len(ids) + len(imported)} 条词条，其中 {len(imported)} 条来自导入的词典")
+        else:
+            show_entries(model, ids)
+            set_status(f"找到 {len(ids)} 条词条")
+        if not ids and not imported and not live:
+            messagebox.showinfo("提示", "未找到匹配的词条")
+        # 更新第一条词条显示
+        first_entry = model.first_entry()
+        label_first_entry.config(text=f"第一条词条: {first_entry}" if first_entry else "第一条词条: 无")
+
+    set_status("正在查询...")
+    task_runner.submit(query_task, on_done=on_done, on_error=on_query_error,
+                       on_progress=progress_reporter("正在查询"), group="query")
+
+
+def on_query_error(e):
+    """后台查询失败：清除“正在查询”的状态并提示"""
+    set_status("")
+    messagebox.showerror("错误", f"查询失败: {str(e)}")
+
+
+def on_window_close():
+    """关闭窗口前写回未保存的修改"""
+    task_runner.shutdown()
+    if current_model is not None and current_model.read_only:
+        current_model.close()
+    table_cache.close()
+    if process_pool is not None:
+        process_pool.shutdown(wait=False, cancel_futures=True)
+    if file_watcher is not None:
+        file_watcher.close()
+    flush_autosave(wait=True)
+    if current_model is not None and not current_model.read_only:
+        current_model.close_history()
+    root.destroy()
+
+
+def main():
+    """创建主窗口并进入主循环；界面只在直接运行本文件时创建，导入时不会打开窗口"""
+    global root, task_runner, switch_order, enable_code2, match_mode, search_all
+    global combo_dict, entry_query, button_deploy, label_status, label_first_entry
+    global button_add, button_modify, button_delete, button_import, button_sort, button_save, browse_mode
+    global button_undo, button_redo
+    global include_imports, auto_deploy
+    global tree, entry_word, entry_code, entry_weight, entry_code2, label_profile
+
+    # 主窗口设置
+    root = tk.Tk()
+    root.title("Rime 词典管理程序 by Boldan")
+    root.configure(bg=BG_COLOR)
+
+    # 设置默认字体
+    root.option_add("*Font", DEFAULT_FONT)
+
+    # 加载、保存、查询和部署都在后台线程执行，界面线程每 50 毫秒取回结果
+    task_runner = rime_dict.TaskRunner(root.after)
+    style = ttk.Style()
+    style.configure(".", font=DEFAULT_FONT)  # 设置 ttk 控件的默认字体
+
+    # 添加变量定义
+    switch_order = tk.BooleanVar(value=False)
+    enable_code2 = tk.BooleanVar(value=False)
+    match_mode = tk.StringVar(value="exact")  # 添加匹配模式变量
+
+    # 添加变量定义
+    switch_order = tk.BooleanVar(value=False)
+    enable_code2 = tk.BooleanVar(value=False)
+    match_mode = tk.StringVar(value="exact")  # 添加匹配模式变量
+    search_all = tk.BooleanVar(value=False)  # 在配置中的全部词典里查询
+    browse_mode = tk.BooleanVar(value=False)  # 只读浏览：映射文件而不是整体解析
+    include_imports = tk.BooleanVar(value=True)  # 查询时包括 import_tables 导入的词典
+    auto_deploy = tk.BooleanVar(value=False)  # 编辑停顿后自动部署，默认关闭
+
+    # 创建顶部框架来容纳第1、2行
+    top_frame = ttk.Frame(root)
+    top_frame.grid(row=0, rowspan=2, column=0, columnspan=6, sticky='nsew', padx=PADDING, pady=PADDING)
+
+    # 配置top_frame的列权重
+
+    top_frame.grid_columnconfigure(1, weight=5)  # 第一列权重为5
+    top_frame.grid_columnconfigure(2, weight=3)  # 第二列权重为3
+    top_frame.grid_columnconfigure(3, weight=2)  # 第三列权重为2
+
+    # 在top_frame中重新布局第1行控件
+    label_dict = ttk.Label(top_frame, text="词       典:")
+    label_dict.grid(row=0, column=0, padx=PADDING, pady=PADDING, sticky='e')
+
+    combo_dict = ttk.Combobox(top_frame, width=40)
+    combo_dict.grid(row=0, column=1, padx=PADDING, pady=PADDING, sticky='ew')
+    # 添加下拉菜单选择事件绑定
+    combo_dict.bind('<<ComboboxSelected>>', lambda e: refresh_dict_entries(combo_dict.get()))
+
+    button_choose_dict = ttk.Button(top_frame, text="选择文件", command=on_choose_dict_button_click)
+    button_choose_dict.grid(row=0, column=2, padx=PADDING, pady=PADDING, sticky='ew')
+
+    button_clear = ttk.Button(top_frame, text="清空历史", command=on_clear_button_click)
+    button_clear.grid(row=0, column=3, padx=PADDING, pady=PADDING, sticky='ew')
+
+    # 在top_frame中重新布局第2行控件
+    label_query = ttk.Label(top_frame, text="编码/词汇:")
+    label_query.grid(row=1, column=0, padx=PADDING, pady=PADDING, sticky='e')
+
+    entry_query = ttk.Entry(top_frame)
+    entry_query.grid(row=1, column=1, padx=PADDING, pady=PADDING, sticky='ew')
+    entry_query.bind('<KeyRelease>', on_query_key)
+    entry_query.bind('<Return>', lambda e: on_query_button_click())
+
+    match_mode_frame = ttk.Frame(top_frame)
+    match_mode_frame.grid(row=1, column=2, padx=PADDING, pady=PADDING, sticky='ew')
+
+    exact_match_radio = ttk.Radiobutton(match_mode_frame, text="全匹配", variable=match_mode, value="exact")
+    prefix_match_radio = ttk.Radiobutton(match_mode_frame, text="前缀匹配", variable=match_mode, value="prefix")
+    partial_match_radio = ttk.Radiobutton(match_mode_frame, text="部分匹配", variable=match_mode, value="partial")
+    exact_match_radio.pack(side=tk.LEFT, padx=2)
+    prefix_match_radio.pack(side=tk.LEFT, padx=2)
+    partial_match_radio.pack(side=tk.LEFT, padx=2)
+    search_all_check = ttk.Checkbutton(match_mode_frame, text="全部词典", variable=search_all)
+    search_all_check.pack(side=tk.LEFT, padx=2)
+    include_imports_check = ttk.Checkbutton(match_mode_frame, text="含导入词典", variable=include_imports)
+    include_imports_check.pack(side=tk.LEFT, padx=2)
+
+    button_query = ttk.Button(top_frame, text="查询", command=on_query_button_click)
+    button_query.grid(row=1, column=3, padx=PADDING, pady=PADDING, sticky='ew')
+
+    # 创建一个框架来容纳所有按钮，使它们居中对齐
+    button_frame = ttk.Frame(root)  # 改用ttk.Frame
+    button_frame.grid(row=7, column=0, columnspan=6, pady=PADDING*2)  # 扩大columnspan
+
+    # 使用ttk.Button替换tk.Button，并增加按钮宽度
+    button_add = ttk.Button(button_frame, text="添加", command=on_add_button_click, width=15)
+    button_add.pack(side=tk.LEFT, padx=PADDING*3)
+
+    button_modify = ttk.Button(button_frame, text="修改", command=on_modify_button_click, width=15)
+    button_modify.pack(side=tk.LEFT, padx=PADDING*3)
+
+    button_delete = ttk.Button(button_frame, text="删除", command=on_delete_button_click, width=15)
+    button_delete.pack(side=tk.LEFT, padx=PADDING*3)
+
+    button_import = ttk.Button(button_frame, text="导入", command=on_import_button_click, width=15)
+    button_import.pack(side=tk.LEFT, padx=PADDING*3)
+
+    button_sort = ttk.Button(button_frame, text="排序", command=on_sort_button_click, width=15)
+    button_sort.pack(side=tk.LEFT, padx=PADDING*3)
 
-# 在top_frame中重新布局第2行控件
-label_query = ttk.Label(top_frame, text="编码/词汇:")
-label_query.grid(row=1, column=0, padx=PADDING, pady=PADDING, sticky='e')
+    button_save = ttk.Button(button_frame, text="保存", command=on_save_button_click, width=15)
+    button_save.pack(side=tk.LEFT, padx=PADDING*3)
 
-entry_query = ttk.Entry(top_frame)
-entry_query.grid(row=1, column=1, padx=PADDING, pady=PADDING, sticky='ew')
+    button_undo = ttk.Button(button_frame, text="撤销", command=on_undo_button_click, width=8)
+    button_undo.pack(side=tk.LEFT, padx=PADDING)
 
-match_mode_frame = ttk.Frame(top_frame)
-match_mode_frame.grid(row=1, column=2, padx=PADDING, pady=PADDING, sticky='ew')
+    button_redo = ttk.Button(button_frame, text="重做", command=lambda: on_undo_button_click(redo=True), width=8)
+    button_redo.pack(side=tk.LEFT, padx=PADDING*3)
 
-exact_match_radio = ttk.Radiobutton(match_mode_frame, text="全匹配", variable=match_mode, value="exact")
-partial_match_radio = ttk.Radiobutton(match_mode_frame, text="部分匹配", variable=match_mode, value="partial")
-exact_match_radio.pack(side=tk.LEFT, padx=2)
-partial_match_radio.pack(side=tk.LEFT, padx=2)
+    button_deploy = ttk.Button(button_frame, text="部署", command=on_deploy_button_click, width=15)
+    button_deploy.pack(side=tk.LEFT, padx=PADDING*3)
 
-button_query = ttk.Button(top_frame, text="查询", command=on_query_button_click)
-button_query.grid(row=1, column=3, padx=PADDING, pady=PADDING, sticky='ew')
+    auto_deploy_check = ttk.Checkbutton(button_frame, text="自动部署", variable=auto_deploy, command=schedule_deploy)
+    auto_deploy_check.pack(side=tk.LEFT, padx=PADDING)
 
-# 创建一个框架来容纳所有按钮，使它们居中对齐
-button_frame = ttk.Frame(root)  # 改用ttk.Frame
-button_frame.grid(row=7, column=0, columnspan=6, pady=PADDING*2)  # 扩大columnspan
+    # 状态栏：显示加载、查询、保存和部署的进度
+    label_status = ttk.Label(root, text="", anchor="w")
+    label_status.grid(row=8, column=0, columnspan=6, sticky='ew', padx=PADDING)
 
-# 使用ttk.Button替换tk.Button，并增加按钮宽度
-button_add = ttk.Button(button_frame, text="添加", command=on_add_button_click, width=15)
-button_add.pack(side=tk.LEFT, padx=PADDING*3)
+    # 性能记录：解析、建索引、查询、填充表格、保存和部署的耗时，同时写入 JSON lines 日志
+    label_profile = ttk.Label(root, text="", anchor="w")
+    if "--profile" in sys.argv[1:]:
+        rime_dict.profiler.enable()
+    if rime_dict.profiler.enable_from_env():
+        label_profile.grid(row=9, column=0, columnspan=6, sticky='ew', padx=PADDING)
+        root.after(PROFILE_INTERVAL_MS, show_profile)
 
-button_modify = ttk.Button(button_frame, text="修改", command=on_modify_button_click, width=15)
-button_modify.pack(side=tk.LEFT, padx=PADDING*3)
+    # 配置根窗口的列权重，使布局更加灵活
+    root.grid_columnconfigure(1, weight=1)
 
-button_delete = ttk.Button(button_frame, text="删除", command=on_delete_button_click, width=15)
-button_delete.pack(side=tk.LEFT, padx=PADDING*3)
+    # 在查询（编码或词条）下方显示原词典的第一条词条
+    label_first_entry = tk.Label(root, text="第一条词条: 无", fg="red", font=DEFAULT_FONT)
+    label_first_entry.grid(row=2, column=0, columnspan=4, padx=5, pady=5)
 
-button_save = ttk.Button(button_frame, text="保存", command=on_save_button_click, width=15)
-button_save.pack(side=tk.LEFT, padx=PADDING*3)
+    # 创建词典条目显示部分
+    columns = ("词汇（text）", "编码（code）", "权重（weight）", "编码2（stem）", "词典（dict）")
+    # 虚拟列表：只创建可见的 8 行，滚动时重新填充，条目数量再多也不会卡住界面
+    tree = VirtualTreeview(root, columns, height=8)
+    style = ttk.Style()
+    style.configure("Treeview.Heading", font=HEADING_FONT)  # 设置所有表头的字体
+    style.configure("Treeview", font=DEFAULT_FONT)         # 设置表格内容的字体
 
-button_deploy = ttk.Button(button_frame, text="部署", command=on_deploy_button_click, width=15)
-button_deploy.pack(side=tk.LEFT, padx=PADDING*3)
+    for col in columns:
+        tree.heading(col, text=col)  # 移除了直接设置字体的部分
+    tree.grid(row=3, column=0, columnspan=4, padx=5, pady=5)
+    tree.bind("<<TreeviewSelect>>", on_tree_select)
 
-# 配置根窗口的列权重，使布局更加灵活
-root.grid_columnconfigure(1, weight=1)
+    # 创建一个框架来容纳输入部分
+    input_frame = ttk.Frame(root)
+    input_frame.grid(row=4, rowspan=2, column=0, columnspan=6, sticky='ew', padx=PADDING, pady=PADDING)
 
-# 在查询（编码或词条）下方显示原词典的第一条词条
-label_first_entry = tk.Label(root, text="第一条词条: 无", fg="red", font=DEFAULT_FONT)
-label_first_entry.grid(row=2, column=0, columnspan=4, padx=5, pady=5)
+    # 配置input_frame的列权重
+    input_frame.grid_columnconfigure(1, weight=2)  # 第一个输入框列
+    input_frame.grid_columnconfigure(3, weight=2)  # 第二个输入框列
+    input_frame.grid_columnconfigure(5, weight=1)  # 切换按钮列
 
-# 创建词典条目显示部分
-columns = ("词汇（text）", "编码（code）", "权重（weight）", "编码2（stem）")
-tree = ttk.Treeview(root, columns=columns, show="headings", height=8, selectmode='extended')  # 添加 selectmode='extended'
-style = ttk.Style()
-style.configure("Treeview.Heading", font=HEADING_FONT)  # 设置所有表头的字体
-style.configure("Treeview", font=DEFAULT_FONT)         # 设置表格内容的字体
+    # 在input_frame中重新布局输入控件
+    label_word = ttk.Label(input_frame, text="词汇:")
+    label_word.grid(row=0, column=0, padx=PADDING, pady=PADDING, sticky='e')
 
-for col in columns:
-    tree.heading(col, text=col)  # 移除了直接设置字体的部分
-tree.grid(row=3, column=0, columnspan=4, padx=5, pady=5)
-tree.bind("<<TreeviewSelect>>", on_tree_select)
+    entry_word = ttk.Entry(input_frame)
+    entry_word.grid(row=0, column=1, padx=PADDING, pady=PADDING, sticky='ew')
 
-# 创建一个框架来容纳输入部分
-input_frame = ttk.Frame(root)
-input_frame.grid(row=4, rowspan=2, column=0, columnspan=6, sticky='ew', padx=PADDING, pady=PADDING)
+    label_code = ttk.Label(input_frame, text="编  码:")
+    label_code.grid(row=0, column=2, padx=PADDING, pady=PADDING, sticky='e')
 
-# 配置input_frame的列权重
-input_frame.grid_columnconfigure(1, weight=2)  # 第一个输入框列
-input_frame.grid_columnconfigure(3, weight=2)  # 第二个输入框列
-input_frame.grid_columnconfigure(5, weight=1)  # 切换按钮列
+    entry_code = ttk.Entry(input_frame)
+    entry_code.grid(row=0, column=3, padx=PADDING, pady=PADDING, sticky='ew')
 
-# 在input_frame中重新布局输入控件
-label_word = ttk.Label(input_frame, text="词汇:")
-label_word.grid(row=0, column=0, padx=PADDING, pady=PADDING, sticky='e')
+    label_weight = ttk.Label(input_frame, text="权重:")
+    label_weight.grid(row=1, column=0, padx=PADDING, pady=PADDING, sticky='e')
 
-entry_word = ttk.Entry(input_frame)
-entry_word.grid(row=0, column=1, padx=PADDING, pady=PADDING, sticky='ew')
+    entry_weight = ttk.Entry(input_frame)
+    entry_weight.grid(row=1, column=1, padx=PADDING, pady=PADDING, sticky='ew')
 
-label_code = ttk.Label(input_frame, text="编  码:")
-label_code.grid(row=0, column=2, padx=PADDING, pady=PADDING, sticky='e')
+    label_code2 = ttk.Label(input_frame, text="编码2:")
+    label_code2.grid(row=1, column=2, padx=PADDING, pady=PADDING, sticky='e')
 
-entry_code = ttk.Entry(input_frame)
-entry_code.grid(row=0, column=3, padx=PADDING, pady=PADDING, sticky='ew')
+    entry_code2 = ttk.Entry(input_frame)
+    entry_code2.grid(row=1, column=3, padx=PADDING, pady=PADDING, sticky='ew')
 
-label_weight = ttk.Label(input_frame, text="权重:")
-label_weight.grid(row=1, column=0, padx=PADDING, pady=PADDING, sticky='e')
+    # 切换按钮放在input_frame中
+    switch_button = ttk.Checkbutton(input_frame, text="编码-权重", variable=switch_order,
+                                   command=lambda: refresh_dict_entries(combo_dict.get()))
+    switch_button.grid(row=0, column=5, padx=PADDING, pady=PADDING, sticky='w')
 
-entry_weight = ttk.Entry(input_frame)
-entry_weight.grid(row=1, column=1, padx=PADDING, pady=PADDING, sticky='ew')
+    enable_code2_button = ttk.Checkbutton(input_frame, text="显示编码2", variable=enable_code2,
+                                         command=lambda: refresh_dict_entries(combo_dict.get()))
+    enable_code2_button.grid(row=1, column=5, padx=PADDING, pady=PADDING, sticky='w')
 
-label_code2 = ttk.Label(input_frame, text="编码2:")
-label_code2.grid(row=1, column=2, padx=PADDING, pady=PADDING, sticky='e')
+    browse_mode_button = ttk.Checkbutton(input_frame, text="只读浏览", variable=browse_mode,
+                                        command=lambda: refresh_dict_entries(combo_dict.get()))
+    browse_mode_button.grid(row=0, column=6, padx=PADDING, pady=PADDING, sticky='w')
 
-entry_code2 = ttk.Entry(input_frame)
-entry_code2.grid(row=1, column=3, padx=PADDING, pady=PADDING, sticky='ew')
 
-# 切换按钮放在input_frame中
-switch_button = ttk.Checkbutton(input_frame, text="编码-权重", variable=switch_order,
-                               command=lambda: refresh_dict_entries(combo_dict.get()))
-switch_button.grid(row=0, column=5, padx=PADDING, pady=PADDING, sticky='w')
+    root.protocol("WM_DELETE_WINDOW", on_window_close)
+    root.bind("<Control-z>", lambda e: on_undo_button_click())
+    root.bind("<Control-y>", lambda e: on_undo_button_click(redo=True))
 
-enable_code2_button = ttk.Checkbutton(input_frame, text="显示编码2", variable=enable_code2,
-                                     command=lambda: refresh_dict_entries(combo_dict.get()))
-enable_code2_button.grid(row=1, column=5, padx=PADDING, pady=PADDING, sticky='w')
+    # 主循环开始前调用更新函数
+    update_combo_dict()
 
+    # 运行主循环
+    root.mainloop()
 
-# 主循环开始前调用更新函数
-update_combo_dict() 
 
-# 运行主循环
-root.mainloop()
+if __name__ == "__main__":
+    main()
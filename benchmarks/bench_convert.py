@@ -0,0 +1,77 @@
+"""测量格式转换（python -m rime_dict convert）的吞吐量，并与直接复制文件、逐行读写的速度对比
+
+用法: python benchmarks/bench_convert.py [--lines 5000000] [--scheme pinyin] [--data-dir dir]
+
+逐行读写只解码再编码每一行，不解析列，可看作纯 Python 流式处理的上限；
+直接复制文件为磁盘的上限。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_suite import pad  # noqa: E402
+from synth import write_synthetic  # noqa: E402
+from rime_dict.cli import main as cli_main  # noqa: E402
+
+# (说明, 输入文件名, 输出文件名, 额外参数)；输入文件名为前面某项的输出时依次生成
+CASES = [
+    ("yaml -> txt（切换次序）", "source.dict.yaml", "out.txt", ["--switch-order"]),
+    ("yaml -> txt（GBK）", "source.dict.yaml", "out-gbk.txt", ["--encoding", "gbk"]),
+    ("yaml -> csv", "source.dict.yaml", "out.csv", []),
+    ("csv -> yaml", "out.csv", "from-csv.dict.yaml", []),
+    ("txt -> yaml（生成头部）", "out.txt", "from-txt.dict.yaml", []),
+    ("yaml -> qq", "source.dict.yaml", "out-qq.txt", ["--to", "qq"]),
+    ("qq -> yaml", "out-qq.txt", "from-qq.dict.yaml", ["--from", "qq"]),
+]
+
+
+def copy_lines(source, target):
+    """逐行解码再编码，不解析"""
+    with open(source, "r", encoding="utf-8") as f, open(target, "w", encoding="utf-8", newline="") as out:
+        out.writelines(f)
+
+
+def measure(label, func, source, target):
+    start = time.perf_counter()
+    func(source, target)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(source) / 2 ** 20
+    print(f"{pad(label, 28)}{elapsed:10.2f} s{size / elapsed:10.1f} MiB/s")
+
+
+def convert(extra):
+    def run(source, target):
+        # 汇报的条数输出到标准错误，不影响表格
+        if cli_main(["convert", source, "-o", target] + extra):
+            raise SystemExit(f"转换失败: {source}")
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=5_000_000, help="合成词典的行数")
+    parser.add_argument("--scheme", choices=("pinyin", "wubi"), default="pinyin", help="编码方案")
+    parser.add_argument("--data-dir", help="放置生成的词典和转换结果的目录，默认用临时目录")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        source = os.path.join(data_dir, "source.dict.yaml")
+        print(f"生成 {args.lines} 行合成词典...")
+        size = write_synthetic(source, args.lines, args.scheme)
+        print(f"文件大小: {size / 2 ** 20:.1f} MiB\n")
+        print(f"{pad('操作', 28)}{'耗时':>10}{'吞吐量':>12}")
+        measure("直接复制文件", shutil.copyfile, source, os.path.join(data_dir, "copy.dict.yaml"))
+        measure("逐行读写（不解析）", copy_lines, source, os.path.join(data_dir, "lines.dict.yaml"))
+        for label, name, output, extra in CASES:
+            measure(label, convert(extra), os.path.join(data_dir, name), os.path.join(data_dir, output))
+
+
+if __name__ == "__main__":
+    main()
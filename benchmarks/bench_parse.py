@@ -0,0 +1,112 @@
+"""对比旧版整文件读取的 load_dict_entries 与流式解析器的耗时和内存
+
+用法: python benchmarks/bench_parse.py [--lines 5000000] [--memory]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synth import write_synthetic  # noqa: E402
+from rime_dict import DictModel, ParseCache, iter_dict_entries, load_dict_entries  # noqa: E402
+
+
+def legacy_load_dict_entries(dict_path, switch_order=False, enable_code2=False):
+    """旧版实现（仅保留 YAML 分支，去掉 messagebox）：整文件读入后 splitlines 并逐行正则匹配"""
+    entries = []
+    header = ""
+    first_entry = ""
+    encodings = ['utf-8', 'gbk', 'gb18030', 'utf-16']
+    content = None
+    for encoding in encodings:
+        try:
+            with open(dict_path, "r", encoding=encoding) as f:
+                content = f.read()
+                break
+        except UnicodeDecodeError:
+            continue
+    if content is None:
+        return [], "", ""
+    lines = content.splitlines()
+    header_found = False
+    file_ext = os.path.splitext(dict_path)[1].lower()
+    for line in lines:
+        if not header_found:
+            if file_ext == '.yaml' and line.strip() == "...":
+                header += line + "\n"
+                header_found = True
+            continue
+        if line.strip() and not line.strip().startswith("#"):
+            parts = line.strip().split("\t")
+            if len(parts) >= 2:
+                word = parts[0].strip()
+                second_field = parts[1].strip()
+                if re.match(r"^\d+$", second_field):
+                    weight = second_field
+                    code = parts[2].strip() if len(parts) >= 3 else ""
+                    code2 = parts[3].strip() if len(parts) >= 4 and enable_code2 else ""
+                else:
+                    code = second_field
+                    weight = parts[2].strip() if len(parts) >= 3 else "100"
+                    code2 = parts[3].strip() if len(parts) >= 4 and enable_code2 else ""
+                entry = (word, weight, code, code2) if switch_order else (word, code, weight, code2)
+                entries.append(entry)
+                if not first_entry:
+                    first_entry = "\t".join(entry)
+    return entries, header, first_entry
+
+
+def count_streaming(dict_path):
+    count = 0
+    for _ in iter_dict_entries(dict_path):
+        count += 1
+    return count
+
+
+def measure(label, func, dict_path, memory):
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func(dict_path)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    count = result if isinstance(result, int) else len(result[0])
+    del result
+    peak_text = f"{peak / 2 ** 20:10.1f} MiB" if peak is not None else "         -"
+    print(f"{label:<28}{elapsed:10.2f} s{peak_text}{count:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=5_000_000, help="合成词典的行数")
+    parser.add_argument("--memory", action="store_true", help="使用 tracemalloc 统计内存峰值（耗时会增加）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dict_path = os.path.join(tmp, "bench.dict.yaml")
+        print(f"生成 {args.lines} 行合成词典...")
+        write_synthetic(dict_path, args.lines)
+        print(f"文件大小: {os.path.getsize(dict_path) / 2 ** 20:.1f} MiB\n")
+        print(f"{'实现':<28}{'耗时':>12}{'内存峰值':>14}{'词条数':>12}")
+        measure("旧版 load_dict_entries", legacy_load_dict_entries, dict_path, args.memory)
+        measure("流式 load_dict_entries", load_dict_entries, dict_path, args.memory)
+        measure("流式 iter_dict_entries", count_streaming, dict_path, args.memory)
+        cache = ParseCache(os.path.join(tmp, "cache"))
+
+        def load_model(path):
+            return len(DictModel(path, cache=cache).load())
+
+        measure("DictModel 冷启动（写缓存）", load_model, dict_path, args.memory)
+        measure("DictModel 热启动（读缓存）", load_model, dict_path, args.memory)
+
+
+if __name__ == "__main__":
+    main()
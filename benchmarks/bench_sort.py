@@ -0,0 +1,63 @@
+"""对比内存中 sorted() 与按内存预算的外部归并排序的耗时和内存峰值
+
+用法: python benchmarks/bench_sort.py [--lines 2000000] [--memory 64] [--key code]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synth import write_synthetic  # noqa: E402
+from rime_dict import SORT_KEYS, external_sort, iter_dict_entries  # noqa: E402
+
+
+def in_memory_sort(dict_path, key):
+    count = 0
+    for _ in sorted(iter_dict_entries(dict_path), key=SORT_KEYS[key]):
+        count += 1
+    return count
+
+
+def make_external_sort(memory_limit, tmp_dir):
+    def run(dict_path, key):
+        count = 0
+        for _ in external_sort(iter_dict_entries(dict_path), key, memory_limit, tmp_dir):
+            count += 1
+        return count
+    return run
+
+
+def measure(label, func, dict_path, key):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = func(dict_path, key)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<24}{elapsed:10.2f} s{peak / 2 ** 20:10.1f} MiB{count:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=2_000_000, help="合成词典的行数")
+    parser.add_argument("--memory", type=float, default=64, help="外部排序的内存预算（MiB）")
+    parser.add_argument("--key", choices=tuple(SORT_KEYS), default="code", help="排序方式")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dict_path = os.path.join(tmp, "bench.dict.yaml")
+        print(f"生成 {args.lines} 行合成词典...")
+        write_synthetic(dict_path, args.lines)
+        print(f"文件大小: {os.path.getsize(dict_path) / 2 ** 20:.1f} MiB\n")
+        print(f"{'实现':<22}{'耗时':>12}{'内存峰值':>12}{'词条数':>12}")
+        measure("内存中 sorted()", in_memory_sort, dict_path, args.key)
+        external = make_external_sort(int(args.memory * 2 ** 20), tmp)
+        measure(f"外部排序（{args.memory:g} MiB）", external, dict_path, args.key)
+
+
+if __name__ == "__main__":
+    main()
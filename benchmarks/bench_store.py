@@ -0,0 +1,62 @@
+"""对比元组列表与列式 EntryStore 存放全部词条时的内存占用
+
+用法: python benchmarks/bench_store.py [--lines 1000000]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synth import write_synthetic  # noqa: E402
+from rime_dict import EntryStore, iter_dict_entries  # noqa: E402
+
+
+def build_list(dict_path):
+    return list(iter_dict_entries(dict_path))
+
+
+def build_store(dict_path):
+    store = EntryStore()
+    store.extend(iter_dict_entries(dict_path))
+    return store
+
+
+def measure(label, func, dict_path):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    entries = func(dict_path)
+    elapsed = time.perf_counter() - start
+    # 解析过程中的临时对象已释放，当前占用即为容器本身
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    count = len(entries)
+    start = time.perf_counter()
+    for i in range(0, count, max(1, count // 100000)):
+        entries[i]
+    access = time.perf_counter() - start
+    del entries
+    print(f"{label:<16}{size / 2 ** 20:10.1f} MiB{size / max(count, 1):10.1f} B{elapsed:10.2f} s{access:10.3f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=1_000_000, help="合成词典的行数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dict_path = os.path.join(tmp, "bench.dict.yaml")
+        print(f"生成 {args.lines} 行合成词典...")
+        write_synthetic(dict_path, args.lines)
+        print(f"{'存储方式':<14}{'内存':>14}{'每条':>12}{'构建耗时':>10}{'读取十万条':>10}")
+        measure("元组列表", build_list, dict_path)
+        measure("EntryStore", build_store, dict_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""在不同规模和编码的合成词典上测量常用操作的耗时，可与上次保存的结果对比
+
+用法: python benchmarks/bench_suite.py [--sizes 10k,100k,1M] [--encodings utf-8,gbk] [--formats yaml,txt]
+                                      [--scheme pinyin] [--code2] [--save out.json] [--baseline old.json]
+
+测量的操作：load_dict_entries、DictModel.load、建立索引、check_existing_code（按编码查重）、
+全匹配和部分匹配查询、只读浏览的映射和查询、删除、增量保存和整体重写。--baseline 给出之前 --save 的结果时，
+表格多出基线耗时和比值两列，比值小于 1 表示变快。基线只是读取保存的 JSON，不会运行旧版代码：
+要对比两个版本，先在旧版上用 --save 保存结果，再在新版上用 --baseline 对比。
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synth import write_synthetic  # noqa: E402
+from rime_dict import DictModel, MappedDict, load_dict_entries  # noqa: E402
+
+# 每项查询、查重和删除操作的次数
+SAMPLE_SIZE = 1000
+PARTIAL_QUERIES = 20
+FORMAT_SUFFIXES = {"yaml": ".dict.yaml", "txt": ".txt"}
+
+
+def parse_size(text):
+    """10k、2.5M 之类的行数"""
+    text = text.strip().lower()
+    scale = {"k": 1000, "m": 1000_000}.get(text[-1:])
+    return int(float(text[:-1]) * scale) if scale else int(text)
+
+
+def timed(func, repeat):
+    """运行 repeat 次，返回 (耗时中位数, 最后一次的结果)"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def run_case(dict_path, code2, repeat, seed=0):
+    """对一个词典依次测量各项操作，返回 [(操作, 耗时)]"""
+    rng = random.Random(seed)
+    results = []
+
+    seconds, _ = timed(lambda: load_dict_entries(dict_path, enable_code2=code2), repeat)
+    results.append(("load_dict_entries", seconds))
+
+    model = DictModel(dict_path, enable_code2=code2)
+    seconds, _ = timed(model.load, repeat)
+    results.append(("DictModel.load", seconds))
+
+    seconds, _ = timed(model.build_indexes, 1)
+    results.append(("建立索引", seconds))
+
+    ids = list(model.all_ids())
+    sample = rng.sample(ids, min(SAMPLE_SIZE, len(ids)))
+    codes = [model.get(entry_id)[1] for entry_id in sample]
+    seconds, _ = timed(lambda: [model.find_code(code) for code in codes], repeat)
+    results.append((f"check_existing_code ×{len(codes)}", seconds))
+
+    seconds, _ = timed(lambda: [model.lookup(code) for code in codes], repeat)
+    results.append((f"全匹配 ×{len(codes)}", seconds))
+
+    words = [model.get(entry_id)[0] for entry_id in sample[:PARTIAL_QUERIES + 1]]
+    texts = [word[rng.randrange(len(word))] for word in words]
+    if texts:
+        seconds, _ = timed(lambda: model.search_partial(texts[0]), 1)
+        results.append(("部分匹配（首次，含建索引）", seconds))
+        seconds, _ = timed(lambda: [model.search_partial(text) for text in texts[1:]], repeat)
+        results.append((f"部分匹配 ×{len(texts) - 1}", seconds))
+
+    # 只读浏览：映射文件，查询直接扫描字节（UTF-16 词典不支持）
+    mapped = MappedDict(dict_path, enable_code2=code2)
+    try:
+        seconds, _ = timed(mapped.load, repeat)
+    except ValueError:
+        mapped = None
+    if mapped is not None:
+        results.append(("MappedDict.load", seconds))
+        # 查询结果有缓存，只测一次
+        seconds, _ = timed(lambda: [mapped.query(text, "partial") for text in texts[1:]], 1)
+        results.append((f"只读浏览部分匹配 ×{len(texts) - 1}", seconds))
+        mapped.close()
+
+    # 以下操作修改模型和文件，只测一次
+    seconds, _ = timed(lambda: model.delete(sample), 1)
+    results.append((f"删除 ×{len(sample)}", seconds))
+    seconds, _ = timed(model.save, 1)
+    results.append(("保存（增量）", seconds))
+    seconds, _ = timed(lambda: model.save(compact=True), 1)
+    results.append(("保存（整体重写）", seconds))
+    return results
+
+
+def case_files(args, work_dir):
+    """按需生成各规模、编码和格式的词典，产出 (用例名, 文件路径)"""
+    for lines in args.sizes:
+        for encoding in args.encodings:
+            for fmt in args.formats:
+                name = f"{lines}-{args.scheme}{'-code2' if args.code2 else ''}-{encoding}{FORMAT_SUFFIXES[fmt]}"
+                path = os.path.join(work_dir, name)
+                if not os.path.exists(path):
+                    print(f"生成 {name}...", file=sys.stderr)
+                    write_synthetic(path, lines, args.scheme, args.code2, encoding)
+                yield f"{lines} 行 {name.split('-', 1)[1]}", path
+
+
+def pad(text, width):
+    """按显示宽度（汉字占两格）左对齐"""
+    wide = sum(unicodedata.east_asian_width(char) in "WF" for char in text)
+    return text + " " * max(width - len(text) - wide, 0)
+
+
+def print_table(rows, baseline):
+    header = f"{pad('用例', 40)}{pad('操作', 30)}{'耗时 (s)':>12}"
+    if baseline:
+        header += f"{'基线 (s)':>12}{'比值':>8}"
+    print(header)
+    for case, op, seconds in rows:
+        line = f"{pad(case, 40)}{pad(op, 30)}{seconds:12.4f}"
+        if baseline:
+            old = baseline.get(f"{case}|{op}")
+            if old:
+                line += f"{old:12.4f}{seconds / old:8.2f}"
+            else:
+                line += f"{'-':>12}{'-':>8}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10k,100k", help="词典行数，逗号分隔，如 10k,100k,1M,10M")
+    parser.add_argument("--encodings", default="utf-8", help="文件编码，逗号分隔，如 utf-8,utf-8-sig,gbk,utf-16")
+    parser.add_argument("--formats", default="yaml", help="词典格式，逗号分隔：yaml、txt")
+    parser.add_argument("--scheme", choices=("pinyin", "wubi"), default="pinyin", help="编码方案")
+    parser.add_argument("--code2", action="store_true", help="生成并读取第四列编码2")
+    parser.add_argument("--repeat", type=int, default=1, help="只读操作的重复次数，取中位数")
+    parser.add_argument("--data-dir", help="保留生成的词典的目录，再次运行时直接使用，默认用临时目录")
+    parser.add_argument("--save", help="把结果保存为 JSON，供以后作为基线")
+    parser.add_argument("--baseline", help="之前用 --save 保存的 JSON，只读取其中的耗时用于对比，不会运行旧版代码")
+    args = parser.parse_args()
+    args.sizes = [parse_size(size) for size in args.sizes.split(",")]
+    args.encodings = args.encodings.split(",")
+    args.formats = args.formats.split(",")
+    for fmt in args.formats:
+        if fmt not in FORMAT_SUFFIXES:
+            parser.error(f"未知的格式: {fmt}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        for case, path in case_files(args, data_dir):
+            # 保存会改写文件，在副本上测量，生成的词典可以重复使用
+            work_path = os.path.join(tmp, "work-" + os.path.basename(path))
+            shutil.copyfile(path, work_path)
+            print(f"测量 {case}...", file=sys.stderr)
+            for op, seconds in run_case(work_path, args.code2, args.repeat):
+                rows.append((case, op, seconds))
+            os.remove(work_path)
+
+    print_table(rows, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": sys.version.split()[0],
+                "results": {f"{case}|{op}": seconds for case, op, seconds in rows},
+            }, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""生成合成的 Rime 词典，供基准测试使用
+
+词汇由常用汉字组成，编码可以是带空格分隔的全拼（如 "ni hao"）或按五笔词组规则
+由每个字的四码组合而成（字的四码为按字确定的伪编码），权重近似 Zipf 分布，
+可选第四列编码2（拼音首字母或五笔首字的全码）。同一随机种子总是生成同样的内容。
+
+用法: python benchmarks/synth.py out.dict.yaml [--lines 100000] [--scheme wubi] [--code2] [--encoding gbk]
+扩展名为 .txt 时生成没有 YAML 头部的 TXT 词典。
+"""
+import argparse
+import hashlib
+import os
+import random
+
+# 常用字及其拼音（多音字只取一个读音）
+PINYIN_TABLE = """
+的de 一yi 是shi 不bu 了le 在zai 人ren 有you 我wo 他ta 这zhe 个ge 们men 中zhong 来lai 上shang
+大da 为wei 和he 国guo 地di 到dao 以yi 说shuo 时shi 要yao 就jiu 出chu 会hui 可ke 也ye 你ni
+对dui 生sheng 能neng 而er 子zi 那na 得de 于yu 着zhe 下xia 自zi 之zhi 年nian 过guo 发fa 后hou
+作zuo 里li 用yong 道dao 行xing 所suo 然ran 家jia 种zhong 事shi 成cheng 方fang 多duo 经jing 么me 去qu
+法fa 学xue 如ru 都dou 同tong 现xian 当dang 没mei 动dong 面mian 起qi 看kan 定ding 天tian 分fen 还hai
+进jin 好hao 小xiao 部bu 其qi 些xie 主zhu 样yang 理li 心xin 她ta 本ben 前qian 开kai 但dan 因yin
+只zhi 从cong 想xiang 实shi 日ri 军jun 者zhe 意yi 无wu 力li 它ta 与yu 长chang 把ba 机ji 十shi
+民min 第di 公gong 此ci 已yi 工gong 使shi 情qing 明ming 性xing 知zhi 全quan 三san 又you 关guan 点dian
+正zheng 业ye 外wai 将jiang 两liang 高gao 间jian 由you 问wen 很hen 最zui 重zhong 并bing 物wu 手shou 应ying
+战zhan 向xiang 头tou 文wen 体ti 政zheng 美mei 相xiang 见jian 被bei 利li 什shen 二er 等deng 产chan 或huo
+新xin 己ji 制zhi 身shen 果guo 加jia 西xi 斯si 月yue 话hua 合he 回hui 特te 代dai 内nei 信xin
+表biao 化hua 老lao 给gei 世shi 位wei 次ci 度du 门men 任ren 常chang 先xian 海hai 通tong 教jiao 儿er
+原yuan 东dong 声sheng 提ti 立li 及ji 比bi 员yuan 解jie 水shui 名ming 真zhen 论lun 处chu 走zou 义yi
+各ge 入ru 几ji 口kou 认ren 条tiao 平ping 系xi 气qi 题ti 活huo 尔er 更geng 别bie 打da 女nv
+变bian 四si 神shen 总zong 何he 电dian 数shu 安an 少shao 报bao 才cai 结jie 反fan 受shou 目mu 太tai
+""".split()
+CHARACTERS = [item[0] for item in PINYIN_TABLE]
+PINYIN = {item[0]: item[1:] for item in PINYIN_TABLE}
+WUBI_LETTERS = "abcdefghijklmnopqrstuvwxy"  # 五笔不用 z
+SCHEMES = ("pinyin", "wubi")
+# 写文件时每批的行数
+WRITE_CHUNK = 10000
+
+
+def wubi_char_code(char):
+    """字的伪五笔全码：按字的哈希确定的四个字母，同一个字总是相同"""
+    digest = hashlib.md5(char.encode("utf-8")).digest()
+    return "".join(WUBI_LETTERS[b % len(WUBI_LETTERS)] for b in digest[:4])
+
+
+WUBI = {char: wubi_char_code(char) for char in CHARACTERS}
+
+
+def wubi_word_code(word):
+    """五笔词组取码规则：二字词各取前两码，三字词取前两字首码加末字前两码，四字及以上取一二三末字首码"""
+    codes = [WUBI[char] for char in word]
+    if len(codes) == 1:
+        return codes[0]
+    if len(codes) == 2:
+        return codes[0][:2] + codes[1][:2]
+    if len(codes) == 3:
+        return codes[0][0] + codes[1][0] + codes[2][:2]
+    return codes[0][0] + codes[1][0] + codes[2][0] + codes[-1][0]
+
+
+def random_word(rng):
+    # 二字词最多，单字和三四字词较少
+    length = rng.choices((1, 2, 3, 4), weights=(15, 60, 15, 10))[0]
+    return "".join(rng.choice(CHARACTERS) for _ in range(length))
+
+
+def synthetic_entries(lines, scheme="pinyin", code2=False, seed=0):
+    """产出 lines 条 (词汇, 编码, 权重, 编码2)"""
+    if scheme not in SCHEMES:
+        raise ValueError(f"未知的编码方案: {scheme}")
+    rng = random.Random(seed)
+    for _ in range(lines):
+        word = random_word(rng)
+        if scheme == "pinyin":
+            code = " ".join(PINYIN[char] for char in word)
+            stem = "".join(PINYIN[char][0] for char in word) if code2 else ""
+        else:
+            code = wubi_word_code(word)
+            stem = WUBI[word[0]] if code2 else ""
+        # 近似 Zipf 分布：少数词权重很高，大多数很低
+        weight = int(1_000_000 / rng.paretovariate(1.0))
+        yield word, code, str(weight), stem
+
+
+def write_synthetic(path, lines, scheme="pinyin", code2=False, encoding="utf-8", seed=0):
+    """生成词典文件，扩展名为 .yaml 时带 YAML 头部；返回文件大小（字节）"""
+    with open(path, "w", encoding=encoding, newline="\n") as f:
+        if os.path.splitext(path)[1].lower() == ".yaml":
+            name = os.path.basename(path).split(".")[0]
+            columns = "\n  - text\n  - code\n  - weight" + ("\n  - stem" if code2 else "")
+            f.write(f"---\nname: {name}\nversion: \"1\"\nsort: by_weight\ncolumns:{columns}\n...\n")
+        else:
+            f.write("# 合成词典\n")
+        chunk = []
+        for word, code, weight, stem in synthetic_entries(lines, scheme, code2, seed):
+            chunk.append(f"{word}\t{code}\t{weight}\t{stem}\n" if code2 else f"{word}\t{code}\t{weight}\n")
+            if len(chunk) >= WRITE_CHUNK:
+                f.writelines(chunk)
+                chunk = []
+        f.writelines(chunk)
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="输出文件，.dict.yaml 或 .txt")
+    parser.add_argument("--lines", type=int, default=100_000, help="词条行数")
+    parser.add_argument("--scheme", choices=SCHEMES, default="pinyin", help="编码方案")
+    parser.add_argument("--code2", action="store_true", help="生成第四列编码2")
+    parser.add_argument("--encoding", default="utf-8", help="文件编码，如 utf-8、utf-8-sig、gbk、utf-16")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+    size = write_synthetic(args.output, args.lines, args.scheme, args.code2, args.encoding, args.seed)
+    print(f"已生成 {args.output}: {args.lines} 行，{size / 2 ** 20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
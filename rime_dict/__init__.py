@@ -0,0 +1,54 @@
+"""Rime 词典处理核心功能，可供脚本和批处理直接导入
+
+除界面控件 virtual_tree 外均不依赖 tkinter，导入本包不会加载 tkinter。
+"""
+from .parser import (
+    DEFAULT_WEIGHT,
+    DictEncodingError,
+    DictReader,
+    detect_encoding,
+    iter_dict_entries,
+    load_dict_entries,
+    parse_line,
+    read_dict_header,
+)
+from .analysis import DictAnalysis, analyze, skip_entries
+from .header import DictHeader, build_header, column_layout, parse_header, weight_before_code
+from .cache import ParseCache, cache_enabled
+from .history import EditHistory, EditStep
+from .journal import EditJournal
+from .mapped import MappedDict
+from .deploy import DeployState, deploy_command, deploy_inputs, find_weasel_deployer, run_deploy
+from .extsort import SORT_KEYS, external_sort
+from .formats import SOURCE_FORMATS, TARGET_FORMATS, guess_format, iter_source_entries
+from .model import IMPORT_POLICIES, ChangeSet, DictConflictError, DictModel
+from .multi import kway_merge, merge_dict_files, search_files
+from .perf import Profiler, format_record, profiler
+from .store import EntryStore
+from .tables import DictGraph, TableCache
+from .writer import format_entry, write_dict
+from .tasks import Task, TaskRunner
+from .watcher import InotifyWatcher, PollingWatcher, create_watcher
+
+# 公开接口：命令行、界面和脚本只应依赖这些名字
+__all__ = [
+    "DEFAULT_WEIGHT", "DictEncodingError", "DictReader", "detect_encoding", "iter_dict_entries", "load_dict_entries",
+    "parse_line", "read_dict_header",
+    "DictAnalysis", "analyze", "skip_entries",
+    "DictHeader", "build_header", "column_layout", "parse_header", "weight_before_code",
+    "ParseCache", "cache_enabled",
+    "EditHistory", "EditStep",
+    "EditJournal",
+    "MappedDict",
+    "DeployState", "deploy_command", "deploy_inputs", "find_weasel_deployer", "run_deploy",
+    "SORT_KEYS", "external_sort",
+    "SOURCE_FORMATS", "TARGET_FORMATS", "guess_format", "iter_source_entries",
+    "IMPORT_POLICIES", "ChangeSet", "DictConflictError", "DictModel",
+    "kway_merge", "merge_dict_files", "search_files",
+    "Profiler", "format_record", "profiler",
+    "EntryStore",
+    "DictGraph", "TableCache",
+    "format_entry", "write_dict",
+    "Task", "TaskRunner",
+    "InotifyWatcher", "PollingWatcher", "create_watcher",
+]
@@ -0,0 +1,6 @@
+"""python -m rime_dict：命令行工具入口"""
+import sys
+
+from .cli import main
+
+sys.exit(main())
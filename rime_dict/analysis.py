@@ -0,0 +1,256 @@
+"""重复和冲突分析：一次流式读取一个或多个词典，统计重复词条、权重冲突和重码
+
+词条按编码的哈希分区：同一编码（因此也包括同一词汇和编码）的词条总在同一分区，
+每个分区单独在内存中分析。全部词条放得下 memory_limit 时不写临时文件；放不下时
+把词条分散写入若干临时分区文件，分区仍然过大时换一个哈希再分。
+
+分析时还可以选出去重时应删除的词条（按输入中的序号），再读一遍输入即可写出
+去重后的词典，内存中只保存被删除词条的序号。
+"""
+import heapq
+import os
+import tempfile
+from array import array
+from collections import Counter
+from itertools import chain
+
+from .extsort import DEFAULT_MEMORY_LIMIT, RUN_BUFFER_SIZE, entry_size
+
+
+# 候选数超过这个值的编码视为重码过多（Rime 默认每页 5 个，最多 9 个）
+DEFAULT_MAX_CANDIDATES = 9
+# 各类问题保留的示例条数
+DEFAULT_SAMPLES = 10
+# 每次溢出时分成的分区数
+SPILL_PARTITIONS = 16
+# 每隔多少条按抽到的词条估算一次内存占用，逐条计算太慢
+SIZE_SAMPLE = 64
+# 分析时按编码分组的字典、列表和元组约与词条本身一样大，估算时乘以这个系数
+GROUP_OVERHEAD = 2
+# 再分区的最多层数；同一编码的词条无法再分，超过后直接在内存中分析
+MAX_SPILL_LEVEL = 4
+# 去重方式：entry 为四列完全相同，word-code 为词汇和编码相同
+DEDUPE_KEYS = ("entry", "word-code")
+# word-code 去重时保留哪一条：第一次出现的，或权重最高的
+KEEP_POLICIES = ("first", "max-weight")
+
+
+def weight_digits(weight):
+    """权重的位数（不计前导 0），0 为 0，不是数字时为 -1"""
+    return len(weight.lstrip("0")) if weight.isdecimal() else -1
+
+
+def bucket_name(digits):
+    """权重分布的分组名：非数字、0，或按位数分为 1-9、10-99……"""
+    if digits < 0:
+        return "非数字"
+    return "0" if not digits else f"{10 ** (digits - 1)}-{10 ** digits - 1}"
+
+
+def _weight_value(weight):
+    return int(weight) if weight.isdecimal() else -1
+
+
+class DictAnalysis:
+    """分析结果
+
+    duplicates 为完全重复（四列相同）而多出的词条数；conflicts 为词汇和编码相同
+    但权重不同的组数；candidate_counts 为 {候选数: 编码数}，候选数按不同词汇计；
+    crowded_codes 为候选数超过 max_candidates 的编码数；top_codes 为候选最多的编码；
+    weights 为 {权重位数: 词条数}（见 weight_digits）。drop 为去重时应删除的词条序号（升序），未要求去重时为 None。
+    """
+
+    def __init__(self, max_candidates=DEFAULT_MAX_CANDIDATES, samples=DEFAULT_SAMPLES):
+        self.max_candidates = max_candidates
+        self.samples = samples
+        self.entries = 0
+        self.duplicates = 0
+        self.duplicate_examples = []  # (词条, 出现次数)
+        self.conflicts = 0
+        self.conflict_examples = []  # (词汇, 编码, [权重])
+        self.codes = 0
+        self.candidate_counts = Counter()
+        self.crowded_codes = 0
+        self._top = []  # 候选数最多的编码：(候选数, 编码) 小顶堆
+        self.weights = Counter()
+        self.spilled = False
+        self.drop = None
+
+    @property
+    def top_codes(self):
+        return [(code, count) for count, code in sorted(self._top, reverse=True)]
+
+    def _analyze(self, items, dedupe, keep):
+        """分析一个分区的 (序号, 词条)，序号递增"""
+        by_code = {}
+        for seq, (word, code, weight, code2) in items:
+            by_code.setdefault(code, {}).setdefault(word, []).append((seq, weight, code2))
+        drop = self.drop
+        for code, words in by_code.items():
+            count = len(words)
+            self.codes += 1
+            self.candidate_counts[count] += 1
+            if count > self.max_candidates:
+                self.crowded_codes += 1
+            if len(self._top) < self.samples:
+                heapq.heappush(self._top, (count, code))
+            elif count > self._top[0][0]:
+                heapq.heapreplace(self._top, (count, code))
+            for word, occurrences in words.items():
+                if len(occurrences) > 1:
+                    self._analyze_word(word, code, occurrences, drop, dedupe, keep)
+
+    def _analyze_word(self, word, code, occurrences, drop, dedupe, keep):
+        seen = Counter()
+        for _, weight, code2 in occurrences:
+            seen[(weight, code2)] += 1
+        extra = len(occurrences) - len(seen)
+        if extra:
+            self.duplicates += extra
+            for (weight, code2), times in seen.items():
+                if times > 1 and len(self.duplicate_examples) < self.samples:
+                    self.duplicate_examples.append(((word, code, weight, code2), times))
+        weights = list(dict.fromkeys(weight for _, weight, _ in occurrences))
+        if len(weights) > 1:
+            self.conflicts += 1
+            if len(self.conflict_examples) < self.samples:
+                self.conflict_examples.append((word, code, weights))
+        if dedupe == "entry":
+            kept = set()
+            for seq, weight, code2 in occurrences:
+                if (weight, code2) in kept:
+                    drop.append(seq)
+                else:
+                    kept.add((weight, code2))
+        elif dedupe == "word-code":
+            if keep == "max-weight":
+                # 权重相同时保留先出现的
+                best = max(occurrences, key=lambda item: (_weight_value(item[1]), -item[0]))[0]
+            else:
+                best = occurrences[0][0]
+            drop.extend(seq for seq, _, _ in occurrences if seq != best)
+
+    def report_lines(self):
+        """供命令行输出的文字报告"""
+        lines = [
+            f"词条数: {self.entries}",
+            f"完全重复: {self.duplicates} 条",
+        ]
+        lines += [f"  {word}\t{code}\t{weight}{chr(9) + code2 if code2 else ''}  ×{times}"
+                  for (word, code, weight, code2), times in self.duplicate_examples]
+        lines.append(f"词汇和编码相同但权重不同: {self.conflicts} 组")
+        lines += [f"  {word}\t{code}\t权重 {', '.join(weights)}" for word, code, weights in self.conflict_examples]
+        lines.append(f"编码数: {self.codes}")
+        lines.append(f"候选超过 {self.max_candidates} 个的编码: {self.crowded_codes}")
+        lines.append("候选数分布（候选数: 编码数）:")
+        lines += [f"  {count}: {codes}" for count, codes in sorted(self.candidate_counts.items())]
+        lines.append("候选最多的编码:")
+        lines += [f"  {code}: {count}" for code, count in self.top_codes]
+        lines.append("权重分布:")
+        # 非数字的排在最后
+        lines += [f"  {bucket_name(digits)}: {count}"
+                  for digits, count in sorted(self.weights.items(), key=lambda item: (item[0] < 0, item[0]))]
+        return lines
+
+    def to_dict(self):
+        """供输出 JSON 的字典"""
+        return {
+            "entries": self.entries,
+            "duplicates": self.duplicates,
+            "duplicate_examples": [[list(entry), times] for entry, times in self.duplicate_examples],
+            "conflicts": self.conflicts,
+            "conflict_examples": [[word, code, weights] for word, code, weights in self.conflict_examples],
+            "codes": self.codes,
+            "max_candidates": self.max_candidates,
+            "crowded_codes": self.crowded_codes,
+            "candidate_counts": {str(count): codes for count, codes in sorted(self.candidate_counts.items())},
+            "top_codes": self.top_codes,
+            "weights": {bucket_name(digits): count for digits, count in sorted(self.weights.items())},
+        }
+
+
+def _spill(directory, items, level):
+    """把 (序号, 词条) 按编码的哈希写入 SPILL_PARTITIONS 个临时文件，返回文件路径"""
+    files = []
+    paths = []
+    try:
+        for _ in range(SPILL_PARTITIONS):
+            fd, path = tempfile.mkstemp(suffix=".part", dir=directory)
+            paths.append(path)
+            files.append(open(fd, "w", encoding="utf-8", newline="\n", buffering=RUN_BUFFER_SIZE))
+        for seq, entry in items:
+            # 每层加入不同的盐，上一层落在同一分区的编码这一层会被分开
+            part = files[hash((level, entry[1])) % SPILL_PARTITIONS]
+            part.write(f"{seq}\t" + "\t".join(entry) + "\n")
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+def _read_partition(path):
+    with open(path, "r", encoding="utf-8", newline="\n", buffering=RUN_BUFFER_SIZE) as f:
+        for line in f:
+            seq, word, code, weight, code2 = line[:-1].split("\t")
+            yield int(seq), (word, code, weight, code2)
+
+
+def _process(result, items, directory, level, memory_limit, dedupe, keep):
+    """缓冲 (序号, 词条)，放得下时直接分析，放不下时分区后逐个处理"""
+    buffer = []
+    size = 0
+    items = iter(items)
+    for item in items:
+        buffer.append(item)
+        if not len(buffer) % SIZE_SAMPLE:
+            size += entry_size(item[1]) * SIZE_SAMPLE * GROUP_OVERHEAD
+        if size >= memory_limit and level < MAX_SPILL_LEVEL:
+            result.spilled = True
+            paths = _spill(directory, chain(buffer, items), level)
+            buffer = None
+            for path in paths:
+                _process(result, _read_partition(path), directory, level + 1, memory_limit, dedupe, keep)
+                os.remove(path)
+            return
+    result._analyze(buffer, dedupe, keep)
+
+
+def analyze(entries, max_candidates=DEFAULT_MAX_CANDIDATES, samples=DEFAULT_SAMPLES,
+            memory_limit=DEFAULT_MEMORY_LIMIT, tmp_dir=None, dedupe=None, keep="first"):
+    """一次读取 (词汇, 编码, 权重, 编码2) 序列并分析，返回 DictAnalysis
+
+    dedupe 为 DEDUPE_KEYS 之一时同时选出去重要删除的词条，结果的 drop 为它们在
+    entries 中的序号（从 0 开始，升序）；keep 决定 word-code 去重时保留哪一条。
+    """
+    if dedupe is not None and dedupe not in DEDUPE_KEYS:
+        raise ValueError(f"未知的去重方式: {dedupe}")
+    if keep not in KEEP_POLICIES:
+        raise ValueError(f"未知的保留方式: {keep}")
+    result = DictAnalysis(max_candidates, samples)
+    if dedupe is not None:
+        result.drop = array("q")
+    weights = result.weights
+
+    def numbered():
+        seq = -1
+        for seq, entry in enumerate(entries):
+            weights[weight_digits(entry[2])] += 1
+            yield seq, entry
+        result.entries = seq + 1
+
+    with tempfile.TemporaryDirectory(prefix="rime_dict_analyze_", dir=tmp_dir) as directory:
+        _process(result, numbered(), directory, 0, memory_limit, dedupe, keep)
+    if result.drop is not None:
+        result.drop = array("q", sorted(result.drop))
+    return result
+
+
+def skip_entries(entries, drop):
+    """跳过序号在 drop（升序）中的词条，与 analyze 的 drop 配合写出去重后的词典"""
+    drop = iter(drop)
+    next_drop = next(drop, None)
+    for seq, entry in enumerate(entries):
+        if seq == next_drop:
+            next_drop = next(drop, None)
+            continue
+        yield entry
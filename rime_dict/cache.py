@@ -0,0 +1,159 @@
+"""词典解析结果的二进制缓存
+
+缓存文件以 (绝对路径, 修改时间, 大小, switch_order, enable_code2) 为键，
+内容用 pickle 协议 5 保存：EntryStore 本身就是几个大数组，直接保存；
+词条列表则按列拼接成几个大字符串。热启动时只需反序列化几个大对象，
+比逐行重新解析快得多。
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+
+from .parser import DictData, file_stamp
+
+
+# 缓存格式变化时加一，旧缓存自然失效
+CACHE_VERSION = 3
+# 缓存目录的默认容量上限
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+CACHE_SUFFIX = ".pcache"
+
+
+def default_cache_dir():
+    """缓存目录：可由环境变量 RIME_DICT_CACHE_DIR 指定"""
+    path = os.environ.get("RIME_DICT_CACHE_DIR")
+    if path:
+        return path
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "rime_dict_tools")
+
+
+def cache_enabled():
+    """设置环境变量 RIME_DICT_NO_CACHE 可全局关闭缓存"""
+    return not os.environ.get("RIME_DICT_NO_CACHE")
+
+
+def _pack(data):
+    entries = data.entries
+    store = None
+    columns = []
+    if not isinstance(entries, list):
+        store = entries
+    elif entries:
+        # 字段中不会出现换行符，可以直接用它拼接整列
+        columns = ["\n".join(column) for column in zip(*entries)]
+    return {
+        "version": CACHE_VERSION,
+        "count": len(entries),
+        "store": store,
+        "columns": columns,
+        "header": data.header,
+        "encoding": data.encoding,
+        "offsets": data.offsets,
+        "tombstone_bytes": data.tombstone_bytes,
+    }
+
+
+def _unpack(obj):
+    if obj.get("version") != CACHE_VERSION:
+        return None
+    if obj["store"] is not None:
+        entries = obj["store"]
+    elif obj["count"]:
+        entries = list(zip(*(column.split("\n") for column in obj["columns"])))
+    else:
+        entries = []
+    return DictData(entries, obj["header"], obj["encoding"], obj["offsets"], obj["tombstone_bytes"])
+
+
+class ParseCache:
+    """缓存目录中的解析结果，总大小超过 max_bytes 时删除最久未用的缓存"""
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def _path(self, dict_path, stamp, switch_order, enable_code2):
+        key = repr((os.path.abspath(dict_path), stamp, bool(switch_order), bool(enable_code2)))
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + CACHE_SUFFIX)
+
+    def load(self, dict_path, switch_order=False, enable_code2=False):
+        """返回与文件当前状态一致的缓存（DictData），没有或已损坏时返回 None"""
+        stamp = file_stamp(dict_path)
+        if stamp is None:
+            return None
+        path = self._path(dict_path, stamp, switch_order, enable_code2)
+        try:
+            with open(path, "rb") as f:
+                data = _unpack(pickle.load(f))
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # 缓存损坏或格式不符，删掉重新生成
+            self._remove(path)
+            return None
+        if data is not None:
+            # 更新修改时间，淘汰时按它判断最近是否用过
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return data
+
+    def store(self, dict_path, stamp, switch_order, enable_code2, data):
+        """保存解析结果；stamp 是开始解析前的文件状态，文件在解析期间变化时不保存"""
+        if stamp is None or file_stamp(dict_path) != stamp:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(dict_path, stamp, switch_order, enable_code2)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(_pack(data), f, protocol=5)
+            os.replace(tmp_path, path)
+        except OSError:
+            self._remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """删除最久未用的缓存，直到总大小不超过上限"""
+        files = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        """删除全部缓存"""
+        max_bytes, self.max_bytes = self.max_bytes, -1
+        try:
+            self.evict()
+        finally:
+            self.max_bytes = max_bytes
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,544 @@
+"""命令行工具：不启动界面，直接批量处理词典
+
+用法: python -m rime_dict <子命令> [参数]，各子命令的参数见 python -m rime_dict <子命令> -h。
+批量输入可以是词典文件，也可以用 - 表示标准输入（每行一条 词汇<Tab>编码<Tab>权重[<Tab>编码2]），
+结果默认流式写到标准输出，用 -o 指定文件时原子地写入（可以与输入文件相同）。
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from functools import partial
+
+from .analysis import DEDUPE_KEYS, DEFAULT_MAX_CANDIDATES, DEFAULT_SAMPLES, KEEP_POLICIES, analyze, skip_entries
+from .formats import SOURCE_FORMATS, TARGET_FORMATS, csv_header, csv_layout, guess_format, parse_source_lines
+from .header import build_header, column_layout, comment_header, parse_header
+from .deploy import DeployState, deploy_inputs, run_deploy
+from .extsort import SORT_KEYS, external_sort
+from .mapped import MappedDict
+from .model import IMPORT_POLICIES, DictConflictError, DictModel
+from .multi import MATCHERS, merge_dict_files, search_files
+from .parser import DictReader, detect_encoding, is_yaml_dict, parse_line
+from .perf import format_record, profiler
+from .tables import DictGraph
+from .writer import WRITE_BATCH, atomic_write, format_entry
+
+
+STDIO = "-"
+
+
+class _StdinReader:
+    """标准输入的词条来源，接口与 DictReader 一致（没有头部）"""
+
+    header = ""
+    layout = None
+
+    def __init__(self, enable_code2, source_format="rime"):
+        self.enable_code2 = enable_code2
+        self.source_format = source_format
+        self.encoding = "utf-8"
+        self._file = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig")
+
+    def __iter__(self):
+        if self.source_format != "rime":
+            yield from parse_source_lines(self._file, self.source_format)
+            return
+        for line in self._file:
+            entry = parse_line(line, self.enable_code2)
+            if entry is not None:
+                yield entry
+
+
+class _SourceReader:
+    """其他格式（CSV、搜狗、QQ）的词库文件，接口与 DictReader 一致（没有头部）
+
+    CSV 以表头开始时 layout 为表头声明的列号，convert 据此判断是否有编码2。
+    """
+
+    header = ""
+    layout = None
+
+    def __init__(self, path, source_format):
+        self.path = path
+        self.source_format = source_format
+        self.encoding = detect_encoding(path)
+        if source_format == "csv":
+            with open(path, "r", encoding=self.encoding) as f:
+                self.layout = csv_layout(f.readline())
+
+    def __iter__(self):
+        with open(self.path, "r", encoding=self.encoding) as f:
+            yield from parse_source_lines(f, self.source_format)
+
+
+@contextmanager
+def open_entries(path, enable_code2=False, source_format="rime"):
+    """打开批量输入，返回可迭代出 (词汇, 编码, 权重, 编码2) 的读取器"""
+    if path == STDIO:
+        yield _StdinReader(enable_code2, source_format)
+        return
+    if source_format != "rime":
+        yield _SourceReader(path, source_format)
+        return
+    with DictReader(path, enable_code2) as reader:
+        yield reader
+
+
+def iter_lines(path):
+    """逐行产出输入中去掉首尾空白后的非空文本"""
+    if path == STDIO:
+        f = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig")
+        yield from (line.strip() for line in f if line.strip())
+        return
+    with open(path, "r", encoding=detect_encoding(path)) as f:
+        yield from (line.strip() for line in f if line.strip())
+
+
+@contextmanager
+def open_output(path, encoding="utf-8"):
+    """打开文本输出：- 为标准输出，否则原子地写入文件"""
+    if path in (None, STDIO):
+        out = io.TextIOWrapper(sys.stdout.buffer, encoding=encoding, newline="", write_through=False)
+        try:
+            yield out
+        finally:
+            out.flush()
+            out.detach()
+        return
+    with atomic_write(path) as f:
+        out = io.TextIOWrapper(f, encoding=encoding, newline="")
+        yield out
+        out.flush()
+        out.detach()
+
+
+def write_entries(out, entries, switch_order=False, enable_code2=False, formatter=format_entry, layout=None):
+    """分批把词条写到文本输出，返回写出的条数
+
+    formatter 为 TARGET_FORMATS 中的单行格式化函数；layout 为输出头部 columns 对应的列号，
+    给出时按它的列次序写出（见 format_entry）。
+    """
+    count = 0
+    batch = []
+    for entry in entries:
+        batch.append(formatter(entry, switch_order, enable_code2, layout))
+        if len(batch) >= WRITE_BATCH:
+            out.write("".join(batch))
+            count += len(batch)
+            batch.clear()
+    out.write("".join(batch))
+    return count + len(batch)
+
+
+def report(text):
+    print(text, file=sys.stderr)
+
+
+def unique(entries, key=None, seen=None):
+    """去掉重复词条，保留第一次出现的那条；seen 可在多次调用间共享"""
+    if seen is None:
+        seen = set()
+    for entry in entries:
+        k = entry if key is None else key(entry)
+        if k not in seen:
+            seen.add(k)
+            yield entry
+
+
+def word_code(entry):
+    """--key word-code 去重时比较的内容：词汇和编码"""
+    return entry[0], entry[1]
+
+
+# ---- 子命令 ----
+
+def cmd_add(args):
+    model = DictModel(args.dict, args.switch_order, args.code2).load()
+    added = skipped = 0
+    with open_entries(args.input, args.code2) as reader:
+        for word, code, weight, code2 in reader:
+            if model.find((word, code, weight, code2 if args.code2 else "")):
+                skipped += 1
+                continue
+            model.add(word, code, weight, code2)
+            added += 1
+    if added:
+        model.save()
+    report(f"添加 {added} 条，跳过 {skipped} 条已存在的词条")
+
+
+def cmd_import(args):
+    model = DictModel(args.dict, args.switch_order, args.code2).load()
+    with open_entries(args.input, args.code2, args.format) as reader:
+        result = model.import_entries(reader, args.policy)
+    if model.dirty:
+        model.save()
+    rate = result.read / result.seconds if result.seconds else 0
+    report(f"读取 {result.read} 条，用时 {result.seconds:.2f} 秒（{rate:.0f} 条/秒）")
+    report(f"新增 {result.added} 条，更新 {result.updated} 条，跳过 {result.skipped} 条，编码冲突 {result.conflicts} 条")
+
+
+def cmd_delete(args):
+    model = DictModel(args.dict, args.switch_order, args.code2).load()
+    ids = []
+    if args.by == "entry":
+        with open_entries(args.input, args.code2) as reader:
+            for entry in reader:
+                ids.extend(model.find(entry))
+    else:
+        lookup = model.ids_by_code if args.by == "code" else model.ids_by_word
+        for key in iter_lines(args.input):
+            ids.extend(lookup(key))
+    deleted = model.delete(ids)
+    if deleted:
+        model.save()
+    report(f"删除 {deleted} 条词条")
+
+
+def cmd_query(args):
+    if args.mmap:
+        model = MappedDict(args.dict, args.switch_order, args.code2).load()
+        search = partial(model.query, mode=args.mode)
+    else:
+        model = DictModel(args.dict, args.switch_order, args.code2).load()
+        search = {
+            "exact": model.lookup,
+            "prefix": model.search_prefix,
+            "partial": model.search_partial,
+        }[args.mode]
+    # 导入的词典共用一个缓存，多次查询时每个词典只解析一次
+    graph = DictGraph(args.dict, enable_code2=args.code2) if args.imports else None
+    if graph is not None and graph.missing:
+        report("找不到导入的词典: " + ", ".join(graph.missing))
+    texts = args.text or iter_lines(STDIO)
+    try:
+        with open_output(args.output, args.encoding) as out:
+            for text in texts:
+                entries = (model.get(entry_id) for entry_id in search(text))
+                write_entries(out, entries, args.switch_order, args.code2)
+                if graph:
+                    imported = (entry for _, entry in graph.search(text, args.mode))
+                    write_entries(out, imported, args.switch_order, args.code2)
+    finally:
+        if model.read_only:
+            model.close()
+        if graph is not None:
+            graph.cache.close()
+
+
+def cmd_search(args):
+    results, errors = search_files(args.dicts, args.text, args.mode, args.code2)
+    with open_output(args.output, args.encoding) as out:
+        for path, entry in results:
+            out.write(f"{path}\t{format_entry(entry, args.switch_order, args.code2)}")
+    for path, error in errors:
+        report(f"无法读取 {path}: {error}")
+    report(f"在 {len(args.dicts)} 个词典中找到 {len(results)} 条")
+
+
+def header_layout(path, header):
+    """输入词典头部 columns 对应的列号，写出时沿用；txt 或没有声明时为 None"""
+    if path == STDIO or not is_yaml_dict(path):
+        return None
+    return column_layout(parse_header(header).columns)
+
+
+def cmd_merge(args):
+    if args.sorted:
+        header, entries = merge_dict_files(args.inputs, enable_code2=args.code2)
+        with open_output(args.output, args.encoding) as out:
+            out.write(header)
+            count = write_entries(out, entries, args.switch_order, args.code2,
+                                  layout=header_layout(args.inputs[0], header))
+        report(f"归并 {len(args.inputs)} 个词典，共 {count} 条")
+        return
+    seen = set()
+    count = 0
+    layout = None
+    with open_output(args.output, args.encoding) as out:
+        for i, path in enumerate(args.inputs):
+            with open_entries(path, args.code2) as reader:
+                if i == 0:
+                    out.write(reader.header)
+                    layout = reader.layout
+                count += write_entries(out, unique(reader, seen=seen), args.switch_order, args.code2,
+                                       layout=layout)
+    report(f"合并 {len(args.inputs)} 个词典，共 {count} 条")
+
+
+def iter_inputs(paths, enable_code2=False):
+    """依次产出多个输入的词条；可以多次调用，每次重新读取"""
+    for path in paths:
+        with open_entries(path, enable_code2) as reader:
+            yield from reader
+
+
+def cmd_dedupe(args):
+    if args.inputs == [STDIO]:
+        if args.keep != "first":
+            raise ValueError("--keep max-weight 需要输入文件，标准输入只能读一次")
+        with open_entries(STDIO, args.code2) as reader, open_output(args.output, args.encoding) as out:
+            total = 0
+
+            def counted():
+                nonlocal total
+                for entry in reader:
+                    total += 1
+                    yield entry
+
+            key = word_code if args.key == "word-code" else None
+            count = write_entries(out, unique(counted(), key), args.switch_order, args.code2, layout=reader.layout)
+        report(f"保留 {count} 条，去掉 {total - count} 条重复")
+        return
+    if STDIO in args.inputs:
+        raise ValueError("多个输入时不能使用标准输入")
+    # 第一遍分区分析选出要删除的词条序号，第二遍跳过它们写出，内存只与删除的条数有关
+    result = analyze(iter_inputs(args.inputs, args.code2), memory_limit=int(args.memory * 1024 * 1024),
+                     tmp_dir=args.tmp_dir, dedupe=args.key, keep=args.keep)
+    with open_entries(args.inputs[0], args.code2) as reader:
+        header, layout = reader.header, reader.layout
+    with open_output(args.output, args.encoding) as out:
+        out.write(header)
+        count = write_entries(out, skip_entries(iter_inputs(args.inputs, args.code2), result.drop),
+                              args.switch_order, args.code2, layout=layout)
+    report(f"保留 {count} 条，去掉 {len(result.drop)} 条重复")
+
+
+def cmd_analyze(args):
+    if STDIO in args.inputs and len(args.inputs) > 1:
+        raise ValueError("多个输入时不能使用标准输入")
+    result = analyze(iter_inputs(args.inputs, args.code2), args.max_candidates, args.samples,
+                     int(args.memory * 1024 * 1024), args.tmp_dir)
+    with open_output(args.output) as out:
+        if args.json:
+            json.dump(result.to_dict(), out, ensure_ascii=False, indent=1)
+            out.write("\n")
+        else:
+            out.write("".join(line + "\n" for line in result.report_lines()))
+
+
+def cmd_sort(args):
+    memory_limit = int(args.memory * 1024 * 1024)
+    with open_entries(args.input, args.code2) as reader, open_output(args.output, args.encoding) as out:
+        out.write(reader.header)
+        entries = external_sort(reader, args.key, memory_limit, args.tmp_dir)
+        count = write_entries(out, entries, args.switch_order, args.code2, layout=reader.layout)
+    report(f"排序 {count} 条")
+
+
+def convert_header(reader, args, target, enable_code2):
+    """转换输出的头部和列次序：返回 (头部, layout)，layout 为 None 时按 --switch-order 写出"""
+    if args.no_header:
+        return "", None
+    if target == "csv":
+        return csv_header(args.switch_order, enable_code2), None
+    if target != "rime":
+        return "", None
+    source_yaml = args.input != STDIO and is_yaml_dict(args.input)
+    if args.output == STDIO or not is_yaml_dict(args.output):
+        # txt 的头部只能是注释
+        return (comment_header(reader.header) if source_yaml else reader.header), None
+    if source_yaml:
+        # 保留原头部，列次序按其中的 columns 写出，否则 Rime 会读错列
+        return reader.header, reader.layout
+    name = os.path.basename(args.output).split(".")[0]
+    return build_header(name, args.switch_order, enable_code2, reader.header), None
+
+
+def cmd_convert(args):
+    source_format = args.source_format or (guess_format(args.input) if args.input != STDIO else "rime")
+    target = args.target_format or (guess_format(args.output) if args.output != STDIO else "rime")
+    with open_entries(args.input, args.code2, source_format) as reader, \
+            open_output(args.output, args.encoding) as out:
+        # 头部的 columns 或 CSV 表头声明了 stem 列时自动读写编码2，否则这一列会在转换中丢失
+        enable_code2 = args.code2 or (reader.layout is not None and reader.layout[3] >= 0)
+        reader.enable_code2 = enable_code2
+        header, layout = convert_header(reader, args, target, enable_code2)
+        out.write(header)
+        count = write_entries(out, reader, args.switch_order, enable_code2, TARGET_FORMATS[target], layout)
+    report(f"转换 {count} 条")
+
+
+def cmd_stats(args):
+    codes = Counter()
+    words = set()
+    entries = set()
+    total = duplicates = 0
+    with open_entries(args.input, args.code2) as reader:
+        for entry in reader:
+            total += 1
+            codes[entry[1]] += 1
+            words.add(entry[0])
+            if entry in entries:
+                duplicates += 1
+            else:
+                entries.add(entry)
+        encoding = reader.encoding
+        header_lines = reader.header.count("\n")
+    stats = [
+        ("编码", encoding),
+        ("头部行数", header_lines),
+        ("词条数", total),
+        ("不同词汇", len(words)),
+        ("不同编码", len(codes)),
+        ("重码编码", sum(1 for count in codes.values() if count > 1)),
+        ("完全重复词条", duplicates),
+    ]
+    with open_output(args.output) as out:
+        for name, value in stats:
+            out.write(f"{name}: {value}\n")
+
+
+def cmd_deploy(args):
+    state = DeployState(args.state)
+    needed, digests = state.check(deploy_inputs(args.dicts))
+    if not needed and not args.force:
+        report("词典内容自上次部署成功后没有变化，跳过部署")
+        return
+    run_deploy(args.command)
+    state.record(digests)
+    report(f"部署完成，记录 {len(digests)} 个词典的内容哈希")
+
+
+# ---- 参数 ----
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m rime_dict", description="Rime 词典命令行工具")
+    parser.add_argument("--profile", nargs="?", const="", metavar="LOG",
+                        help="把各步骤的耗时和内存峰值输出到标准错误，给出 LOG 时同时以 JSON lines 追加到该文件")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--switch-order", action="store_true", help="输出按 词汇 权重 编码 的次序")
+    common.add_argument("--code2", action="store_true", help="读写第四列编码2")
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("-o", "--output", default=STDIO, help="输出文件，默认标准输出")
+    output.add_argument("--encoding", default="utf-8", help="输出编码，默认 utf-8")
+
+    p = subparsers.add_parser("add", parents=[common], help="批量添加词条")
+    p.add_argument("dict", help="要修改的词典")
+    p.add_argument("input", nargs="?", default=STDIO, help="待添加的词条，默认标准输入")
+    p.set_defaults(func=cmd_add)
+
+    p = subparsers.add_parser("import", parents=[common], help="批量导入词库，只写一次文件")
+    p.add_argument("dict", help="要导入到的词典")
+    p.add_argument("input", nargs="?", default=STDIO, help="待导入的词库，默认标准输入（Rime 格式）")
+    p.add_argument("--format", choices=tuple(SOURCE_FORMATS), default="rime", help="词库格式，默认 rime")
+    p.add_argument("--policy", choices=IMPORT_POLICIES, default="skip",
+                   help="编码已存在时：跳过、覆盖、两条都保留或保留权重较高的，默认跳过")
+    p.set_defaults(func=cmd_import)
+
+    p = subparsers.add_parser("delete", parents=[common], help="批量删除词条")
+    p.add_argument("dict", help="要修改的词典")
+    p.add_argument("input", nargs="?", default=STDIO, help="待删除的词条或编码/词汇，默认标准输入")
+    p.add_argument("--by", choices=("entry", "code", "word"), default="entry",
+                   help="按完整词条、编码或词汇删除，默认完整词条")
+    p.set_defaults(func=cmd_delete)
+
+    p = subparsers.add_parser("query", parents=[common, output], help="查询词条")
+    p.add_argument("dict", help="要查询的词典")
+    p.add_argument("text", nargs="*", help="查询内容，省略时从标准输入逐行读取")
+    p.add_argument("--mode", choices=("exact", "prefix", "partial"), default="exact",
+                   help="全匹配、编码前缀匹配或部分匹配，默认全匹配")
+    p.add_argument("--mmap", action="store_true",
+                   help="映射文件直接查询，不整体解析；适合只查询几次的大词典")
+    p.add_argument("--imports", action="store_true", help="同时查询 import_tables 导入的词典")
+    p.set_defaults(func=cmd_query)
+
+    p = subparsers.add_parser("search", parents=[common, output], help="并行查询多个词典，结果前标出所在词典")
+    p.add_argument("text", help="查询内容")
+    p.add_argument("dicts", nargs="+", help="要查询的词典")
+    p.add_argument("--mode", choices=tuple(MATCHERS), default="exact",
+                   help="全匹配、编码前缀匹配或部分匹配，默认全匹配")
+    p.set_defaults(func=cmd_search)
+
+    p = subparsers.add_parser("merge", parents=[common, output], help="合并多个词典并去掉完全重复的词条")
+    p.add_argument("inputs", nargs="+", help="输入词典，按次序合并，头部取自第一个")
+    p.add_argument("--sorted", action="store_true",
+                   help="输入都已按编码排序：逐条归并，输出仍有序且不必把词条全部留在内存中")
+    p.set_defaults(func=cmd_merge)
+
+    p = subparsers.add_parser("dedupe", parents=[common, output], help="去掉重复词条，可同时合并多个词典")
+    p.add_argument("inputs", nargs="*", default=[STDIO], help="输入词典，按次序读取，头部取自第一个；默认标准输入")
+    p.add_argument("--key", choices=DEDUPE_KEYS, default="entry",
+                   help="entry: 四列完全相同；word-code: 词汇和编码相同，默认 entry")
+    p.add_argument("--keep", choices=KEEP_POLICIES, default="first",
+                   help="word-code 去重时保留第一次出现的或权重最高的，默认第一次出现的")
+    p.add_argument("--memory", type=float, default=256,
+                   help="内存预算（MiB），超出时按编码分区写入临时文件，默认 256")
+    p.add_argument("--tmp-dir", help="临时文件目录，默认系统临时目录")
+    p.set_defaults(func=cmd_dedupe)
+
+    p = subparsers.add_parser("sort", parents=[common, output], help="排序词条")
+    p.add_argument("input", nargs="?", default=STDIO, help="输入词典，默认标准输入")
+    p.add_argument("--key", choices=tuple(SORT_KEYS), default="code", help="按编码、词汇或权重（从高到低）排序")
+    p.add_argument("--memory", type=float, default=256,
+                   help="内存预算（MiB），超出时把有序段写入临时文件再归并，默认 256")
+    p.add_argument("--tmp-dir", help="临时文件目录，默认系统临时目录")
+    p.set_defaults(func=cmd_sort)
+
+    p = subparsers.add_parser("convert", parents=[common, output],
+                              help="转换格式、列次序和编码；头部或 CSV 表头声明了 stem 列时自动保留编码2，词条间的注释行不保留")
+    p.add_argument("input", nargs="?", default=STDIO, help="输入词典，默认标准输入")
+    p.add_argument("--from", dest="source_format", choices=tuple(SOURCE_FORMATS),
+                   help="输入格式，默认按扩展名：.csv 为 csv，其余为 rime")
+    p.add_argument("--to", dest="target_format", choices=tuple(TARGET_FORMATS),
+                   help="输出格式，默认按输出文件的扩展名；输出为 .dict.yaml 而输入没有 YAML 头部时生成头部")
+    p.add_argument("--no-header", action="store_true", help="不输出文件头部")
+    p.set_defaults(func=cmd_convert)
+
+    p = subparsers.add_parser("stats", parents=[common], help="统计词条、编码和重复情况")
+    p.add_argument("input", nargs="?", default=STDIO, help="输入词典，默认标准输入")
+    p.add_argument("-o", "--output", default=STDIO, help="输出文件，默认标准输出")
+    p.set_defaults(func=cmd_stats)
+
+    p = subparsers.add_parser("analyze", parents=[common],
+                              help="分析重复词条、权重冲突、每个编码的候选数和权重分布")
+    p.add_argument("inputs", nargs="*", default=[STDIO], help="输入词典，可以多个，合在一起分析；默认标准输入")
+    p.add_argument("-o", "--output", default=STDIO, help="输出文件，默认标准输出")
+    p.add_argument("--max-candidates", type=int, default=DEFAULT_MAX_CANDIDATES,
+                   help=f"统计候选数超过这个值的编码，默认 {DEFAULT_MAX_CANDIDATES}")
+    p.add_argument("--samples", type=int, default=DEFAULT_SAMPLES,
+                   help=f"每类问题列出的示例数，默认 {DEFAULT_SAMPLES}")
+    p.add_argument("--memory", type=float, default=256,
+                   help="内存预算（MiB），超出时按编码分区写入临时文件，默认 256")
+    p.add_argument("--tmp-dir", help="临时文件目录，默认系统临时目录")
+    p.add_argument("--json", action="store_true", help="以 JSON 输出")
+    p.set_defaults(func=cmd_analyze)
+
+    p = subparsers.add_parser("deploy", help="部署 Rime；给出的词典（含导入的词典）自上次部署成功后没有变化时跳过")
+    p.add_argument("dicts", nargs="*", help="要检查的词典，省略时总是部署")
+    p.add_argument("--command", help="部署命令，默认取环境变量 RIME_DICT_DEPLOY_COMMAND，都没有时为小狼毫的部署程序")
+    p.add_argument("--force", action="store_true", help="内容没有变化也部署")
+    p.add_argument("--state", help="记录上次部署内容哈希的文件，默认在缓存目录下")
+    p.set_defaults(func=cmd_deploy)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.profile is not None:
+        profiler.enable(args.profile)
+    else:
+        profiler.enable_from_env()
+    if profiler.enabled:
+        profiler.listeners.append(lambda record: report(format_record(record)))
+    try:
+        with profiler.timer(args.command):
+            args.func(args)
+    except BrokenPipeError:
+        # 输出接到 head 等提前退出的程序时安静地结束，退出时也不再向已关闭的管道写入
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    except subprocess.CalledProcessError as e:
+        report(f"错误: 部署命令返回 {e.returncode}")
+        return 1
+    except (OSError, ValueError, DictConflictError) as e:
+        report(f"错误: {e}")
+        return 1
+    return 0
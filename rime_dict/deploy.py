@@ -0,0 +1,137 @@
+"""部署 Rime：可配置的部署命令，以及词典内容没有变化时跳过部署
+
+部署会重新编译全部方案和词典，方案较大时要几分钟。DeployState 记录上次部署成功时
+各词典内容的哈希，内容都没变时不必再部署。哈希按文件标记（修改时间和大小）缓存，
+没有改动的文件不会重复读取。
+
+部署命令默认为小狼毫的 WeaselDeployer.exe /deploy，可用环境变量 RIME_DICT_DEPLOY_COMMAND
+（或界面配置文件、命令行参数）换成其他命令，如 Linux 上用来测试的脚本。
+"""
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import threading
+
+from .cache import default_cache_dir
+from .parser import file_stamp
+from .perf import profiler
+from .tables import DictGraph
+from .writer import atomic_write
+
+
+DEPLOY_COMMAND_ENV = "RIME_DICT_DEPLOY_COMMAND"
+# 注册表中找不到小狼毫时部署程序的默认位置
+DEFAULT_WEASEL_DEPLOYER = r"D:\\soft\\Rime\Weasel-0.16.3\\WeaselDeployer.exe"
+# 计算哈希时每次读取的字节数
+HASH_CHUNK = 1024 * 1024
+
+
+def find_weasel_deployer():
+    """查找小狼毫部署程序的路径"""
+    try:
+        # 尝试使用注册表找到小狼毫安装路径
+        import winreg
+        key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\\Rime\Weasel", 0, winreg.KEY_READ)
+        weasel_path = winreg.QueryValueEx(key, "WeaselRoot")[0]
+        return os.path.join(weasel_path, "WeaselDeployer.exe")
+    except Exception:
+        # 如果注册表查找失败，使用默认路径
+        return DEFAULT_WEASEL_DEPLOYER
+
+
+def deploy_command(command=None):
+    """部署命令的参数列表：依次取 command、环境变量 RIME_DICT_DEPLOY_COMMAND，都没有时为小狼毫的部署程序"""
+    command = command or os.environ.get(DEPLOY_COMMAND_ENV)
+    if not command:
+        return [find_weasel_deployer(), "/deploy"]
+    if os.name != "nt":
+        return shlex.split(command)
+    # Windows 的路径含反斜杠，不按 POSIX 规则转义；非 POSIX 模式会保留引号，需要去掉
+    return [part[1:-1] if len(part) >= 2 and part[0] == part[-1] == '"' else part
+            for part in shlex.split(command, posix=False)]
+
+
+def run_deploy(command=None):
+    """运行部署命令并等待结束（会阻塞，应在后台线程调用）
+
+    找不到部署程序时抛出 FileNotFoundError，命令返回非 0 时抛出 subprocess.CalledProcessError。
+    """
+    args = deploy_command(command)
+    if not args or shutil.which(args[0]) is None:
+        raise FileNotFoundError(f"找不到部署程序: {args[0] if args else command}")
+    with profiler.timer("deploy"):
+        subprocess.run(args, check=True)
+
+
+def deploy_inputs(dict_paths, search_dirs=()):
+    """部署时会编译的词典：dict_paths 及其 import_tables 递归导入的词典，去掉重复的"""
+    paths = {}
+    for dict_path in dict_paths:
+        if not os.path.exists(dict_path):
+            continue
+        paths.setdefault(os.path.abspath(dict_path), None)
+        for _, table_path in DictGraph(dict_path, search_dirs).tables:
+            paths.setdefault(os.path.abspath(table_path), None)
+    return list(paths)
+
+
+def file_digest(path):
+    """文件内容的 BLAKE2b 哈希（十六进制）"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def default_state_path():
+    return os.path.join(default_cache_dir(), "deploy.json")
+
+
+class DeployState:
+    """上次部署成功时各词典的内容哈希，保存在 state_path（默认为缓存目录下的 deploy.json）"""
+
+    def __init__(self, state_path=None):
+        self.state_path = state_path or default_state_path()
+        self._digests = {}  # 绝对路径 -> (文件标记, 哈希)
+        self._lock = threading.Lock()
+
+    def digests(self, paths):
+        """各文件当前的 {绝对路径: 哈希}，文件不存在时哈希为 None"""
+        result = {}
+        with self._lock:
+            for path in paths:
+                path = os.path.abspath(path)
+                stamp = file_stamp(path)
+                cached = self._digests.get(path)
+                if stamp is None:
+                    digest = None
+                elif cached is not None and cached[0] == stamp:
+                    digest = cached[1]
+                else:
+                    digest = file_digest(path)
+                    self._digests[path] = (stamp, digest)
+                result[path] = digest
+        return result
+
+    def last_deployed(self):
+        """上次部署成功时记录的 {绝对路径: 哈希}，没有记录时为空字典"""
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("files", {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def check(self, paths):
+        """返回 (是否需要部署, 当前哈希)；没有给出词典时总是需要部署"""
+        digests = self.digests(paths)
+        return not digests or digests != self.last_deployed(), digests
+
+    def record(self, digests):
+        """部署成功后记录这次的哈希"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        with atomic_write(self.state_path) as f:
+            f.write(json.dumps({"files": digests}, ensure_ascii=False, indent=1).encode("utf-8"))
@@ -0,0 +1,92 @@
+"""按内存预算进行的外部归并排序，可排序比内存还大的词典"""
+import heapq
+import os
+import sys
+import tempfile
+from operator import itemgetter
+
+
+# 默认内存预算：缓冲的词条超过这个大小就排序后写入临时文件
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+# 一次最多同时归并的临时文件数，超过时先分批归并成更长的有序段
+MAX_MERGE_FILES = 64
+# 读写临时文件的缓冲区大小
+RUN_BUFFER_SIZE = 1024 * 1024
+
+
+def _weight_descending(entry):
+    weight = entry[2]
+    # 权重从高到低，不是数字的权重排在最后
+    return (0, -int(weight)) if weight.isdecimal() else (1, 0)
+
+
+# 排序方式 -> 键函数；排序是稳定的，键相同的词条保持原来的先后次序
+SORT_KEYS = {
+    "code": itemgetter(1),
+    "word": itemgetter(0),
+    "weight": _weight_descending,
+}
+
+
+def entry_size(entry):
+    """词条元组及其字符串在内存中占用的字节数"""
+    return sys.getsizeof(entry) + sum(map(sys.getsizeof, entry))
+
+
+def _write_run(directory, entries):
+    """把一段有序词条写入临时文件（每行四列，以制表符分隔），返回文件路径"""
+    fd, path = tempfile.mkstemp(suffix=".run", dir=directory)
+    with open(fd, "w", encoding="utf-8", newline="\n", buffering=RUN_BUFFER_SIZE) as f:
+        f.writelines("\t".join(entry) + "\n" for entry in entries)
+    return path
+
+
+def _read_run(path):
+    with open(path, "r", encoding="utf-8", newline="\n", buffering=RUN_BUFFER_SIZE) as f:
+        for line in f:
+            yield tuple(line[:-1].split("\t"))
+
+
+def external_sort(entries, key="code", memory_limit=DEFAULT_MEMORY_LIMIT, tmp_dir=None):
+    """排序 (词汇, 编码, 权重, 编码2) 序列，逐条产出结果
+
+    词条先缓冲在内存中，估计占用超过 memory_limit 字节时排序并写入临时文件，
+    最后用 heapq.merge 归并所有临时文件；全部放得下时直接在内存中排序。
+    临时文件建在 tmp_dir（默认为系统临时目录）下，迭代结束或中止时删除。
+    """
+    key_func = SORT_KEYS[key] if isinstance(key, str) else key
+    buffer = []
+    size = 0
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="rime_dict_sort_", dir=tmp_dir) as directory:
+        for entry in entries:
+            buffer.append(entry)
+            size += entry_size(entry)
+            if size >= memory_limit:
+                buffer.sort(key=key_func)
+                runs.append(_write_run(directory, buffer))
+                buffer = []
+                size = 0
+        buffer.sort(key=key_func)
+        if not runs:
+            yield from buffer
+            return
+        if buffer:
+            runs.append(_write_run(directory, buffer))
+            buffer = []
+        # 临时文件过多时分批归并，避免同时打开太多文件；保持次序使排序仍然稳定
+        while len(runs) > MAX_MERGE_FILES:
+            merged = []
+            for i in range(0, len(runs), MAX_MERGE_FILES):
+                group = runs[i:i + MAX_MERGE_FILES]
+                merged.append(_write_run(directory, heapq.merge(*map(_read_run, group), key=key_func)))
+                for path in group:
+                    os.remove(path)
+            runs = merged
+        readers = [_read_run(path) for path in runs]
+        try:
+            yield from heapq.merge(*readers, key=key_func)
+        finally:
+            # 提前中止时先关闭临时文件，Windows 上才能删除临时目录
+            for reader in readers:
+                reader.close()
@@ -0,0 +1,147 @@
+"""其他输入法导出的文本词库格式，以及转换时各格式的读取和写出
+
+读取和写出都按格式名登记在 SOURCE_FORMATS 和 TARGET_FORMATS 中：前者为单行解析函数，
+后者为单行格式化函数，新增格式时各加一个函数即可，转换流程不用改动。
+"""
+import csv
+import os
+
+from .header import column_layout
+from .parser import DEFAULT_WEIGHT, detect_encoding, iter_dict_entries
+from .writer import format_entry
+
+
+# CSV 表头的列名，与 Rime 头部 columns 的列名相同
+CSV_COLUMNS = ("text", "code", "weight", "stem")
+
+
+def _pinyin_code(text):
+    """'ni'hao 形式的拼音转换为 Rime 的 ni hao"""
+    return " ".join(syllable for syllable in text.split("'") if syllable)
+
+
+def parse_sogou_line(line):
+    """搜狗拼音导出的词库：'ni'hao 你好"""
+    parts = line.split(None, 1)
+    if len(parts) < 2 or not parts[0].startswith("'"):
+        return None
+    return (parts[1].strip(), _pinyin_code(parts[0]), DEFAULT_WEIGHT, "")
+
+
+def parse_qq_line(line):
+    """QQ 拼音导出的词库：ni'hao 你好 1（最后一列为词频，可省略）"""
+    parts = line.split()
+    if len(parts) < 2 or parts[0].startswith("#"):
+        return None
+    weight = parts[2] if len(parts) >= 3 and parts[2].isdecimal() else DEFAULT_WEIGHT
+    return (parts[1], _pinyin_code(parts[0]), weight, "")
+
+
+def parse_csv_line(line):
+    """CSV：词汇,编码,权重[,编码2]，第二列为数字时视为 词汇,权重,编码；跳过表头行"""
+    line = line.rstrip("\r\n")
+    if not line or line[0] == "#":
+        return None
+    # 只有含引号的行才需要按 CSV 规则解析，其余直接分割
+    fields = next(csv.reader((line,))) if '"' in line else line.split(",")
+    count = len(fields)
+    if count < 2 or fields[0] == CSV_COLUMNS[0]:
+        return None
+    word = fields[0].strip()
+    second = fields[1].strip()
+    third = fields[2].strip() if count >= 3 else ""
+    code2 = fields[3].strip() if count >= 4 else ""
+    if second.isdecimal() and third:
+        return (word, third, second, code2)
+    return (word, second, third or DEFAULT_WEIGHT, code2)
+
+
+def csv_layout(line):
+    """CSV 表头行（见 csv_header）声明的列号，与 header.column_layout 相同；不是表头时返回 None"""
+    fields = [field.strip() for field in line.rstrip("\r\n").lstrip("\ufeff").split(",")]
+    if fields[0] != CSV_COLUMNS[0]:
+        return None
+    return column_layout(fields)
+
+
+# 格式名 -> 单行解析函数；rime 为 Rime 词典（.dict.yaml 或制表符分隔的 txt）
+SOURCE_FORMATS = {
+    "rime": None,
+    "csv": parse_csv_line,
+    "sogou": parse_sogou_line,
+    "qq": parse_qq_line,
+}
+
+
+def iter_source_entries(path, source_format="rime", enable_code2=False):
+    """逐条产出待导入文件中的 (词汇, 编码, 权重, 编码2)"""
+    if SOURCE_FORMATS[source_format] is None:
+        yield from iter_dict_entries(path, enable_code2)
+        return
+    with open(path, "r", encoding=detect_encoding(path)) as f:
+        yield from parse_source_lines(f, source_format)
+
+
+def parse_source_lines(lines, source_format):
+    """用 source_format（不能是 rime）的解析函数逐行解析，跳过没有词汇或编码的行"""
+    parse = SOURCE_FORMATS[source_format]
+    for line in lines:
+        entry = parse(line)
+        if entry is not None and entry[0] and entry[1]:
+            yield entry
+
+
+def guess_format(path):
+    """按扩展名猜测格式：.csv 为 csv，其余为 rime；搜狗和 QQ 的 txt 无法与 Rime 的 txt 区分"""
+    return "csv" if os.path.splitext(path)[1].lower() == ".csv" else "rime"
+
+
+# ---- 写出 ----
+
+def _csv_field(text):
+    if "," in text or '"' in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def format_csv_entry(entry, switch_order=False, enable_code2=False, layout=None):
+    """CSV 的一行，列的次序与没有 layout 时的 format_entry 相同（与 csv_header 对应）"""
+    word, code, weight, code2 = entry
+    word, code = _csv_field(word), _csv_field(code)
+    fields = [word, weight, code] if switch_order else [word, code, weight]
+    if enable_code2:
+        fields.append(_csv_field(code2))
+    return ",".join(fields) + "\n"
+
+
+def _apostrophe_code(code):
+    """Rime 的 ni hao 转换为 ni'hao"""
+    return "'".join(code.split())
+
+
+def format_sogou_entry(entry, switch_order=False, enable_code2=False, layout=None):
+    """搜狗拼音的一行：'ni'hao 你好（没有权重）"""
+    return f"'{_apostrophe_code(entry[1])} {entry[0]}\n"
+
+
+def format_qq_entry(entry, switch_order=False, enable_code2=False, layout=None):
+    """QQ 拼音的一行：ni'hao 你好 权重"""
+    return f"{_apostrophe_code(entry[1])} {entry[0]} {entry[2]}\n"
+
+
+# 格式名 -> 单行格式化函数 (词条, switch_order, enable_code2, layout) -> 文本；只有 rime 使用 layout
+TARGET_FORMATS = {
+    "rime": format_entry,
+    "csv": format_csv_entry,
+    "sogou": format_sogou_entry,
+    "qq": format_qq_entry,
+}
+
+
+def csv_header(switch_order=False, enable_code2=False):
+    """CSV 的表头行"""
+    text, code, weight, stem = CSV_COLUMNS
+    columns = [text, weight, code] if switch_order else [text, code, weight]
+    if enable_code2:
+        columns.append(stem)
+    return ",".join(columns) + "\n"
@@ -0,0 +1,140 @@
+"""解析 .dict.yaml 的 YAML 头部
+
+只处理 Rime 词典头部用到的 YAML 子集：顶层的 键: 值、块列表（- 项）和
+行内列表（[a, b]）；encoder 之类的嵌套映射只记录键名，不解析内容。
+不依赖 PyYAML。
+"""
+from collections import namedtuple
+
+
+# 头部中与读取词条有关的字段；fields 为全部顶层字段（嵌套映射的值为空字典）
+DictHeader = namedtuple("DictHeader", "name version sort columns import_tables use_preset_vocabulary fields")
+# 词条 (词汇, 编码, 权重, 编码2) 各字段对应的列名
+ENTRY_COLUMNS = ("text", "code", "weight", "stem")
+
+
+def _strip_comment(line):
+    """去掉行尾注释：# 在行首或空白之后且不在引号内"""
+    quote = None
+    for i, char in enumerate(line):
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in "\"'" and (i == 0 or line[i - 1] in " \t:[,-"):
+            quote = char
+        elif char == "#" and (i == 0 or line[i - 1] in " \t"):
+            return line[:i]
+    return line
+
+
+def _scalar(text):
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+        return text[1:-1]
+    lowered = text.lower()
+    if lowered in ("true", "yes", "on"):
+        return True
+    if lowered in ("false", "no", "off"):
+        return False
+    return text
+
+
+def _value(text):
+    text = text.strip()
+    if text.startswith("[") and text.endswith("]"):
+        return [_scalar(item) for item in text[1:-1].split(",") if item.strip()]
+    if text.startswith("{"):
+        return {}
+    return _scalar(text)
+
+
+def parse_header(text):
+    """解析头部文本（load 或 DictReader 得到的 header），返回 DictHeader"""
+    lines = text.splitlines()
+    # --- 之前是注释，--- 与 ... 之间才是 YAML
+    for i, line in enumerate(lines):
+        if line.strip() == "---":
+            lines = lines[i + 1:]
+            break
+    fields = {}
+    key = None
+    for line in lines:
+        if line.strip() == "...":
+            break
+        line = _strip_comment(line).rstrip()
+        if not line.strip():
+            continue
+        if not line[0].isspace():
+            key, _, value = line.partition(":")
+            key = key.strip()
+            # 值为空时等待下面缩进的块列表或嵌套映射
+            fields[key] = _value(value) if value.strip() else []
+            continue
+        block = fields.get(key)
+        if not isinstance(block, list):
+            continue
+        item = line.strip()
+        if item.startswith("-"):
+            item = item[1:].strip()
+            if ":" in _strip_comment(item) and not item.startswith(("'", '"')):
+                continue  # 列表中的映射（如 encoder 规则），不需要
+            block.append(_scalar(item))
+        elif not block:
+            fields[key] = {}
+
+    def text_field(name):
+        value = fields.get(name)
+        return value if isinstance(value, str) else None
+
+    columns = fields.get("columns")
+    tables = fields.get("import_tables")
+    return DictHeader(
+        name=text_field("name"),
+        version=text_field("version"),
+        sort=text_field("sort"),
+        columns=tuple(columns) if isinstance(columns, list) and columns else None,
+        import_tables=[str(name) for name in tables] if isinstance(tables, list) else [],
+        use_preset_vocabulary=fields.get("use_preset_vocabulary") is True,
+        fields=fields,
+    )
+
+
+def column_layout(columns):
+    """把 columns 转换为 (词汇, 编码, 权重, 编码2) 各自所在的列号（没有的为 -1），供 parse_line 使用
+
+    没有声明 columns 或其中没有 text 时返回 None，此时仍按第二列是否为数字判断次序。
+    """
+    if not columns or "text" not in columns:
+        return None
+    columns = list(columns)
+    return tuple(columns.index(name) if name in columns else -1 for name in ENTRY_COLUMNS)
+
+
+def weight_before_code(layout):
+    """按 layout 写回时是否为 词汇 权重 编码 的次序（对应界面的 switch_order）"""
+    if layout is None:
+        return None
+    _, code, weight, _ = layout
+    if code < 0 or weight < 0:
+        return None
+    return weight < code
+
+
+def build_header(name, switch_order=False, enable_code2=False, comments=""):
+    """为没有 YAML 头部的词条生成最简的 .dict.yaml 头部，columns 与写出的列次序一致
+
+    comments 为放在 --- 之前的注释（如 txt 词典开头的注释行）。
+    """
+    text, code, weight, stem = ENTRY_COLUMNS
+    columns = [text, weight, code] if switch_order else [text, code, weight]
+    if enable_code2:
+        columns.append(stem)
+    lines = [comments, "---\n", f"name: {name}\n", 'version: "1.0"\n', "sort: original\n", "columns:\n"]
+    lines += [f"  - {column}\n" for column in columns]
+    lines.append("...\n")
+    return "".join(lines)
+
+
+def comment_header(header):
+    """把 YAML 头部逐行改为注释，写入 txt 时保留原来的信息"""
+    return "".join(line if line.startswith("#") else "# " + line for line in header.splitlines(True))
@@ -0,0 +1,271 @@
+"""撤销和重做：按步记录词条的变化量，而不是整个词典的副本
+
+每一步（添加、修改、一次删除多条、一次导入）记为若干 (编号, 原词条, 新词条)，
+词条以制表符连接的一个字符串保存，撤销 1 万条删除只需把这些词条放回原位，
+不必重新读取文件。步数和变化总条数都有上限，超出时丢弃最早的步骤。
+
+path 不为 None 时，词典保存后把历史写入词典旁的 <词典>.history，下次打开同一个
+文件（修改时间和大小与保存时相同）时恢复。重新加载后编号会变，恢复的步骤按词条
+内容定位。历史文件只追加：每次保存只写入自上次保存以来的操作（新的一步、撤销、
+重做）和词典文件的标记，写入量只与这期间的修改有关；关闭词典时或文件增长到上次
+整理后的 HISTORY_GROWTH 倍时才整体重写为只含现有步骤的文件。
+"""
+import json
+import os
+from array import array
+from collections import deque
+
+from .writer import atomic_write
+
+
+HISTORY_SUFFIX = ".history"
+HISTORY_VERSION = 2
+# 默认最多保留的步数
+DEFAULT_MAX_STEPS = 100
+# 默认最多保留的变化条数（撤销和重做合计），每条约占 100 字节
+DEFAULT_MAX_CHANGES = 500_000
+# 历史文件超过上次整理后大小的这么多倍时整体重写
+HISTORY_GROWTH = 2
+# 历史文件小于这个字节数时不整理
+HISTORY_COMPACT_MIN = 1024 * 1024
+
+
+def pack_entry(entry):
+    return None if entry is None else "\t".join(entry)
+
+
+def unpack_entry(text):
+    return None if text is None else tuple(text.split("\t"))
+
+
+class EditStep:
+    """一步修改：编号 ids[i] 的词条由 old[i] 变为 new[i]
+
+    old 为 None 表示新增，new 为 None 表示删除。编号为 -1 表示未知（从文件恢复的步骤），
+    撤销或重做时按词条内容查找。
+    """
+
+    __slots__ = ("label", "ids", "old", "new")
+
+    def __init__(self, label):
+        self.label = label
+        self.ids = array("q")
+        self.old = []
+        self.new = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, entry_id, old, new):
+        self.ids.append(entry_id)
+        self.old.append(pack_entry(old))
+        self.new.append(pack_entry(new))
+
+    def changes(self, reverse=False):
+        """产出 (序号, 编号, 原词条, 新词条)；撤销时按相反的次序"""
+        indexes = range(len(self.ids) - 1, -1, -1) if reverse else range(len(self.ids))
+        for i in indexes:
+            yield i, self.ids[i], unpack_entry(self.old[i]), unpack_entry(self.new[i])
+
+
+class EditHistory:
+    """撤销栈和重做栈；不加锁，由 DictModel 在自己的锁内调用"""
+
+    def __init__(self, path=None, max_steps=DEFAULT_MAX_STEPS, max_changes=DEFAULT_MAX_CHANGES):
+        self.path = path
+        self.max_steps = max_steps
+        self.max_changes = max_changes
+        self._undo = deque()
+        self._redo = []
+        self._changes = 0
+        self._pending = []  # 上次写入文件后的操作记录，下次保存时追加
+        self._synced = False  # 文件中的历史是否与上次保存或加载时的内存一致，否则要整体重写
+        self._compacted_size = 0  # 上次整体重写（或加载）时文件的大小
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo_label(self):
+        return self._undo[-1].label if self._undo else None
+
+    def redo_label(self):
+        return self._redo[-1].label if self._redo else None
+
+    def push(self, step):
+        """记录新的一步，同时清空重做栈；超过 max_changes 的单步无法撤销，会清空全部历史"""
+        if not len(step):
+            return
+        if len(step) > self.max_changes:
+            self.clear()
+            return
+        self._push(step)
+        self._pending.append({"op": "push", "label": step.label, "old": step.old, "new": step.new})
+
+    def _push(self, step):
+        self._changes -= sum(len(s) for s in self._redo)
+        self._redo.clear()
+        self._undo.append(step)
+        self._changes += len(step)
+        self._trim()
+
+    def pop_undo(self):
+        return self._undo.pop() if self._undo else None
+
+    def pop_redo(self):
+        return self._redo.pop() if self._redo else None
+
+    def undone(self, step):
+        """撤销完成后放入重做栈"""
+        self._redo.append(step)
+        self._pending.append({"op": "undo"})
+
+    def redone(self, step):
+        """重做完成后放回撤销栈"""
+        self._undo.append(step)
+        self._pending.append({"op": "redo"})
+
+    def _trim(self):
+        while self._undo and (len(self._undo) + len(self._redo) > self.max_steps
+                              or self._changes > self.max_changes):
+            self._changes -= len(self._undo.popleft())
+
+    def clear(self):
+        self._reset()
+        self._pending.append({"op": "clear"})
+
+    def _reset(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._changes = 0
+        self._pending.clear()
+
+    # ---- 持久化 ----
+
+    def save(self, stamp):
+        """把上次保存以来的操作追加到 path，stamp 为刚保存的词典文件的 (修改时间, 大小)
+
+        文件与内存不一致（刚加载失败、上次写入出错）或增长过大时改为整体重写。
+        """
+        if self.path is None:
+            return
+        if not self._undo and not self._redo:
+            self.remove()
+            return
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = None
+        if not self._synced or size is None or size > max(HISTORY_COMPACT_MIN, self._compacted_size * HISTORY_GROWTH):
+            self.compact(stamp)
+            return
+        lines = [json.dumps(record, ensure_ascii=False) for record in self._pending]
+        lines.append(json.dumps({"op": "stamp", "stamp": list(stamp)}))
+        self._synced = False
+        with open(self.path, "a", encoding="utf-8", newline="\n") as f:
+            f.write("\n".join(lines) + "\n")
+        self._pending.clear()
+        self._synced = True
+
+    def compact(self, stamp):
+        """整体重写为只含现有步骤的文件（关闭词典时调用）；stamp 为词典文件当前的标记"""
+        if self.path is None:
+            return
+        if not self._undo and not self._redo:
+            self.remove()
+            return
+        lines = [json.dumps({"version": HISTORY_VERSION})]
+        for stack, steps in (("undo", self._undo), ("redo", self._redo)):
+            lines.extend(json.dumps({"op": "step", "stack": stack, "label": step.label,
+                                     "old": step.old, "new": step.new}, ensure_ascii=False) for step in steps)
+        lines.append(json.dumps({"op": "stamp", "stamp": list(stamp)}))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        self._synced = False
+        with atomic_write(self.path) as f:
+            f.write(data)
+        self._pending.clear()
+        self._synced = True
+        self._compacted_size = len(data)
+
+    def close(self, stamp):
+        """关闭词典时调用：文件与内存一致且有追加的记录时整理一次；stamp 为词典文件当前的标记"""
+        if self.path is None or not self._synced or self._pending:
+            return
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size != self._compacted_size:
+            self.compact(stamp)
+
+    def load(self, stamp):
+        """读取 path 中的历史并按顺序重放其中的操作，返回恢复的步数
+
+        文件不存在、已损坏或最后记录的词典标记与 stamp 不符时清空历史。
+        写到一半的最后几行（崩溃造成）被忽略，此时最后的标记也对不上，同样清空。
+        """
+        self._reset()
+        self._synced = False
+        if self.path is None:
+            return 0
+        last_stamp = None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                if json.loads(f.readline()).get("version") != HISTORY_VERSION:
+                    return 0
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    last_stamp = self._replay(record, last_stamp)
+            size = os.path.getsize(self.path)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, IndexError):
+            self._reset()
+            return 0
+        self._pending.clear()
+        if last_stamp is None or tuple(last_stamp) != tuple(stamp):
+            self._reset()
+            return 0
+        self._synced = True
+        self._compacted_size = size
+        return len(self._undo) + len(self._redo)
+
+    def _replay(self, record, last_stamp):
+        """应用文件中的一条记录，返回最后一次保存时词典文件的标记"""
+        op = record["op"]
+        if op == "stamp":
+            return record["stamp"]
+        if op in ("step", "push"):
+            step = EditStep(record["label"])
+            step.old = record["old"]
+            step.new = record["new"]
+            step.ids = array("q", [-1]) * len(step.old)
+            if op == "push":
+                self._push(step)
+            elif record["stack"] == "redo":
+                self._redo.append(step)
+                self._changes += len(step)
+            else:
+                self._undo.append(step)
+                self._changes += len(step)
+        elif op == "undo":
+            self.undone(self._undo.pop())
+        elif op == "redo":
+            self.redone(self._redo.pop())
+        elif op == "clear":
+            self._reset()
+        return last_stamp
+
+    def remove(self):
+        self._pending.clear()
+        self._synced = True
+        self._compacted_size = 0
+        if self.path is None:
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,65 @@
+"""词条的哈希索引"""
+
+
+class KeyIndex:
+    """键到词条编号的哈希索引
+
+    绝大多数键只对应一个词条，这时直接存编号本身，出现重复时才换成有序的
+    dict（当作集合用，删除也是 O(1)），以减少百万级词条时的内存占用。
+    """
+
+    def __init__(self):
+        self._map = {}
+
+    @classmethod
+    def build(cls, pairs):
+        """由 (键, 编号) 序列构建索引"""
+        index = cls()
+        add = index.add
+        for key, entry_id in pairs:
+            add(key, entry_id)
+        return index
+
+    def add(self, key, entry_id):
+        ids = self._map.get(key)
+        if ids is None:
+            self._map[key] = entry_id
+        elif type(ids) is int:
+            self._map[key] = {ids: None, entry_id: None}
+        else:
+            ids[entry_id] = None
+
+    def remove(self, key, entry_id):
+        ids = self._map.get(key)
+        if ids is None:
+            return
+        if type(ids) is int:
+            if ids == entry_id:
+                del self._map[key]
+            return
+        if ids.pop(entry_id, False) is False:
+            return
+        if len(ids) == 1:
+            self._map[key] = next(iter(ids))
+
+    def get(self, key):
+        """返回键对应的全部编号（元组），没有时返回空元组"""
+        ids = self._map.get(key)
+        if ids is None:
+            return ()
+        if type(ids) is int:
+            return (ids,)
+        return tuple(ids)
+
+    def first(self, key):
+        """返回键对应的最小编号（即文件中最靠前的词条），没有时返回 None"""
+        ids = self._map.get(key)
+        if ids is None or type(ids) is int:
+            return ids
+        return min(ids)
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def __len__(self):
+        return len(self._map)
@@ -0,0 +1,48 @@
+"""词典旁的追加式编辑日志，用于在保存前崩溃时恢复修改"""
+import json
+import os
+
+
+JOURNAL_SUFFIX = ".journal"
+
+
+class EditJournal:
+    """<词典>.journal：每行一条 JSON 编辑记录，每次追加后立即刷到磁盘
+
+    记录格式：
+        {"op": "add", "id": 编号, "new": [词汇, 编码, 权重, 编码2]}
+        {"op": "update", "id": 编号, "old": [...], "new": [...]}
+        {"op": "delete", "id": 编号, "old": [...]}
+    词典成功保存后删除日志；启动时若日志仍在，说明上次的修改没有写回，需要重放。
+    """
+
+    def __init__(self, dict_path):
+        self.path = dict_path + JOURNAL_SUFFIX
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def append(self, records):
+        """追加多条记录并 fsync"""
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def records(self):
+        """读出全部记录；写到一半的最后一行（崩溃造成）会被忽略"""
+        if not self.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    break
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
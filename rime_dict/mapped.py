@@ -0,0 +1,257 @@
+"""只读浏览：用 mmap 映射词典文件，只建立行偏移索引，词条在显示或查询时才解码
+
+适合只浏览和查询、不修改的大型基础词典（如 8105.dict.yaml、base.dict.yaml）。
+内存中只有每个词条 4 字节（文件超过 4 GiB 时 8 字节）的行首偏移，文件内容由
+操作系统按页缓存，不再为每个词条创建 Python 对象。建索引时按块用 bytes.split
+切分，行首偏移由各行长度累加得到，不在 Python 中逐行循环；只有可能不是词条的
+少数行才逐行用 parse_line 核对，跳过的行与 DictModel 完全相同，词条数也相同。
+"""
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, compress
+from operator import add
+
+from .header import column_layout, parse_header
+from .multi import MATCHERS
+from .parser import (
+    PROGRESS_INTERVAL, detect_encoding, file_stamp, is_byte_encoding, is_tombstone, is_yaml_dict, parse_line,
+)
+from .search import QueryCache
+
+
+# 扫描时每块的字节数，限制切分出的临时行列表的大小
+SCAN_CHUNK = 1024 * 1024
+# 可能不是词条的行（在块的解码文本中查找，文本前后各补一个换行符）：没有制表符或 # 出现在第一个
+# 制表符之前、以空白开头、制表符后紧跟空白。其余的行去掉首尾空白后仍以非 # 字符开头并含有制表符，
+# parse_line 一定能解析
+SUSPECT_LINES = (re.compile(r"\n(?=[^\t\n]*[#\n])"), re.compile(r"\n(?=\s)"), re.compile(r"\t(?=\s)"))
+EMPTY_ROW = ("", "", "", "")
+
+
+def _invalid_rows(chunk, lines, encoding):
+    """块中 parse_line 不能解析的行（注释、作废行、空行、格式错误的行）的行号"""
+    text = "\n" + chunk.decode(encoding, "replace") + "\n"
+    found = sorted(match.start() for pattern in SUSPECT_LINES for match in pattern.finditer(text))
+    invalid = []
+    row = -1
+    counted = 0
+    for position in found:
+        # 匹配位置所在的行：其前面（含补上的第一个）换行符的个数减一
+        row += text.count("\n", counted, position + 1)
+        counted = position + 1
+        if row >= len(lines):
+            break
+        if (not invalid or invalid[-1] != row) and parse_line(lines[row].decode(encoding, "replace")) is None:
+            invalid.append(row)
+    return invalid
+
+
+def _scan_lines(data, start, end, typecode, encoding):
+    """按块切分 data[start:end]，返回词条行的行首偏移"""
+    starts = array(typecode)
+    position = start
+    while position < end:
+        # 块在换行符之后结束，不切断行
+        newline = data.find(b"\n", min(position + SCAN_CHUNK, end) - 1, end)
+        stop = end if newline < 0 else newline + 1
+        chunk = data[position:stop]
+        lines = chunk.split(b"\n")
+        if not lines[-1]:
+            lines.pop()
+        # 第 i 行的行首 = 块的起点 + 前 i 行的长度 + i 个换行符
+        line_starts = map(add, accumulate(map(len, lines), initial=0), range(position, position + len(lines)))
+        invalid = _invalid_rows(chunk, lines, encoding)
+        if invalid:
+            keep = bytearray(b"\x01") * len(lines)
+            for row in invalid:
+                keep[row] = 0
+            line_starts = compress(line_starts, keep)
+        starts.extend(line_starts)
+        position = stop
+    return starts
+
+
+class MappedDict:
+    """只读的词典视图，提供界面需要的 DictModel 接口子集（查询、显示、同步）
+
+    行号即词条编号。无法按字节定位行的编码（UTF-16）不支持，load() 会抛出 ValueError。
+    """
+
+    read_only = True
+
+    def __init__(self, dict_path, switch_order=False, enable_code2=False):
+        self.dict_path = dict_path
+        self.switch_order = switch_order
+        self.enable_code2 = enable_code2
+        self.dirty = False
+        self.replayed = 0
+        self.journal = None
+        self.header = ""
+        self.layout = None
+        self.encoding = None
+        self._file = None
+        self._data = None
+        self._starts = array("I")
+        self._stamp = None
+        self._query_cache = QueryCache()
+
+    def load(self, progress=None):
+        """映射文件并建立行偏移索引；重复调用时重新映射"""
+        encoding = detect_encoding(self.dict_path)
+        if not is_byte_encoding(encoding):
+            raise ValueError(f"只读浏览不支持 {encoding} 编码的词典")
+        self.close()
+        stamp = file_stamp(self.dict_path)
+        f = open(self.dict_path, "rb")
+        try:
+            size = os.fstat(f.fileno()).st_size
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        except BaseException:
+            f.close()
+            raise
+        self._file = f
+        self._data = data
+        self._stamp = stamp
+        if encoding == "utf-8-sig":
+            encoding = "utf-8"
+            start = 3
+        else:
+            start = 0
+        self.encoding = encoding
+        start = self._read_header(start, size)
+        if progress is not None:
+            progress(0.0)
+        self._starts = _scan_lines(data, start, size, "I" if size < 1 << 32 else "q", encoding)
+        self._query_cache.clear()
+        return self
+
+    def _read_header(self, position, size):
+        """读取头部，返回词条部分的起始偏移"""
+        data = self._data
+        header_lines = []
+        yaml = is_yaml_dict(self.dict_path)
+        while position < size:
+            end = data.find(b"\n", position)
+            end = size if end < 0 else end + 1
+            line = data[position:end].decode(self.encoding, "replace")
+            if not yaml and (not line.startswith("#") or is_tombstone(line)):
+                break
+            header_lines.append(line.rstrip("\r\n") + "\n")
+            position = end
+            if yaml and line.strip() == "...":
+                break
+        self.header = "".join(header_lines)
+        self.layout = column_layout(parse_header(self.header).columns) if yaml else None
+        return position
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # ---- 与 DictModel 相同的接口 ----
+
+    def __len__(self):
+        return len(self._starts)
+
+    def _line(self, row):
+        data = self._data
+        start = self._starts[row]
+        end = data.find(b"\n", start)
+        return data[start:] if end < 0 else data[start:end]
+
+    def get(self, row):
+        """解码一行；建索引时已排除无效的行，只有文件在映射后被其他程序改写时才会返回 None"""
+        return parse_line(self._line(row).decode(self.encoding, "replace"), self.enable_code2, self.layout)
+
+    def display_row(self, row):
+        entry = self.get(row)
+        if entry is None:
+            return EMPTY_ROW
+        word, code, weight, code2 = entry
+        return (word, weight, code, code2) if self.switch_order else entry
+
+    def all_ids(self):
+        return range(len(self._starts))
+
+    def first_entry(self):
+        """第一条有效词条的显示文本"""
+        for row in range(len(self._starts)):
+            if self.get(row) is not None:
+                return "\t".join(self.display_row(row))
+        return ""
+
+    def is_stale(self):
+        return file_stamp(self.dict_path) != self._stamp
+
+    def sync_with_file(self):
+        """文件有变化时重新映射，返回值与 DictModel.sync_with_file 相同"""
+        stamp = file_stamp(self.dict_path)
+        if stamp is None:
+            return "missing", 0
+        if stamp == self._stamp:
+            return "unchanged", 0
+        self.load()
+        return "reloaded", len(self)
+
+    def query(self, text, mode="exact", progress=None):
+        """查询，返回按文件次序排列的行号；与 DictModel.query 一样缓存最近的结果
+
+        直接在映射的字节中查找查询内容，只解码包含它的行再核对是否真正匹配。
+        """
+        if not text:
+            return self.all_ids()
+        cache = self._query_cache
+        ids = cache.get(mode, text, self._stamp)
+        if ids is not None:
+            return ids
+        match = MATCHERS[mode]
+        base = cache.narrowest(mode, text, self._stamp)
+        if base is not None:
+            ids = []
+            for row in base:
+                entry = self.get(row)
+                if entry is not None and match(text, entry):
+                    ids.append(row)
+        else:
+            ids = self._scan(text, match, progress)
+        return cache.put(mode, text, self._stamp, ids)
+
+    def _scan(self, text, match, progress):
+        try:
+            needle = text.encode(self.encoding)
+        except UnicodeEncodeError:
+            return []
+        data = self._data
+        starts = self._starts
+        size = len(data) if data is not None else 0
+        results = []
+        position = starts[0] if len(starts) else size
+        found = 0
+        last_row = -1
+        while True:
+            position = data.find(needle, position)
+            if position < 0:
+                break
+            found += 1
+            if progress is not None and not found % PROGRESS_INTERVAL:
+                progress(position / size)
+            # 匹配可能落在注释行中，此时找到的是它前面的词条行，核对时会排除
+            row = bisect_right(starts, position) - 1
+            if row >= 0 and row != last_row:
+                last_row = row
+                entry = self.get(row)
+                if entry is not None and match(text, entry):
+                    results.append(row)
+            # 同一行只核对一次，从下一行继续查找
+            end = data.find(b"\n", position)
+            if end < 0:
+                break
+            position = end + 1
+        return results
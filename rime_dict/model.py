@@ -0,0 +1,932 @@
+"""常驻内存的词典模型"""
+import os
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+from .extsort import DEFAULT_MEMORY_LIMIT, external_sort
+from .index import KeyIndex
+from .journal import EditJournal
+from .header import column_layout, parse_header
+from .history import HISTORY_SUFFIX, EditHistory, EditStep
+from .parser import DEFAULT_WEIGHT, PROGRESS_INTERVAL, file_stamp, is_tombstone, is_yaml_dict, parse_line, read_dict
+from .perf import profiler
+from .search import QueryCache, SearchIndex
+from .store import EntryStore
+from .writer import format_entry, tombstone_line, write_dict
+
+
+# 作废行超过文件大小的这一比例时，保存改为整体重写以压缩文件
+COMPACT_RATIO = 0.25
+# 批量导入遇到编码已存在时的处理方式：跳过、覆盖已有词条、两条都保留、保留权重较高的
+IMPORT_POLICIES = ("skip", "overwrite", "keep-both", "max-weight")
+# 批量导入时每批处理的词条数，每批只持有一次锁、写一次日志
+IMPORT_BATCH = 4096
+
+# 一次删除、撤销或重做超过这么多条时不逐条更新搜索索引（逐个插入、删除有序数组太慢），之后按需重建
+BULK_REINDEX_THRESHOLD = 256
+
+# 记录文件末尾的这么多字节，用来判断外部修改是否只是在末尾追加
+TAIL_CHECK_SIZE = 256
+
+# import_entries 的结果；conflicts 为编码已存在但词汇不同的词条数
+ImportResult = namedtuple("ImportResult", "read added updated skipped conflicts seconds")
+# pending_changes 的结果：新增、修改、删除的词条编号列表
+ChangeSet = namedtuple("ChangeSet", "added modified deleted")
+
+
+class DictConflictError(Exception):
+    """文件在加载后被其他程序修改过（不只是在末尾追加），直接保存会覆盖这些修改"""
+
+
+def weight_value(weight):
+    """权重的数值，不是数字时按 0 处理"""
+    return int(weight) if weight.isdecimal() else 0
+
+
+class DictModel:
+    """词典只加载一次并保存在内存中，增删改都在内存中完成，显式保存时才写回文件
+
+    每个词条有一个固定编号（加载顺序中的下标），删除后该编号作废但不复用，
+    因此界面可以直接用编号引用词条。词条统一按 (词汇, 编码, 权重, 编码2) 存放在
+    列式的 EntryStore 中，switch_order 只影响显示和写回文件时的列次序；头部声明了
+    columns 时写回文件按 layout 的列次序。
+
+    按编码和按词汇的哈希索引、部分匹配和前缀查询用的搜索索引都在第一次
+    使用时建立，之后随每次增删改同步更新。
+
+    加载、建索引、查询和保存可以在后台线程执行，修改则在界面线程执行；
+    修改与建索引之间用锁互斥，保存只在锁内复制一份词条列表。
+
+    加载时记录每个词条所在行的字节偏移。保存时只把新增词条追加到文件末尾，
+    被修改或删除的行按偏移原地改写（长度相同时）或改成等长的注释行再追加新行，
+    写入量只与修改量有关；作废行过多时整体重写一次。
+
+    journal 为真时每次修改先追加到 <词典>.journal 再应用到内存，保存成功后删除日志；
+    加载时若日志还在（上次保存前进程退出），会按日志重放修改，重放条数记在 replayed 中。
+
+    cache 为 ParseCache 时优先从解析缓存加载，未命中时解析后写入缓存。
+
+    每次修改在 history 中记为一步，可以 undo 和 redo；persist_history 为真时保存后把
+    这期间的历史操作追加到 <词典>.history，下次打开未被改动过的同一文件时恢复，
+    关闭词典时调用 close_history 整理该文件。
+
+    文件被其他程序修改时，只在末尾追加的内容会被解析后并入模型（不影响未保存的修改），
+    其他修改在模型没有未保存的修改时重新加载，否则保存会抛出 DictConflictError，
+    由调用方决定放弃本地修改（revert）还是覆盖文件（save(force=True)）。
+    """
+
+    read_only = False  # 与只读浏览的 MappedDict 区分
+
+    def __init__(self, dict_path, switch_order=False, enable_code2=False, journal=False, cache=None,
+                 persist_history=False):
+        self.dict_path = dict_path
+        self.switch_order = switch_order
+        self.enable_code2 = enable_code2
+        self.header = ""
+        self.layout = None  # 头部 columns 声明的列号，见 header.column_layout
+        self.encoding = None
+        self.dirty = False
+        self._entries = EntryStore()  # 下标即词条编号，已删除的位置为 None
+        self._live = 0
+        self._stamp = None
+        self._tail = None  # 文件末尾的一段字节，见 _remember_tail
+        self._newline = b"\n"  # 文件使用的换行符，追加的行与之一致，见 _remember_tail
+        self._code_index = None
+        self._word_index = None
+        self._search_index = None
+        self._search_pending = None  # 后台建立搜索索引期间的增删：(是否新增, 编号, 词条)
+        self._search_build_lock = threading.Lock()
+        self._query_cache = QueryCache()
+        self._version = 0  # 每次修改加一
+        self._offsets = None  # 词条所在行的字节偏移，-1 表示尚未写入；None 表示只能整体重写
+        self._on_disk = {}  # 写入文件后又被修改或删除的词条：编号 -> 文件中的原词条
+        self._unwritten = []  # 新增后尚未写入文件的词条编号
+        self._garbage = 0  # 文件中作废行占用的字节数
+        self._format = None  # 文件中词条的列格式 (switch_order, enable_code2)
+        self.journal = EditJournal(dict_path) if journal else None
+        self.history = EditHistory(dict_path + HISTORY_SUFFIX if persist_history else None)
+        self.cache = cache
+        self.replayed = 0
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+
+    # ---- 加载 ----
+
+    def load(self, progress=None):
+        """从文件加载全部词条，丢弃内存中的修改"""
+        stamp = file_stamp(self.dict_path)
+        data = None
+        if self.cache is not None:
+            with profiler.timer("cache_load", path=self.dict_path) as info:
+                data = self.cache.load(self.dict_path, self.switch_order, self.enable_code2)
+                info["hit"] = data is not None
+        if data is None:
+            with profiler.timer("parse", path=self.dict_path, bytes=stamp[1] if stamp else 0) as info:
+                data = read_dict(self.dict_path, self.enable_code2, progress, track_offsets=True,
+                                 container=EntryStore)
+                info["entries"] = len(data.entries)
+            if self.cache is not None:
+                with profiler.timer("cache_store", path=self.dict_path):
+                    self.cache.store(self.dict_path, stamp, self.switch_order, self.enable_code2, data)
+        with self._lock:
+            self.header = data.header
+            self.layout = column_layout(parse_header(data.header).columns) if is_yaml_dict(self.dict_path) else None
+            self.encoding = data.encoding
+            self._entries = data.entries
+            self._live = len(data.entries)
+            self._stamp = stamp
+            self._offsets = data.offsets
+            self._remember_tail()
+            self._on_disk = {}
+            self._unwritten = []
+            self._garbage = data.tombstone_bytes
+            self._format = (self.switch_order, self.enable_code2)
+            self._code_index = None
+            self._word_index = None
+            self._drop_search_index()
+            self._version += 1
+            self.dirty = False
+            self.replayed = 0
+            if self.journal is not None and self.journal.exists():
+                self.replayed = self._replay_journal()
+                if not self.replayed:
+                    self.journal.clear()
+            # 编号按文件重新分配，之前的编号都已失效；只恢复与这个文件对应的已保存历史
+            self.history.load(stamp)
+        return self
+
+    def _replay_journal(self):
+        """按日志重放上次没有写回文件的修改，返回实际重放的记录数
+
+        先按记录中的编号核对，对不上时再按词条内容查找，已经生效的记录会被跳过，
+        因此即使保存成功后、删除日志前退出，重放也不会重复修改。保存在追加新行之后、
+        作废旧行之前退出时，修改记录的新旧词条都在文件中，此时只去掉旧词条。
+        """
+        replayed = 0
+        for record in self.journal.records():
+            op = record.get("op")
+            if op == "add":
+                entry = tuple(record["new"])
+                if not self.find(entry):
+                    self._insert(entry)
+                    replayed += 1
+                continue
+            if op not in ("update", "delete"):
+                continue
+            old = tuple(record["old"])
+            entry_id = record.get("id")
+            if not (isinstance(entry_id, int) and 0 <= entry_id < len(self._entries)
+                    and self._entries[entry_id] == old):
+                matches = self.find(old)
+                entry_id = matches[0] if matches else None
+            if op == "update":
+                new = tuple(record["new"])
+                if self.find(new):
+                    if entry_id is None:
+                        continue
+                    self._remove(entry_id)
+                    self._live -= 1
+                elif entry_id is None:
+                    # 旧行已作废但新行没有写入（早先的保存方式在两次写入之间退出），补上新词条
+                    self._insert(new)
+                else:
+                    self._replace(entry_id, new)
+            elif entry_id is None:
+                continue
+            else:
+                self._remove(entry_id)
+                self._live -= 1
+            replayed += 1
+        return replayed
+
+    def is_stale(self):
+        """文件在加载或保存之后是否被修改过（按修改时间和大小判断）"""
+        return file_stamp(self.dict_path) != self._stamp
+
+    def reload_if_changed(self):
+        """文件有变化且内存中没有未保存的修改时重新加载，返回是否重新加载"""
+        if self.dirty or not self.is_stale():
+            return False
+        self.load()
+        return True
+
+    def sync_with_file(self):
+        """让模型跟上文件的外部修改，返回 (状态, 条数)，可在后台线程调用
+
+        状态为 unchanged（没有变化）、appended（只在末尾追加，已并入追加的词条）、
+        reloaded（没有未保存的修改，已重新加载）、conflict（有未保存的修改，未做处理）
+        或 missing（文件已不存在）。
+        """
+        with self._save_lock:
+            stamp = file_stamp(self.dict_path)
+            if stamp == self._stamp:
+                return "unchanged", 0
+            if stamp is None:
+                return "missing", 0
+            count = self._absorb_appended(stamp)
+            if count is not None:
+                return "appended", count
+            if self.dirty:
+                return "conflict", 0
+            self.load()
+            return "reloaded", len(self)
+
+    def revert(self):
+        """放弃内存中未保存的修改（连同编辑日志），重新加载文件"""
+        with self._save_lock:
+            if self.journal is not None:
+                self.journal.clear()
+            self.load()
+
+    def _remember_tail(self):
+        """记下当前文件末尾的一段字节，之后据此判断外部修改是否只是在末尾追加
+
+        同时按其中最后一个换行符判断文件用 CRLF 还是 LF 换行。
+        """
+        self._tail = None
+        if self._stamp is None or self._offsets is None:
+            return
+        size = self._stamp[1]
+        try:
+            with open(self.dict_path, "rb") as f:
+                f.seek(max(0, size - TAIL_CHECK_SIZE))
+                self._tail = f.read(min(size, TAIL_CHECK_SIZE))
+        except OSError:
+            return
+        newline = self._tail.rfind(b"\n")
+        if newline >= 0:
+            self._newline = b"\r\n" if self._tail[newline - 1:newline] == b"\r" else b"\n"
+
+    def _absorb_appended(self, stamp):
+        """文件只在末尾追加了完整的行时解析这些行并入模型，返回新增词条数；否则返回 None
+
+        追加的词条已经在文件中，按原样记录偏移，不算作未保存的修改。
+        """
+        tail = self._tail
+        if tail is None or self._stamp is None or stamp[1] <= self._stamp[1] or (tail and tail[-1:] != b"\n"):
+            return None
+        old_size = self._stamp[1]
+        encoding = "utf-8" if self.encoding == "utf-8-sig" else self.encoding
+        try:
+            with open(self.dict_path, "rb") as f:
+                f.seek(old_size - len(tail))
+                if f.read(len(tail)) != tail:
+                    return None
+                data = f.read(stamp[1] - old_size)
+            if not data.endswith(b"\n"):
+                return None  # 对方还没写完最后一行
+            parsed = []
+            garbage = 0
+            position = old_size
+            for raw in data.split(b"\n")[:-1]:
+                line = raw.decode(encoding)
+                entry = parse_line(line, self.enable_code2, self.layout)
+                if entry is not None:
+                    parsed.append((position, entry))
+                elif is_tombstone(line):
+                    garbage += len(raw) + 1
+                position += len(raw) + 1
+        except (OSError, UnicodeError):
+            return None
+        with self._lock:
+            for position, entry in parsed:
+                entry_id = len(self._entries)
+                self._entries.append(entry)
+                self._offsets.append(position)
+                self._index_add(entry_id, entry)
+                self._live += 1
+            self._garbage += garbage
+            self._version += 1
+            self._stamp = stamp
+            self._remember_tail()
+        return len(parsed)
+
+    def _check_file(self, force):
+        """写文件前核对外部修改：末尾追加的内容先并入模型，其他修改在 force 为假时抛出 DictConflictError"""
+        stamp = file_stamp(self.dict_path)
+        if stamp == self._stamp:
+            return
+        if stamp is not None and self._absorb_appended(stamp) is not None:
+            return
+        if not force:
+            raise DictConflictError(f"词典文件已被其他程序修改: {self.dict_path}")
+
+    # ---- 读取 ----
+
+    def __len__(self):
+        return self._live
+
+    def get(self, entry_id):
+        """按编号取词条，已删除时返回 None"""
+        return self._entries[entry_id]
+
+    def ids(self):
+        """按文件次序产出所有有效词条的编号"""
+        return self._entries.ids()
+
+    def all_ids(self):
+        """全部有效词条编号组成的序列；没有删除过词条时直接返回 range，不必逐个生成"""
+        if self._live == len(self._entries):
+            return range(self._live)
+        return list(self.ids())
+
+    def items(self):
+        """按文件次序产出 (编号, 词条)"""
+        entries = self._entries
+        for entry_id in entries.ids():
+            yield entry_id, entries[entry_id]
+
+    def display_row(self, entry_id):
+        """按界面列次序返回词条"""
+        word, code, weight, code2 = self._entries[entry_id]
+        if self.switch_order:
+            return (word, weight, code, code2)
+        return (word, code, weight, code2)
+
+    def first_entry(self):
+        """第一条词条的显示文本"""
+        for entry_id in self.ids():
+            return "\t".join(self.display_row(entry_id))
+        return ""
+
+    # ---- 索引 ----
+
+    def _ensure_indexes(self):
+        with self._lock:
+            if self._code_index is None:
+                with profiler.timer("index", entries=self._live):
+                    self._build_key_indexes()
+
+    def _build_key_indexes(self):
+        entries = self._entries
+        self._word_index = KeyIndex.build((entries.word(entry_id), entry_id) for entry_id in entries.ids())
+        self._code_index = KeyIndex.build((entries.code(entry_id), entry_id) for entry_id in entries.ids())
+
+    def _ensure_search_index(self):
+        """建立搜索索引；建立时不持有修改锁，期间的增删记在 _search_pending 中，建好后补上
+
+        期间索引被整个作废（批量删除、导入、重新加载）时按新的词条重新建立。
+        """
+        with self._search_build_lock:
+            while True:
+                with self._lock:
+                    if self._search_index is not None:
+                        return self._search_index
+                    entries = self._entries.copy()
+                    pending = self._search_pending = []
+                with profiler.timer("search_index", entries=len(entries)):
+                    index = SearchIndex.build((entry_id, entries[entry_id]) for entry_id in entries.ids())
+                with self._lock:
+                    if self._search_pending is not pending:
+                        continue
+                    for added, entry_id, entry in pending:
+                        if added:
+                            index.add(entry_id, entry)
+                        else:
+                            index.remove(entry_id, entry)
+                    self._search_pending = None
+                    self._search_index = index
+                    return index
+
+    def _drop_search_index(self):
+        """作废搜索索引（逐条更新太慢时），之后按需重建；正在建立的也一并作废"""
+        self._search_index = None
+        self._search_pending = None
+
+    def build_indexes(self):
+        """预先建立哈希索引，便于在后台线程中提前完成"""
+        self._ensure_indexes()
+
+    def _index_add(self, entry_id, entry):
+        if self._code_index is not None:
+            self._code_index.add(entry[1], entry_id)
+            self._word_index.add(entry[0], entry_id)
+        if self._search_index is not None:
+            self._search_index.add(entry_id, entry)
+        elif self._search_pending is not None:
+            self._search_pending.append((True, entry_id, entry))
+
+    def _mark_changed(self, entry_id, old):
+        """记录已写入文件的词条在保存前的原样，保存时据此定位并改写原来的行"""
+        if self._offsets is not None and self._offsets[entry_id] >= 0 and entry_id not in self._on_disk:
+            self._on_disk[entry_id] = old
+
+    def _index_remove(self, entry_id, entry):
+        if self._code_index is not None:
+            self._code_index.remove(entry[1], entry_id)
+            self._word_index.remove(entry[0], entry_id)
+        if self._search_index is not None:
+            self._search_index.remove(entry_id, entry)
+        elif self._search_pending is not None:
+            self._search_pending.append((False, entry_id, entry))
+
+    def find_code(self, code):
+        """返回第一个编码相同的词条编号，不存在时返回 None"""
+        self._ensure_indexes()
+        return self._code_index.first(code)
+
+    def ids_by_code(self, code):
+        """编码相同的全部词条编号"""
+        self._ensure_indexes()
+        return self._code_index.get(code)
+
+    def ids_by_word(self, word):
+        """词汇相同的全部词条编号"""
+        self._ensure_indexes()
+        return self._word_index.get(word)
+
+    def lookup(self, text):
+        """全匹配查询：词汇或编码等于 text 的词条编号，按文件次序排列"""
+        return sorted(set(self.ids_by_word(text)).union(self.ids_by_code(text)))
+
+    def search_prefix(self, prefix):
+        """前缀匹配：编码以 prefix 开头的词条编号，按文件次序排列"""
+        return self._ensure_search_index().prefix(prefix)
+
+    def search_partial(self, text, progress=None):
+        """部分匹配：词汇或编码包含 text 的词条编号，按文件次序排列
+
+        progress(fraction) 会被定期调用，可以在其中抛出异常中止查询。
+        """
+        index = self._ensure_search_index()
+        entries = self._entries
+        if len(text) == 1:
+            # 单字查询（常见于中文）不必逐条解码词汇，只核对修改过的词条
+            by_code = entries.ids_with_code(lambda code: text in code)
+            sure, check = index.word_char(text)
+            if not sure and not check:
+                return by_code
+            sure.update(by_code)
+            sure.update(entry_id for entry_id in check - sure if not entries.is_deleted(entry_id)
+                        and text in entries.word(entry_id))
+            return sorted(sure)
+        candidates = index.candidates(text)
+        if candidates is None:
+            candidates = range(len(entries))
+        total = len(candidates) or 1
+        results = []
+        for i, entry_id in enumerate(candidates):
+            if progress is not None and not i % PROGRESS_INTERVAL:
+                progress(i / total)
+            if not entries.is_deleted(entry_id) and (text in entries.word(entry_id) or text in entries.code(entry_id)):
+                results.append(entry_id)
+        return results
+
+    def query(self, text, mode="exact", progress=None):
+        """按界面的匹配模式（exact、prefix、partial）查询，返回按文件次序排列的编号序列
+
+        最近的结果保存在 LRU 缓存中，重复查询（如退格）直接返回；部分匹配和前缀匹配
+        在扩展旧查询时（如从 a 输入到 ab）只在旧结果中筛选。text 为空时返回全部词条。
+        """
+        if not text:
+            return self.all_ids()
+        version = self._version
+        cache = self._query_cache
+        ids = cache.get(mode, text, version)
+        if ids is not None:
+            return ids
+        base = cache.narrowest(mode, text, version)
+        with profiler.timer("query", mode=mode, refined=base is not None) as info:
+            if base is not None:
+                ids = self._filter(base, text, mode, progress)
+            elif mode == "exact":
+                ids = self.lookup(text)
+            elif mode == "prefix":
+                ids = self.search_prefix(text)
+            else:
+                ids = self.search_partial(text, progress)
+            info["results"] = len(ids)
+        if self._version != version:
+            # 查询期间词典有修改，结果不放入缓存
+            return ids
+        return cache.put(mode, text, version, ids)
+
+    def _filter(self, candidates, text, mode, progress=None):
+        """从旧结果中筛选出仍然匹配的编号"""
+        entries = self._entries
+        total = len(candidates) or 1
+        results = []
+        for i, entry_id in enumerate(candidates):
+            if progress is not None and not i % PROGRESS_INTERVAL:
+                progress(i / total)
+            if entries.is_deleted(entry_id):
+                continue
+            code = entries.code(entry_id)
+            if mode == "prefix":
+                if code.startswith(text):
+                    results.append(entry_id)
+            elif text in code or text in entries.word(entry_id):
+                results.append(entry_id)
+        return results
+
+    def find(self, entry):
+        """与 (词汇, 编码, 权重, 编码2) 完全相同的词条编号"""
+        return [entry_id for entry_id in self.ids_by_code(entry[1]) if self._entries[entry_id] == tuple(entry)]
+
+    # ---- 修改 ----
+
+    def _log(self, records):
+        if self.journal is not None:
+            self.journal.append(records)
+
+    def _make_entry(self, word, code, weight, code2):
+        return (word, code, str(weight), code2 if self.enable_code2 else "")
+
+    def _insert(self, entry):
+        entry_id = len(self._entries)
+        self._entries.append(entry)
+        if self._offsets is not None:
+            self._offsets.append(-1)
+        self._unwritten.append(entry_id)
+        self._index_add(entry_id, entry)
+        self._live += 1
+        self._version += 1
+        self.dirty = True
+        return entry_id
+
+    def _replace(self, entry_id, entry):
+        old = self._entries[entry_id]
+        self._mark_changed(entry_id, old)
+        self._index_remove(entry_id, old)
+        self._entries[entry_id] = entry
+        self._index_add(entry_id, entry)
+        self._version += 1
+        self.dirty = True
+        return old
+
+    def _restore(self, entry_id, entry):
+        """把词条放回已删除的编号（撤销删除、重做新增）"""
+        self._entries[entry_id] = entry
+        if self._offsets is not None and self._offsets[entry_id] < 0:
+            self._unwritten.append(entry_id)
+        self._index_add(entry_id, entry)
+        self._live += 1
+        self._version += 1
+        self.dirty = True
+
+    def _remove(self, entry_id):
+        """删除一个词条（不调整有效词条数），返回原词条"""
+        entry = self._entries[entry_id]
+        self._mark_changed(entry_id, entry)
+        self._index_remove(entry_id, entry)
+        self._entries[entry_id] = None
+        self._version += 1
+        self.dirty = True
+        return entry
+
+    def add(self, word, code, weight=DEFAULT_WEIGHT, code2=""):
+        """追加词条，返回新编号"""
+        entry = self._make_entry(word, code, weight, code2)
+        with self._lock:
+            self._log([{"op": "add", "id": len(self._entries), "new": entry}])
+            entry_id = self._insert(entry)
+            step = EditStep("添加")
+            step.add(entry_id, None, entry)
+            self.history.push(step)
+            return entry_id
+
+    def update(self, entry_id, word, code, weight=DEFAULT_WEIGHT, code2=""):
+        """修改指定编号的词条"""
+        entry = self._make_entry(word, code, weight, code2)
+        with self._lock:
+            old = self._entries[entry_id]
+            if old is None:
+                raise KeyError(entry_id)
+            if old == entry:
+                # 内容没有变化，不算修改
+                return
+            self._log([{"op": "update", "id": entry_id, "old": old, "new": entry}])
+            self._replace(entry_id, entry)
+            step = EditStep("修改")
+            step.add(entry_id, old, entry)
+            self.history.push(step)
+
+    def import_entries(self, entries, policy="skip", progress=None):
+        """批量导入 (词汇, 编码, 权重, 编码2) 序列，返回 ImportResult
+
+        词汇和编码都相同的词条视为同一条：overwrite 时改为新的权重和编码2，
+        max-weight 时只在新权重更高时修改，其余情况跳过。编码已存在但词汇不同
+        （编码冲突）时按 policy 处理，与界面添加单个词条时的三个选项对应。
+        导入只修改内存，由调用方最后保存一次。progress(已读条数) 每批调用一次。
+        """
+        if policy not in IMPORT_POLICIES:
+            raise ValueError(f"未知的导入方式: {policy}")
+        start = time.perf_counter()
+        counts = dict.fromkeys(("read", "added", "updated", "skipped", "conflicts"), 0)
+        self._ensure_indexes()
+        with self._lock:
+            # 逐条插入有序的编码数组太慢，导入后再按需整体重建
+            self._drop_search_index()
+        # 整个导入是一步，可以一次撤销
+        step = EditStep("导入")
+        with profiler.timer("import", policy=policy) as info:
+            batch = []
+            for entry in entries:
+                batch.append(entry)
+                if len(batch) >= IMPORT_BATCH:
+                    self._import_batch(batch, policy, counts, step)
+                    batch.clear()
+                    if progress is not None:
+                        progress(counts["read"])
+            self._import_batch(batch, policy, counts, step)
+            info.update(counts)
+        with self._lock:
+            self.history.push(step)
+        return ImportResult(seconds=time.perf_counter() - start, **counts)
+
+    def _import_batch(self, batch, policy, counts, step):
+        # 先修改内存，释放锁之前整批写入日志：保存要等到锁释放，所以日志仍先于文件落盘
+        records = []
+        entries = self._entries
+        with self._lock:
+            for word, code, weight, code2 in batch:
+                counts["read"] += 1
+                entry = self._make_entry(word, code, weight, code2)
+                target = next((i for i in self._word_index.get(word) if entries.code(i) == code), None)
+                if target is None:
+                    target = self._code_index.first(code)
+                    if target is not None:
+                        counts["conflicts"] += 1
+                    if target is None or policy == "keep-both":
+                        records.append({"op": "add", "id": len(entries), "new": entry})
+                        step.add(self._insert(entry), None, entry)
+                        counts["added"] += 1
+                        continue
+                    if policy == "skip":
+                        counts["skipped"] += 1
+                        continue
+                elif policy in ("skip", "keep-both"):
+                    counts["skipped"] += 1
+                    continue
+                old = entries[target]
+                if old == entry or policy == "max-weight" and weight_value(entry[2]) <= weight_value(old[2]):
+                    counts["skipped"] += 1
+                    continue
+                records.append({"op": "update", "id": target, "old": old, "new": entry})
+                self._replace(target, entry)
+                step.add(target, old, entry)
+                counts["updated"] += 1
+            if records:
+                self._log(records)
+
+    def delete(self, entry_ids):
+        """删除多个词条，返回实际删除的数量"""
+        with self._lock:
+            entry_ids = [entry_id for entry_id in dict.fromkeys(entry_ids) if self._entries[entry_id] is not None]
+            if not entry_ids:
+                return 0
+            self._log([{"op": "delete", "id": entry_id, "old": self._entries[entry_id]} for entry_id in entry_ids])
+            if len(entry_ids) > BULK_REINDEX_THRESHOLD:
+                self._drop_search_index()
+            step = EditStep(f"删除 {len(entry_ids)} 条")
+            for entry_id in entry_ids:
+                step.add(entry_id, self._remove(entry_id), None)
+            self._live -= len(entry_ids)
+            self.history.push(step)
+        return len(entry_ids)
+
+    # ---- 撤销和重做 ----
+
+    def undo(self):
+        """撤销最近一步修改，返回该步骤（EditStep），没有可撤销的修改时返回 None"""
+        with self._lock:
+            step = self.history.pop_undo()
+            if step is not None:
+                self._apply_step(step, undo=True)
+                self.history.undone(step)
+            return step
+
+    def redo(self):
+        """重做最近撤销的一步，返回该步骤，没有可重做的修改时返回 None"""
+        with self._lock:
+            step = self.history.pop_redo()
+            if step is not None:
+                self._apply_step(step, undo=False)
+                self.history.redone(step)
+            return step
+
+    def _apply_step(self, step, undo):
+        """把一步中的词条从一侧的值改为另一侧的值，只改内存，并照常写编辑日志
+
+        编号对不上（从文件恢复的步骤，或词条已被其他修改改动）时按词条内容查找，
+        找不到的跳过；放回的词条优先回到原来的编号，原编号已被占用时追加为新词条。
+        """
+        if len(step) > BULK_REINDEX_THRESHOLD:
+            self._drop_search_index()
+        entries = self._entries
+        records = []
+        removed = 0
+        for i, entry_id, old, new in step.changes(reverse=undo):
+            expected, target = (new, old) if undo else (old, new)
+            valid = 0 <= entry_id < len(entries) and entries[entry_id] == expected
+            if expected is None:
+                if valid:
+                    self._restore(entry_id, target)
+                else:
+                    entry_id = self._insert(target)
+                records.append({"op": "add", "id": entry_id, "new": target})
+            else:
+                if not valid:
+                    matches = self.find(expected)
+                    if not matches:
+                        continue
+                    entry_id = matches[0]
+                if target is None:
+                    records.append({"op": "delete", "id": entry_id, "old": expected})
+                    self._remove(entry_id)
+                    removed += 1
+                else:
+                    records.append({"op": "update", "id": entry_id, "old": expected, "new": target})
+                    self._replace(entry_id, target)
+            step.ids[i] = entry_id
+        self._live -= removed
+        if records:
+            self._log(records)
+
+    # ---- 排序 ----
+
+    def sort(self, key="code", memory_limit=DEFAULT_MEMORY_LIMIT, force=False):
+        """按 key（code、word 或 weight）排序后整体重写文件并重新加载，可在后台线程调用
+
+        内存中未保存的修改一并写入。排序用外部归并排序，缓冲的词条超过 memory_limit
+        时写入临时文件。排序期间又有新的修改时保留编辑日志，重新加载时按日志重放
+        （没有开启日志时这些修改会丢失，界面在排序期间不应允许修改）。
+        文件被外部修改时与 save 一样处理。
+        """
+        with self._save_lock:
+            self._check_file(force)
+            with self._lock:
+                entries = self._entries.copy()
+                version = self._version
+            live = (entry for entry in entries if entry is not None)
+            with profiler.timer("sort", key=key, entries=self._live):
+                write_dict(self.dict_path, external_sort(live, key, memory_limit),
+                           self.header, self.switch_order, self.enable_code2, layout=self.layout)
+            with self._lock:
+                if self.journal is not None and self._version == version:
+                    self.journal.clear()
+            self.load()
+
+    def pending_changes(self):
+        """与文件相比尚未保存的修改，返回 ChangeSet
+
+        改了又改回原样的词条不计入。上次整体重写期间又有修改、无法按行对应时返回 None。
+        """
+        with self._lock:
+            if self._offsets is None:
+                return None if self.dirty else ChangeSet([], [], [])
+            entries = self._entries
+            added = [entry_id for entry_id in dict.fromkeys(self._unwritten) if entries[entry_id] is not None]
+            modified = []
+            deleted = []
+            for entry_id, old in self._on_disk.items():
+                entry = entries[entry_id]
+                if entry is None:
+                    deleted.append(entry_id)
+                elif entry != old:
+                    modified.append(entry_id)
+            return ChangeSet(added, sorted(modified), sorted(deleted))
+
+    # ---- 保存 ----
+
+    def save(self, compact=False, force=False):
+        """把内存中的修改写回文件，可在后台线程调用
+
+        能按偏移修改时只写改动的部分；列格式改变、作废行过多或 compact 为真时整体重写。
+        文件在加载后被外部修改过时，只在末尾追加的内容先并入模型再保存；其他修改
+        会抛出 DictConflictError，force 为真时则用内存中的内容整体覆盖文件。
+        """
+        with self._save_lock, profiler.timer("save", path=self.dict_path) as info:
+            self._check_file(force)
+            info["mode"] = "patch"
+            if compact or not self._can_patch() or not self._patch_under_lock():
+                info["mode"] = "rewrite"
+                self._rewrite_file()
+            with self._lock:
+                # 写文件期间没有新的修改时，日志中的记录都已落盘
+                if self.journal is not None and not self.dirty:
+                    self.journal.clear()
+                try:
+                    self.history.save(self._stamp)
+                except OSError:
+                    pass  # 历史只是辅助，写不进去不影响已保存的词典
+
+    def close_history(self):
+        """关闭词典时整理撤销历史文件，只保留现有的步骤；有未保存的修改时不整理"""
+        with self._lock:
+            if self.dirty or self._stamp is None:
+                return
+            try:
+                self.history.close(self._stamp)
+            except OSError:
+                pass
+
+    def _patch_under_lock(self):
+        with self._lock:
+            return self._patch_file()
+
+    def _can_patch(self):
+        if self._offsets is None or self._format != (self.switch_order, self.enable_code2):
+            return False
+        stamp = file_stamp(self.dict_path)
+        return stamp == self._stamp and self._garbage <= stamp[1] * COMPACT_RATIO
+
+    def _patch_file(self):
+        """按偏移增量修改文件，文件内容与记录不符或无法编码时返回 False（此时尚未写入任何内容）"""
+        encoding = "utf-8" if self.encoding == "utf-8-sig" else self.encoding
+        entries = self._entries
+        offsets = self._offsets
+        patches = []  # (偏移, 新内容)
+        appended = []
+        garbage = 0
+        try:
+            with open(self.dict_path, "r+b") as f:
+                # 先核对和编码所有内容，确认都没问题后再写
+                for entry_id, old in self._on_disk.items():
+                    f.seek(offsets[entry_id])
+                    raw = f.readline()
+                    if parse_line(raw.decode(self.encoding), self.enable_code2, self.layout) != old:
+                        return False
+                    entry = entries[entry_id]
+                    if entry is not None:
+                        data = format_entry(entry, self.switch_order, self.enable_code2, self.layout).encode(encoding)
+                        if raw.endswith(b"\r\n"):
+                            data = data[:-1] + b"\r\n"
+                        if len(data) == len(raw):
+                            patches.append((offsets[entry_id], data))
+                            continue
+                        appended.append(entry_id)
+                    patches.append((offsets[entry_id], tombstone_line(raw)))
+                    garbage += len(raw)
+                # 撤销删除后又重做、再撤销时同一编号可能出现多次
+                appended.extend(entry_id for entry_id in dict.fromkeys(self._unwritten) if entries[entry_id] is not None)
+                newline = self._newline
+                lines = [format_entry(entries[entry_id], self.switch_order, self.enable_code2, self.layout)
+                         .encode(encoding) for entry_id in appended]
+                if newline != b"\n":
+                    lines = [data[:-1] + newline for data in lines]
+
+                # 先追加新行并落盘，再作废旧行：两次写入之间退出时旧行和新行都在文件中，
+                # 重放日志时会去掉旧行；反过来则修改后的词条在文件和日志中都找不到
+                position = f.seek(0, os.SEEK_END)
+                if lines:
+                    if position:
+                        f.seek(position - 1)
+                        if f.read(1) != b"\n":
+                            f.seek(position)
+                            f.write(newline)
+                            position += len(newline)
+                    f.seek(position)
+                    f.write(b"".join(lines))
+                    f.flush()
+                    os.fsync(f.fileno())
+                for offset, data in patches:
+                    f.seek(offset)
+                    f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        except UnicodeError:
+            return False
+
+        for entry_id, data in zip(appended, lines):
+            offsets[entry_id] = position
+            position += len(data)
+        for entry_id in self._on_disk:
+            if entries[entry_id] is None:
+                offsets[entry_id] = -1
+        self._on_disk = {}
+        self._unwritten = []
+        self._garbage += garbage
+        self._stamp = file_stamp(self.dict_path)
+        self._remember_tail()
+        self.dirty = False
+        return True
+
+    def _rewrite_file(self):
+        """整体重写文件（UTF-8），同时重新记录每个词条的偏移"""
+        with self._lock:
+            entries = self._entries.copy()
+            version = self._version
+        positions = array("q")
+        write_dict(self.dict_path, (entry for entry in entries if entry is not None),
+                   self.header, self.switch_order, self.enable_code2, offsets=positions, layout=self.layout)
+        with self._lock:
+            self._stamp = file_stamp(self.dict_path)
+            self.encoding = "utf-8"
+            self._garbage = 0
+            self._format = (self.switch_order, self.enable_code2)
+            if self._version != version:
+                # 写文件期间又有修改：文件与内存不再对应，下次保存仍整体重写
+                self._offsets = None
+                self._tail = None
+                return
+            offsets = array("q", [-1]) * len(entries)
+            for entry_id, position in zip(entries.ids(), positions):
+                offsets[entry_id] = position
+            self._offsets = offsets
+            self._remember_tail()
+            self._on_disk = {}
+            self._unwritten = []
+            self.dirty = False
@@ -0,0 +1,135 @@
+"""跨多个词典的并行查询和流式归并"""
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+from .cache import ParseCache, cache_enabled
+from .extsort import SORT_KEYS
+from .parser import DictReader, iter_dict_entries, read_dict
+from .perf import profiler
+
+
+def _match_exact(text, entry):
+    return entry[0] == text or entry[1] == text
+
+
+def _match_prefix(text, entry):
+    return entry[1].startswith(text)
+
+
+def _match_partial(text, entry):
+    return text in entry[0] or text in entry[1]
+
+
+# 查询方式与界面中的三种匹配模式对应
+MATCHERS = {
+    "exact": _match_exact,
+    "prefix": _match_prefix,
+    "partial": _match_partial,
+}
+
+
+def _cached_entries(dict_path, enable_code2):
+    """界面打开过的词典在解析缓存中有现成的结果，两种列次序的缓存都可以用"""
+    if not cache_enabled():
+        return None
+    cache = ParseCache()
+    for switch_order in (False, True):
+        data = cache.load(dict_path, switch_order, enable_code2)
+        if data is not None:
+            return data.entries
+    return None
+
+
+def search_file(dict_path, text, mode="exact", enable_code2=False):
+    """在一个词典中查询，返回匹配的 (词汇, 编码, 权重, 编码2) 列表
+
+    是模块级函数，可以交给子进程执行。命中解析缓存时直接扫描缓存，否则流式读取文件。
+    """
+    match = MATCHERS[mode]
+    entries = _cached_entries(dict_path, enable_code2)
+    if entries is not None:
+        return [entry for entry in entries if entry is not None and match(text, entry)]
+    try:
+        return [entry for entry in iter_dict_entries(dict_path, enable_code2) if match(text, entry)]
+    except UnicodeDecodeError:
+        # 开头判断的编码在文件中途失效，改用会依次尝试其他编码的整体读取
+        return [entry for entry in read_dict(dict_path, enable_code2).entries if match(text, entry)]
+
+
+def search_files(dict_paths, text, mode="exact", enable_code2=False, executor=None, progress=None):
+    """用进程池并行查询多个词典，返回 (结果, 错误)
+
+    结果为按 dict_paths 次序排列的 (词典路径, 词条) 列表，错误为无法读取的 (词典路径, 异常) 列表。
+    executor 可传入复用的进程池，省去每次启动子进程的开销。
+    progress(fraction) 在每个词典查完后调用，可以在其中抛出异常中止查询。
+    """
+    with ExitStack() as stack:
+        info = stack.enter_context(profiler.timer("search_all", mode=mode, dicts=len(dict_paths)))
+        if executor is None:
+            executor = stack.enter_context(ProcessPoolExecutor())
+        futures = [executor.submit(search_file, path, text, mode, enable_code2) for path in dict_paths]
+        results = []
+        errors = []
+        try:
+            for i, (path, future) in enumerate(zip(dict_paths, futures)):
+                try:
+                    results.extend((path, entry) for entry in future.result())
+                except (OSError, ValueError) as e:
+                    errors.append((path, e))
+                if progress is not None:
+                    progress((i + 1) / len(futures))
+        finally:
+            for future in futures:
+                future.cancel()
+        info["results"] = len(results)
+    return results, errors
+
+
+def _check_sorted(entries, key, name):
+    previous = None
+    for entry in entries:
+        k = key(entry)
+        if previous is not None and k < previous:
+            raise ValueError(f"{name} 没有排序，请先排序再归并")
+        previous = k
+        yield entry
+
+
+def kway_merge(sources, key=SORT_KEYS["code"]):
+    """把若干已按 key 排序的词条序列归并为一个有序序列，并去掉完全相同的词条
+
+    用 heapq.merge 逐条归并，键相同时保持输入的先后次序。内存中只有每个输入的
+    当前词条和键相同的一组词条，输入再大也不会整个载入。
+    """
+    group_key = object()
+    group = set()
+    for entry in heapq.merge(*sources, key=key):
+        k = key(entry)
+        if k != group_key:
+            group_key = k
+            group = set()
+        if entry not in group:
+            group.add(entry)
+            yield entry
+
+
+def merge_dict_files(dict_paths, key=SORT_KEYS["code"], enable_code2=False):
+    """流式归并多个已排序的词典，返回 (头部, 词条迭代器)
+
+    头部取自第一个词典。输入未按 key 排序时，迭代到乱序处会抛出 ValueError。
+    """
+    stack = ExitStack()
+    try:
+        readers = [stack.enter_context(DictReader(path, enable_code2)) for path in dict_paths]
+    except BaseException:
+        stack.close()
+        raise
+    header = readers[0].header if readers else ""
+
+    def entries():
+        with stack:
+            sources = [_check_sorted(reader, key, path) for path, reader in zip(dict_paths, readers)]
+            yield from kway_merge(sources, key)
+
+    return header, entries()
@@ -0,0 +1,289 @@
+"""Rime 词典文件的流式解析"""
+import codecs
+import os
+from array import array
+from collections import namedtuple
+
+from .header import column_layout, parse_header
+
+
+# 依次尝试的编码，与旧版逐个读取整文件的顺序一致
+ENCODINGS = ("utf-8", "gbk", "gb18030", "utf-16")
+# 用于判断编码的文件开头字节数
+SNIFF_SIZE = 64 * 1024
+# 编码列缺省时使用的权重
+DEFAULT_WEIGHT = "100"
+# 每解析这么多条报告一次进度
+PROGRESS_INTERVAL = 0x10000
+
+
+class DictEncodingError(ValueError):
+    """无法识别词典文件的编码"""
+
+
+# read_dict 的结果；offsets 为每个词条所在行的字节偏移（无法按字节定位时为 None），
+# tombstone_bytes 为已作废行（只剩 # 和空格）占用的字节数
+DictData = namedtuple("DictData", "entries header encoding offsets tombstone_bytes")
+
+
+def is_byte_encoding(encoding):
+    """换行符是否为单个 0x0A 字节，只有这样才能按字节偏移定位每一行"""
+    return not codecs.lookup(encoding).name.startswith(("utf-16", "utf-32"))
+
+
+def file_stamp(dict_path):
+    """文件的 (修改时间, 大小)，文件不存在时返回 None"""
+    try:
+        st = os.stat(dict_path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def sniff_encoding(prefix, candidates=ENCODINGS):
+    """根据 BOM 或开头的一段字节判断编码"""
+    if prefix.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if prefix.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    for encoding in candidates:
+        # 开头片段可能截断在多字节字符中间，用增量解码器容忍末尾残缺
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            decoder.decode(prefix, final=False)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    raise DictEncodingError("无法正确读取文件，请检查文件编码")
+
+
+def detect_encoding(dict_path, candidates=ENCODINGS):
+    """读取文件开头一小段并判断编码"""
+    with open(dict_path, "rb") as f:
+        prefix = f.read(SNIFF_SIZE)
+    return sniff_encoding(prefix, candidates)
+
+
+def parse_line(line, enable_code2=False, layout=None):
+    """解析一行词条，返回 (词汇, 编码, 权重, 编码2)；空行、注释或无效行返回 None
+
+    layout 为头部 columns 对应的列号（见 header.column_layout），给出时按列号取各字段，
+    否则第二列为纯数字时视为 词汇 权重 编码 的次序。
+    """
+    line = line.strip()
+    if not line or line[0] == "#":
+        return None
+    parts = line.split("\t")
+    count = len(parts)
+    if count < 2:
+        return None
+    if layout is not None:
+        text, code, weight, stem = layout
+        return (
+            parts[text].strip() if text < count else "",
+            parts[code].strip() if 0 <= code < count else "",
+            parts[weight].strip() if 0 <= weight < count else DEFAULT_WEIGHT,
+            parts[stem].strip() if enable_code2 and 0 <= stem < count else "",
+        )
+    word = parts[0].strip()
+    second_field = parts[1].strip()
+    code2 = parts[3].strip() if enable_code2 and count >= 4 else ""
+    # 第二列为纯数字时视为 词汇 权重 编码 的次序
+    if second_field.isdecimal():
+        weight = second_field
+        code = parts[2].strip() if count >= 3 else ""
+    else:
+        code = second_field
+        weight = parts[2].strip() if count >= 3 else DEFAULT_WEIGHT
+    return (word, code, weight, code2)
+
+
+def is_tombstone(line):
+    """是否为作废行（# 加空格，见 writer.tombstone_line）；单独的 # 不算，它在 txt 头部注释中很常见"""
+    content = line.rstrip("\r\n")
+    return len(content) > 1 and content[0] == "#" and not content.strip("# ")
+
+
+def is_yaml_dict(dict_path):
+    """是否为 .dict.yaml 格式（以 ... 分隔头部）"""
+    return os.path.splitext(dict_path)[1].lower() == ".yaml"
+
+
+class DictReader:
+    """流式读取词典：打开时读取头部，迭代时逐行产出 (词汇, 编码, 权重, 编码2)
+
+    track_offsets 为真且编码允许时以二进制方式逐行解码，并在 offsets 中按词条
+    顺序记录每行的字节偏移，供按偏移原地修改文件使用。
+    """
+
+    def __init__(self, dict_path, enable_code2=False, encoding=None, track_offsets=False):
+        self.dict_path = dict_path
+        self.enable_code2 = enable_code2
+        self.encoding = encoding or detect_encoding(dict_path)
+        self.track_offsets = track_offsets and is_byte_encoding(self.encoding)
+        self.offsets = array("q") if self.track_offsets else None
+        self.tombstone_bytes = 0
+        self.header = ""
+        self.layout = None  # 头部声明了 columns 时各字段所在的列号
+        self._file = None
+        self._first_line = None  # txt 头部注释之后的第一行
+        self._position = 0  # 二进制方式下已读取的字节数
+
+    def open(self):
+        """打开文件并读取头部"""
+        if self.track_offsets:
+            self._file = open(self.dict_path, "rb")
+        else:
+            self._file = open(self.dict_path, "r", encoding=self.encoding)
+        try:
+            self._read_header()
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    def _header_lines(self):
+        """逐行产出头部阶段的 (字节偏移, 文本)，文本方式下偏移为 None"""
+        if not self.track_offsets:
+            for line in self._file:
+                yield None, line
+            return
+        for raw in self._file:
+            start = self._position
+            self._position += len(raw)
+            yield start, raw.decode(self.encoding)
+
+    def _read_header(self):
+        header_lines = []
+        if is_yaml_dict(self.dict_path):
+            # YAML 格式：头部包括 ... 及其之前的所有内容
+            for _, line in self._header_lines():
+                header_lines.append(line.rstrip("\r\n") + "\n")
+                if line.strip() == "...":
+                    break
+            self.layout = column_layout(parse_header("".join(header_lines)).columns)
+        else:
+            # TXT 格式：开头的注释行作为头部；第一条词条被作废后留下的作废行不算头部
+            for position, line in self._header_lines():
+                if not line.startswith("#") or is_tombstone(line):
+                    self._first_line = (position, line)
+                    break
+                header_lines.append(line.rstrip("\r\n") + "\n")
+        self.header = "".join(header_lines)
+
+    def tell_bytes(self):
+        """已读取的字节数（按缓冲区位置估算），用于显示进度"""
+        if self.track_offsets:
+            return self._file.tell()
+        return self._file.buffer.tell()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        if self._file is None:
+            raise ValueError("词典文件未打开")
+        enable_code2 = self.enable_code2
+        layout = self.layout
+        if self._first_line is not None:
+            position, line = self._first_line
+            self._first_line = None
+            entry = parse_line(line, enable_code2, layout)
+            if entry is not None:
+                if self.track_offsets:
+                    self.offsets.append(position)
+                yield entry
+            elif self.track_offsets and is_tombstone(line):
+                self.tombstone_bytes += len(line.encode(self.encoding))
+        if self.track_offsets:
+            yield from self._iter_with_offsets()
+            return
+        for line in self._file:
+            entry = parse_line(line, enable_code2, layout)
+            if entry is not None:
+                yield entry
+
+    def _iter_with_offsets(self):
+        enable_code2 = self.enable_code2
+        layout = self.layout
+        encoding = self.encoding
+        append_offset = self.offsets.append
+        position = self._position
+        for raw in self._file:
+            line = raw.decode(encoding)
+            entry = parse_line(line, enable_code2, layout)
+            if entry is not None:
+                append_offset(position)
+                yield entry
+            elif is_tombstone(line):
+                self.tombstone_bytes += len(raw)
+            position += len(raw)
+        self._position = position
+
+
+def iter_dict_entries(dict_path, enable_code2=False, encoding=None):
+    """逐条产出词典中的 (词汇, 编码, 权重, 编码2)，不保留整个文件内容"""
+    with DictReader(dict_path, enable_code2, encoding) as reader:
+        yield from reader
+
+
+def read_dict_header(dict_path):
+    """只读取并解析头部，返回 DictHeader（TXT 词典的各字段为空）"""
+    with DictReader(dict_path) as reader:
+        return parse_header(reader.header if is_yaml_dict(dict_path) else "")
+
+
+def fallback_encodings(encoding):
+    """解码中途失败时可继续尝试的编码（开头片段已排除更靠前的候选）"""
+    if encoding in ENCODINGS:
+        return ENCODINGS[ENCODINGS.index(encoding):]
+    return (encoding,)
+
+
+def read_dict(dict_path, enable_code2=False, progress=None, track_offsets=False, container=list):
+    """读取整个词典，返回 DictData，词条为 (词汇, 编码, 权重, 编码2)
+
+    progress(fraction) 会被定期调用，可以在其中抛出异常中止读取。
+    container 是存放词条的容器类型（需支持 append 和 extend），如 EntryStore。
+    """
+    for encoding in fallback_encodings(detect_encoding(dict_path)):
+        try:
+            with DictReader(dict_path, enable_code2, encoding, track_offsets) as reader:
+                entries = container()
+                if progress is None:
+                    entries.extend(reader)
+                else:
+                    _read_with_progress(reader, progress, entries)
+        except UnicodeDecodeError:
+            continue
+        return DictData(entries, reader.header, encoding, reader.offsets, reader.tombstone_bytes)
+    raise DictEncodingError("无法正确读取文件，请检查文件编码")
+
+
+def _read_with_progress(reader, progress, entries):
+    size = os.path.getsize(reader.dict_path) or 1
+    append = entries.append
+    for i, entry in enumerate(reader):
+        append(entry)
+        if not i % PROGRESS_INTERVAL:
+            progress(min(1.0, reader.tell_bytes() / size))
+
+
+def load_dict_entries(dict_path, switch_order=False, enable_code2=False):
+    """加载词典的全部词条，返回 (词条列表, 文件头部, 第一条词条文本)
+
+    词条按界面显示次序排列：切换次序时为 (词汇, 权重, 编码, 编码2)，否则为 (词汇, 编码, 权重, 编码2)。
+    """
+    entries, header = read_dict(dict_path, enable_code2)[:2]
+    if switch_order:
+        entries = [(word, weight, code, code2) for word, code, weight, code2 in entries]
+    first_entry = "\t".join(entries[0]) if entries else ""
+    return entries, header, first_entry
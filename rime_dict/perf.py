@@ -0,0 +1,133 @@
+"""可选的性能记录：各项文件操作的耗时和内存峰值
+
+设置环境变量 RIME_DICT_PROFILE（值为 1 或日志文件路径），或在命令行加 --profile 时开启。
+开启后每次计时生成一条记录，以 JSON lines 追加到日志文件，界面在状态栏显示最近一条。
+内存峰值由 tracemalloc 统计，它会明显拖慢内存分配；设置 RIME_DICT_PROFILE_MEMORY=0
+可只记录耗时。未开启时 timer() 只多一次判断。
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+from .cache import default_cache_dir
+
+
+PROFILE_ENV = "RIME_DICT_PROFILE"
+PROFILE_MEMORY_ENV = "RIME_DICT_PROFILE_MEMORY"
+# 内存中保留的最近记录条数
+MAX_RECORDS = 256
+
+# 一次计时的结果；peak_bytes 为计时期间 Python 对象内存的峰值增量，未统计内存时为 None
+Record = namedtuple("Record", "name seconds peak_bytes fields")
+
+
+def default_log_path():
+    return os.path.join(default_cache_dir(), "profile.jsonl")
+
+
+def format_record(record):
+    """供状态栏和命令行显示的一行摘要"""
+    text = f"{record.name} {record.seconds * 1000:.1f} ms"
+    if record.peak_bytes is not None:
+        text += f"，内存峰值 +{record.peak_bytes / (1024 * 1024):.1f} MiB"
+    details = "，".join(f"{key}={value}" for key, value in record.fields.items())
+    return f"{text}（{details}）" if details else text
+
+
+class Profiler:
+    """记录耗时和内存峰值；可在多个线程中同时计时
+
+    tracemalloc 的峰值是全局的，只在没有其他计时进行时才重置，因此嵌套或并发的
+    计时报告的是从最外层计时开始以来的峰值。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.log_path = None
+        self.records = deque(maxlen=MAX_RECORDS)
+        self.listeners = []  # 每条记录生成后在计时所在的线程中调用 listener(record)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._started_tracing = False
+
+    def enable(self, log_path=None, trace_memory=True):
+        """开始记录；log_path 为空字符串时不写日志文件，None 时写入默认位置"""
+        self.log_path = default_log_path() if log_path is None else log_path or None
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self.enabled = True
+
+    def enable_from_env(self):
+        """按环境变量开启，返回是否已开启"""
+        value = os.environ.get(PROFILE_ENV)
+        if value and not self.enabled:
+            trace_memory = os.environ.get(PROFILE_MEMORY_ENV, "1") != "0"
+            self.enable(None if value == "1" else value, trace_memory)
+        return self.enabled
+
+    def disable(self):
+        self.enabled = False
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def timer(self, name, **fields):
+        """为 with 块计时；块内可向产出的字典中补充字段（如结果条数），一并写入记录"""
+        if not self.enabled:
+            yield fields
+            return
+        trace_memory = self.trace_memory and tracemalloc.is_tracing()
+        base = 0
+        if trace_memory:
+            with self._lock:
+                if not self._active:
+                    tracemalloc.reset_peak()
+                self._active += 1
+                base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            seconds = time.perf_counter() - start
+            peak = None
+            if trace_memory:
+                with self._lock:
+                    self._active -= 1
+                    peak = max(tracemalloc.get_traced_memory()[1] - base, 0)
+            self._record(Record(name, seconds, peak, fields))
+
+    def _record(self, record):
+        self.records.append(record)
+        if self.log_path:
+            line = json.dumps({
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "op": record.name,
+                "seconds": round(record.seconds, 6),
+                "peak_bytes": record.peak_bytes,
+                **record.fields,
+            }, ensure_ascii=False, default=str)
+            try:
+                with self._lock:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(line + "\n")
+            except OSError:
+                # 日志写不进去不影响正常功能
+                pass
+        for listener in list(self.listeners):
+            listener(record)
+
+    def latest(self):
+        return self.records[-1] if self.records else None
+
+
+# 全局的记录器，各模块都通过它计时
+profiler = Profiler()
@@ -0,0 +1,177 @@
+"""部分匹配和前缀查询使用的搜索索引"""
+from array import array
+from bisect import bisect_left, bisect_right
+import threading
+from collections import OrderedDict
+
+
+def bigrams(text):
+    """文本中所有不重复的相邻两字"""
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class SearchIndex:
+    """按编码排序的数组（前缀查询用 bisect）加上倒排表（子串查询）
+
+    倒排表收录词汇和编码的二元组，以及词汇中的单字（编码的字母太常见，单字查询时
+    编码一侧由调用方扫描不重复的编码表），只用于筛选候选词条，多字查询仍由调用方逐条核对。
+    修改或删除词条时不从倒排表中移除旧编号，而是把编号记入 stale，核对时自然会被
+    过滤，这样增量更新只需要追加。
+    """
+
+    def __init__(self):
+        self._codes = []  # 按编码排序
+        self._code_ids = []  # 与 _codes 一一对应的词条编号
+        self._postings = {}  # 二元组或词汇中的单字 -> array('i') 词条编号
+        self.stale = set()  # 修改或删除过的编号，它们在倒排表中的记录可能已过时
+
+    @classmethod
+    def build(cls, items):
+        """由 (编号, 词条) 序列构建索引"""
+        index = cls()
+        pairs = []
+        postings = index._postings
+        for entry_id, entry in items:
+            word, code = entry[0], entry[1]
+            pairs.append((code, entry_id))
+            for gram in bigrams(word) | bigrams(code) | set(word):
+                ids = postings.get(gram)
+                if ids is None:
+                    postings[gram] = ids = array("i")
+                ids.append(entry_id)
+        pairs.sort()
+        index._codes = [code for code, _ in pairs]
+        index._code_ids = [entry_id for _, entry_id in pairs]
+        return index
+
+    def add(self, entry_id, entry):
+        word, code = entry[0], entry[1]
+        pos = bisect_right(self._codes, code)
+        self._codes.insert(pos, code)
+        self._code_ids.insert(pos, entry_id)
+        postings = self._postings
+        for gram in bigrams(word) | bigrams(code) | set(word):
+            ids = postings.get(gram)
+            if ids is None:
+                postings[gram] = ids = array("i")
+            ids.append(entry_id)
+
+    def remove(self, entry_id, entry):
+        self.stale.add(entry_id)
+        code = entry[1]
+        lo = bisect_left(self._codes, code)
+        hi = bisect_right(self._codes, code, lo)
+        for pos in range(lo, hi):
+            if self._code_ids[pos] == entry_id:
+                del self._codes[pos]
+                del self._code_ids[pos]
+                return
+
+    def prefix(self, prefix):
+        """编码以 prefix 开头的词条编号，按文件次序排列"""
+        codes = self._codes
+        lo = bisect_left(codes, prefix)
+        # 以 prefix 开头的编码都小于 prefix 加上最大码位
+        hi = bisect_right(codes, prefix + "\U0010ffff", lo)
+        return sorted(self._code_ids[lo:hi])
+
+    def candidates(self, text):
+        """可能包含 text 的词条编号（有序、不重复）；text 少于两个字时返回 None（单字用 word_char）"""
+        grams = bigrams(text)
+        if not grams:
+            return None
+        postings = self._postings
+        smallest = None
+        for gram in grams:
+            ids = postings.get(gram)
+            if ids is None:
+                return []
+            if smallest is None or len(ids) < len(smallest):
+                smallest = ids
+        return sorted(set(smallest))
+
+    def word_char(self, char):
+        """词汇中含有单字 char 的编号：返回 (确定匹配的编号集合, 需要核对的编号集合)
+
+        没有修改过的编号确定匹配，stale 中的编号可能已删除或改过，要由调用方核对。
+        """
+        ids = self._postings.get(char)
+        if not ids:
+            return set(), set()
+        ids = set(ids)
+        check = ids & self.stale
+        return ids - check, check
+
+
+# 新查询可以在哪些旧查询的结果中筛选：部分匹配时旧查询是新查询的子串，前缀匹配时是其前缀
+NARROWS = {
+    "partial": lambda old, new: old in new,
+    "prefix": lambda old, new: new.startswith(old),
+}
+
+
+class QueryCache:
+    """最近查询结果的 LRU 缓存，结果以 array('i') 保存
+
+    条数不超过 max_queries，所有结果的编号总数不超过 max_ids。缓存的结果只对
+    同一版本的词典有效，版本变化（有修改）时全部丢弃。被取消的旧查询可能仍在
+    后台线程中运行，所以各方法都加锁。
+    """
+
+    def __init__(self, max_queries=64, max_ids=4_000_000):
+        self.max_queries = max_queries
+        self.max_ids = max_ids
+        self._results = OrderedDict()  # (模式, 文本) -> array('i')
+        self._total = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._results.clear()
+            self._total = 0
+            self._version = version
+
+    def get(self, mode, text, version):
+        """缓存中的结果，没有时返回 None"""
+        with self._lock:
+            self._check_version(version)
+            ids = self._results.get((mode, text))
+            if ids is not None:
+                self._results.move_to_end((mode, text))
+            return ids
+
+    def narrowest(self, mode, text, version):
+        """可以从中筛选出 text 结果的最小的旧结果，没有时返回 None"""
+        narrows = NARROWS.get(mode)
+        if narrows is None:
+            return None
+        best = None
+        with self._lock:
+            self._check_version(version)
+            for (cached_mode, cached_text), ids in self._results.items():
+                if cached_mode == mode and narrows(cached_text, text) and (best is None or len(ids) < len(best)):
+                    best = ids
+        return best
+
+    def put(self, mode, text, version, ids):
+        """保存结果并返回以 array('i') 保存的结果"""
+        ids = ids if isinstance(ids, array) else array("i", ids)
+        if len(ids) > self.max_ids:
+            return ids
+        with self._lock:
+            self._check_version(version)
+            old = self._results.pop((mode, text), None)
+            if old is not None:
+                self._total -= len(old)
+            self._results[(mode, text)] = ids
+            self._total += len(ids)
+            while len(self._results) > self.max_queries or self._total > self.max_ids:
+                _, evicted = self._results.popitem(last=False)
+                self._total -= len(evicted)
+        return ids
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._total = 0
@@ -0,0 +1,165 @@
+"""按列存放词条的紧凑容器"""
+from array import array
+
+
+# 词汇位置编码为 (起始字节 << WORD_LENGTH_BITS) | 字节数，一次赋值即可原子地更新
+WORD_LENGTH_BITS = 24
+WORD_LENGTH_MASK = (1 << WORD_LENGTH_BITS) - 1
+# 权重数组中表示“原文不是规范整数，见 _weight_text”的值
+WEIGHT_TEXT = -(1 << 31)
+# 编码编号为该值表示词条已删除
+DELETED = -1
+
+
+def canonical_weight(weight):
+    """权重文本能按整数无损保存时返回该整数（如 "100"；"0100"、"" 或超出范围的不行），否则返回 None"""
+    # 绝大多数权重是不超过 9 位的无前导零十进制数，先走快速判断
+    if 0 < len(weight) < 10 and weight.isascii() and weight.isdigit() and (weight[0] != "0" or weight == "0"):
+        return int(weight)
+    try:
+        value = int(weight)
+    except ValueError:
+        return None
+    if WEIGHT_TEXT < value < -WEIGHT_TEXT and str(value) == weight:
+        return value
+    return None
+
+
+class EntryStore:
+    """代替 (词汇, 编码, 权重, 编码2) 元组列表的列式存储
+
+    - 词汇以 UTF-8 拼接在一个 bytearray 中，每条只记一个 64 位的位置；
+    - 编码去重后存入编码表，每条只记 32 位的编号（同时用 DELETED 标记已删除）；
+    - 权重存为 array('i')，原文不是规范整数时另存原文，保证写回时与原文件一致；
+    - 编码2 只为非空的词条保存。
+    每条约 16 字节加上词汇本身，而元组加四个字符串对象要 200 字节以上。
+
+    对外表现为以编号为下标的序列：取出的是元组，已删除的位置为 None，
+    可以 append、extend，也可以给某个位置赋新元组或 None（删除）。
+    修改后的词汇追加到缓冲区末尾，原来的字节不再使用。
+    """
+
+    def __init__(self):
+        self._words = bytearray()
+        self._word_pos = array("q")
+        self._code_ids = array("i")
+        self._codes = []  # 编码表：编号 -> 编码
+        self._code_map = {}  # 编码 -> 编号
+        self._weights = array("i")
+        self._weight_text = {}  # 编号 -> 非规范权重原文
+        self._code2 = {}  # 编号 -> 非空编码2
+
+    def __len__(self):
+        return len(self._code_ids)
+
+    def _intern(self, code):
+        code_id = self._code_map.get(code)
+        if code_id is None:
+            code_id = self._code_map[code] = len(self._codes)
+            self._codes.append(code)
+        return code_id
+
+    def _pack_word(self, word):
+        data = word.encode("utf-8", "surrogatepass")
+        if len(data) > WORD_LENGTH_MASK:
+            raise ValueError("词汇过长")
+        start = len(self._words)
+        self._words += data
+        return (start << WORD_LENGTH_BITS) | len(data)
+
+    def word(self, entry_id):
+        pos = self._word_pos[entry_id]
+        start = pos >> WORD_LENGTH_BITS
+        return self._words[start:start + (pos & WORD_LENGTH_MASK)].decode("utf-8", "surrogatepass")
+
+    def _set_weight(self, entry_id, weight):
+        value = canonical_weight(weight)
+        if value is None:
+            # 先存原文再改数组，并发读取时不会读到缺失的原文
+            self._weight_text[entry_id] = weight
+            self._weights[entry_id] = WEIGHT_TEXT
+        else:
+            self._weights[entry_id] = value
+            self._weight_text.pop(entry_id, None)
+
+    def _set_code2(self, entry_id, code2):
+        if code2:
+            self._code2[entry_id] = code2
+        else:
+            self._code2.pop(entry_id, None)
+
+    def append(self, entry):
+        word, code, weight, code2 = entry
+        entry_id = len(self._code_ids)
+        self._word_pos.append(self._pack_word(word))
+        self._weights.append(0)
+        self._set_weight(entry_id, weight)
+        self._set_code2(entry_id, code2)
+        # 编码编号最后追加，len() 增加时其余各列都已就绪
+        self._code_ids.append(self._intern(code))
+
+    def extend(self, entries):
+        append = self.append
+        for entry in entries:
+            append(entry)
+
+    def __getitem__(self, entry_id):
+        code_id = self._code_ids[entry_id]
+        if code_id == DELETED:
+            return None
+        if entry_id < 0:
+            entry_id += len(self._code_ids)
+        weight = self._weights[entry_id]
+        weight = self._weight_text[entry_id] if weight == WEIGHT_TEXT else str(weight)
+        return (self.word(entry_id), self._codes[code_id], weight, self._code2.get(entry_id, ""))
+
+    def __setitem__(self, entry_id, entry):
+        if entry_id < 0:
+            entry_id += len(self._code_ids)
+        if entry is None:
+            self._code_ids[entry_id] = DELETED
+            self._weight_text.pop(entry_id, None)
+            self._code2.pop(entry_id, None)
+            return
+        word, code, weight, code2 = entry
+        self._word_pos[entry_id] = self._pack_word(word)
+        self._set_weight(entry_id, weight)
+        self._set_code2(entry_id, code2)
+        self._code_ids[entry_id] = self._intern(code)
+
+    def __iter__(self):
+        for entry_id in range(len(self._code_ids)):
+            yield self[entry_id]
+
+    def is_deleted(self, entry_id):
+        return self._code_ids[entry_id] == DELETED
+
+    def ids(self):
+        """按次序产出未删除的编号，不必取出词条"""
+        for entry_id, code_id in enumerate(self._code_ids):
+            if code_id != DELETED:
+                yield entry_id
+
+    def code(self, entry_id):
+        return self._codes[self._code_ids[entry_id]]
+
+    def ids_with_code(self, match):
+        """按次序列出编码满足 match(编码) 的未删除编号；每个不同的编码只判断一次，不必逐条取出词条"""
+        matched = {code_id for code_id, code in enumerate(self._codes) if match(code)}
+        if not matched:
+            return []
+        return [entry_id for entry_id, code_id in enumerate(self._code_ids) if code_id in matched]
+
+    def copy(self):
+        """只读快照：之后对原容器的修改不影响副本"""
+        store = EntryStore.__new__(EntryStore)
+        # 词汇缓冲区只追加、已写入的字节不再改变，编码表也只追加，都可以共享
+        store._words = self._words
+        store._word_pos = array("q", self._word_pos)
+        store._code_ids = array("i", self._code_ids)
+        store._codes = self._codes
+        store._code_map = self._code_map
+        store._weights = array("i", self._weights)
+        store._weight_text = dict(self._weight_text)
+        store._code2 = dict(self._code2)
+        return store
@@ -0,0 +1,118 @@
+"""import_tables：主词典及其导入的词典组成的词典图
+
+Rime 编译主词典时会把 import_tables 中列出的词典（递归地）一并编入，实际生效的
+词汇是它们的并集。DictGraph 只读取各词典的头部来解析导入关系，词典本身在第一次
+查询时才加载；加载结果保存在 TableCache 中，文件不变时同一个词典只解析一次。
+"""
+import os
+import threading
+
+from .mapped import MappedDict
+from .model import DictModel
+from .parser import file_stamp, read_dict_header
+
+
+def open_table(dict_path, enable_code2=False):
+    """以只读方式打开导入的词典：优先映射文件，不支持的编码（UTF-16）整体解析"""
+    try:
+        return MappedDict(dict_path, enable_code2=enable_code2).load()
+    except ValueError:
+        return DictModel(dict_path, enable_code2=enable_code2).load()
+
+
+class TableCache:
+    """已加载的导入词典，按 (绝对路径, enable_code2) 缓存，文件改变时重新加载
+
+    可在多个 DictGraph 之间共享，切换主词典时不必重新解析共同导入的词典。
+    """
+
+    def __init__(self):
+        self._tables = {}  # (路径, enable_code2) -> (文件标记, 词典)
+        self._lock = threading.Lock()
+
+    def get(self, dict_path, enable_code2=False):
+        key = (os.path.abspath(dict_path), enable_code2)
+        with self._lock:
+            stamp = file_stamp(dict_path)
+            cached = self._tables.get(key)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+            table = open_table(dict_path, enable_code2)
+            if cached is not None and cached[1].read_only:
+                cached[1].close()
+            self._tables[key] = (stamp, table)
+            return table
+
+    def close(self):
+        with self._lock:
+            for _, table in self._tables.values():
+                if table.read_only:
+                    table.close()
+            self._tables.clear()
+
+
+def find_table(name, search_dirs):
+    """按名称查找 <名称>.dict.yaml，依次在 search_dirs 中查找，找不到时返回 None"""
+    for directory in search_dirs:
+        path = os.path.join(directory, name + ".dict.yaml")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class DictGraph:
+    """主词典 dict_path 递归导入的词典
+
+    导入的词典先在主词典所在目录查找（Rime 的用户目录），再依次在 search_dirs
+    （如共享数据目录）中查找。tables 为按导入次序展开的 [(名称, 路径)]，
+    不含主词典本身，重复或循环导入的只出现一次；missing 为找不到的名称。
+    """
+
+    def __init__(self, dict_path, search_dirs=(), cache=None, enable_code2=False):
+        self.dict_path = dict_path
+        self.search_dirs = [os.path.dirname(os.path.abspath(dict_path))] + list(search_dirs)
+        self.cache = cache if cache is not None else TableCache()
+        self.enable_code2 = enable_code2
+        self.tables = []
+        self.missing = []
+        self._resolve()
+
+    def _resolve(self):
+        seen = {os.path.abspath(self.dict_path)}
+        pending = [self.dict_path]
+        while pending:
+            path = pending.pop()
+            try:
+                names = read_dict_header(path).import_tables
+            except (OSError, ValueError):
+                names = []
+            children = []
+            for name in names:
+                table_path = find_table(name, self.search_dirs)
+                if table_path is None:
+                    self.missing.append(name)
+                    continue
+                key = os.path.abspath(table_path)
+                if key in seen:
+                    continue
+                seen.add(key)
+                self.tables.append((name, table_path))
+                children.append(table_path)
+            # 逆序压栈，先展开先列出的导入
+            pending.extend(reversed(children))
+
+    def __bool__(self):
+        return bool(self.tables)
+
+    def search(self, text, mode="exact", progress=None):
+        """在导入的词典中查询，返回 [(词典路径, 词条)]；每个词典第一次查询时加载
+
+        progress(fraction) 在每个词典查完后调用，可以在其中抛出异常中止查询。
+        """
+        results = []
+        for i, (_, path) in enumerate(self.tables):
+            table = self.cache.get(path, self.enable_code2)
+            results.extend((path, table.get(row)) for row in table.query(text, mode))
+            if progress is not None:
+                progress((i + 1) / len(self.tables))
+        return results
@@ -0,0 +1,104 @@
+"""在后台线程执行耗时操作，结果通过主线程的定时轮询交回界面"""
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+
+class Task:
+    """交给后台函数的任务句柄，用来报告进度和检查是否已被取消"""
+
+    def __init__(self):
+        self._cancel_event = threading.Event()
+        self.progress = None
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def report(self, progress=None):
+        """报告进度（0~1 的小数或一段文字）；任务已被取消时抛出 CancelledError 中止后台函数"""
+        if self._cancel_event.is_set():
+            raise CancelledError()
+        if progress is not None:
+            self.progress = progress
+
+
+class TaskRunner:
+    """后台任务执行器
+
+    schedule 是主线程的定时调用函数（如 root.after），所有回调都在主线程中执行，
+    因此回调里可以直接操作界面。同一 group 的任务只保留最新一个，提交新任务时
+    会取消还在执行的旧任务（如连续查询）。
+    """
+
+    def __init__(self, schedule, max_workers=2, poll_interval=50):
+        self._schedule = schedule
+        self._poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rime-dict")
+        self._pending = []
+        self._groups = {}
+        self._polling = False
+
+    def submit(self, func, *args, on_done=None, on_error=None, on_progress=None, group=None):
+        """在后台执行 func(task, *args)，返回 Task"""
+        if group is not None and group in self._groups:
+            self._groups[group].cancel()
+        task = Task()
+        future = self._executor.submit(func, task, *args)
+        self._pending.append([task, future, on_done, on_error, on_progress, None, group])
+        if group is not None:
+            self._groups[group] = task
+        if not self._polling:
+            self._polling = True
+            self._schedule(self._poll_interval, self._poll)
+        return task
+
+    def busy(self, group=None):
+        """是否有（指定分组的）任务尚未完成"""
+        if group is None:
+            return bool(self._pending)
+        return group in self._groups
+
+    def _poll(self):
+        pending, self._pending = self._pending, []
+        still_running = []
+        try:
+            while pending:
+                item = pending.pop(0)
+                task, future, on_done, on_error, on_progress, last_progress, group = item
+                if not future.done():
+                    if on_progress is not None and task.progress != last_progress:
+                        item[5] = task.progress
+                        on_progress(task.progress)
+                    still_running.append(item)
+                    continue
+                if group is not None and self._groups.get(group) is task:
+                    del self._groups[group]
+                if task.cancelled:
+                    continue
+                try:
+                    result = future.result()
+                except CancelledError:
+                    continue
+                except Exception as e:
+                    if on_error is None:
+                        raise
+                    on_error(e)
+                else:
+                    if on_done is not None:
+                        on_done(result)
+        finally:
+            # 回调抛出异常时剩下的任务留到下一轮；回调中也可能提交了新任务
+            self._pending = still_running + pending + self._pending
+            if self._pending:
+                self._schedule(self._poll_interval, self._poll)
+            else:
+                self._polling = False
+
+    def shutdown(self):
+        """取消所有任务并关闭线程池，不等待正在执行的任务"""
+        for item in self._pending:
+            item[0].cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
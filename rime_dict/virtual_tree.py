@@ -0,0 +1,168 @@
+"""只渲染可见行的虚拟列表控件（本包中唯一依赖 tkinter 的模块）"""
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTreeview(ttk.Frame):
+    """只创建 height 行的 Treeview，滚动时重新绑定各行的值
+
+    数据保存在 Python 中：rows 是任意支持 len() 和下标的序列（如词条编号列表或 range），
+    row_getter 把其中的元素转换为一行的显示值。选中状态按数据中的位置记录，与当前可见行无关。
+    选中变化时在本控件上产生 <<TreeviewSelect>> 事件。
+    """
+
+    WHEEL_ROWS = 3  # 鼠标滚轮每格滚动的行数
+
+    def __init__(self, master, columns, height=8, **kwargs):
+        super().__init__(master, **kwargs)
+        self.height = height
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height, selectmode="none")
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        self._slots = [self.tree.insert("", tk.END, values=()) for _ in range(height)]
+        self._rows = []
+        self._row_getter = None
+        self._offset = 0
+        self._selected = set()  # 选中行在 rows 中的位置
+        self._anchor = None
+
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<Shift-Button-1>", lambda e: self._on_click(e, extend=True))
+        self.tree.bind("<Control-Button-1>", lambda e: self._on_click(e, toggle=True))
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-self.WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(self.WHEEL_ROWS))
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self._move_selection(-height))
+        self.tree.bind("<Next>", lambda e: self._move_selection(height))
+
+    # ---- 数据 ----
+
+    def heading(self, column, **kwargs):
+        return self.tree.heading(column, **kwargs)
+
+    def column(self, column, **kwargs):
+        return self.tree.column(column, **kwargs)
+
+    def set_rows(self, rows, row_getter):
+        """替换全部数据，回到顶部并清除选中"""
+        self._rows = rows
+        self._row_getter = row_getter
+        self._offset = 0
+        self._selected = set()
+        self._anchor = None
+        self._render()
+
+    def refresh(self):
+        """数据内容变化（行数不变）后重新绘制可见行"""
+        self._render()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def selection(self):
+        """选中的元素，按显示次序排列"""
+        rows = self._rows
+        return [rows[position] for position in sorted(self._selected)]
+
+    def selection_set(self, positions):
+        """按位置设置选中的行"""
+        self._selected = set(positions)
+        self._render()
+        self.event_generate("<<TreeviewSelect>>")
+
+    # ---- 绘制与滚动 ----
+
+    def _max_offset(self):
+        return max(0, len(self._rows) - self.height)
+
+    def _render(self):
+        rows = self._rows
+        total = len(rows)
+        self._offset = min(self._offset, self._max_offset())
+        selected_slots = []
+        for i, slot in enumerate(self._slots):
+            position = self._offset + i
+            if position < total:
+                self.tree.item(slot, values=self._row_getter(rows[position]))
+                if position in self._selected:
+                    selected_slots.append(slot)
+            else:
+                self.tree.item(slot, values=())
+        self.tree.selection_set(selected_slots)
+        if total:
+            self.scrollbar.set(self._offset / total, min(1.0, (self._offset + self.height) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll(self, rows):
+        """滚动若干行（负数向上）"""
+        offset = min(max(0, self._offset + rows), self._max_offset())
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+        return "break"
+
+    def yview_moveto(self, fraction):
+        self._offset = min(max(0, int(fraction * len(self._rows))), self._max_offset())
+        self._render()
+
+    def see(self, position):
+        """滚动到能看见第 position 行"""
+        if position < self._offset:
+            self.scroll(position - self._offset)
+        elif position >= self._offset + self.height:
+            self.scroll(position - self._offset - self.height + 1)
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.yview_moveto(float(value))
+        elif action == "scroll":
+            step = self.height if unit == "pages" else 1
+            self.scroll(int(value) * step)
+
+    def _on_mousewheel(self, event):
+        notches = event.delta // 120 if abs(event.delta) >= 120 else (1 if event.delta > 0 else -1)
+        return self.scroll(-notches * self.WHEEL_ROWS)
+
+    # ---- 选中 ----
+
+    def _on_click(self, event, extend=False, toggle=False):
+        if self.tree.identify_region(event.x, event.y) not in ("cell", "tree"):
+            return None  # 表头和列分隔线交给 Treeview 自己处理
+        slot = self.tree.identify_row(event.y)
+        if not slot:
+            return "break"
+        position = self._offset + self._slots.index(slot)
+        if position >= len(self._rows):
+            return "break"
+        self.tree.focus_set()
+        if extend and self._anchor is not None:
+            start, end = sorted((self._anchor, position))
+            self._selected = set(range(start, end + 1))
+        elif toggle:
+            self._selected ^= {position}
+            self._anchor = position
+        else:
+            self._selected = {position}
+            self._anchor = position
+        self._render()
+        self.event_generate("<<TreeviewSelect>>")
+        return "break"
+
+    def _move_selection(self, step):
+        if not self._rows:
+            return "break"
+        current = self._anchor if self._anchor is not None else -1
+        position = min(max(0, current + step), len(self._rows) - 1)
+        self._anchor = position
+        self._selected = {position}
+        self.see(position)
+        self._render()
+        self.event_generate("<<TreeviewSelect>>")
+        return "break"
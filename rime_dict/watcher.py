@@ -0,0 +1,99 @@
+"""监视词典文件是否被其他程序修改
+
+Linux 上通过 ctypes 调用 inotify，其他系统（或 inotify 不可用时）退回到比较
+修改时间和大小的轮询。两者都是非阻塞的 changed() 接口，由界面定时调用，
+真正的变化判断和重新加载交给 DictModel.sync_with_file。changed() 返回 True 后
+这次变化即视为已取走，调用方应在确定会同步时才调用它。
+"""
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+
+from .parser import file_stamp
+
+
+class PollingWatcher:
+    """每次调用 changed() 时比较文件的修改时间和大小"""
+
+    def __init__(self, path):
+        self.path = path
+        self._stamp = file_stamp(path)
+
+    def changed(self):
+        stamp = file_stamp(self.path)
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        return True
+
+    def close(self):
+        pass
+
+
+# inotify 常量（见 <sys/inotify.h>）
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_NONBLOCK = os.O_NONBLOCK if hasattr(os, "O_NONBLOCK") else 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """监视文件所在的目录：其他程序常以“写临时文件再改名”的方式保存，直接监视文件会丢失事件"""
+
+    def __init__(self, path):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify 仅在 Linux 上可用")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.path = path
+        self._name = os.fsencode(os.path.basename(path))
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        directory = os.path.dirname(os.path.abspath(path))
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, os.strerror(errno))
+
+    def changed(self):
+        """读出所有已到达的事件，其中有关于本文件的事件时返回 True"""
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            if not data:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW or name == self._name:
+                    changed = True
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(path):
+    """优先使用 inotify，不可用时退回轮询"""
+    try:
+        return InotifyWatcher(path)
+    except (OSError, AttributeError):
+        return PollingWatcher(path)
@@ -0,0 +1,105 @@
+"""词典文件的写出"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# 整体写入时每批写出的行数
+WRITE_BATCH = 4096
+
+
+def format_entry(entry, switch_order=False, enable_code2=False, layout=None):
+    """把 (词汇, 编码, 权重, 编码2) 格式化为一行文本
+
+    layout 为头部 columns 对应的列号（见 header.column_layout），给出时按列号写出各字段、
+    忽略 switch_order，与 parse_line 读取时一致；没有写出的中间列留空。
+    """
+    if layout is not None:
+        columns = layout if enable_code2 else layout[:3]
+        fields = [""] * (max(columns) + 1)
+        for value, column in zip(entry, columns):
+            if column >= 0:
+                fields[column] = value
+        return "\t".join(fields) + "\n"
+    word, code, weight, code2 = entry
+    if switch_order:
+        # 切换次序：词汇 权重 编码 编码2
+        line = f"{word}\t{weight}\t{code}"
+    else:
+        # 默认次序：词汇 编码 权重 编码2
+        line = f"{word}\t{code}\t{weight}"
+    if enable_code2:
+        line += f"\t{code2}"
+    return line + "\n"
+
+
+def fsync_directory(directory):
+    """把目录项的变化（如 os.replace）刷到磁盘，Windows 上不需要也无法这样做"""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path):
+    """以二进制方式写文件：先写到同一目录下的临时文件并 fsync，成功退出时再用 os.replace 替换原文件
+
+    写到一半时进程退出或抛出异常都不会损坏原文件；因为替换发生在最后，
+    输出路径也可以是正在流式读取的输入文件。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix="." + os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    fsync_directory(directory)
+
+
+def write_dict(dict_path, entries, header="", switch_order=False, enable_code2=False, offsets=None, layout=None):
+    """覆盖写入整个词典（UTF-8）：先写文件头部，再写全部词条
+
+    通过 atomic_write 写入，写到一半时进程退出也不会损坏原词典。
+    offsets 不为 None 时按顺序追加每个词条所在行的字节偏移；layout 见 format_entry。
+    """
+    with atomic_write(dict_path) as f:
+        _write_entries(f, entries, header, switch_order, enable_code2, offsets, layout)
+
+
+def _write_entries(f, entries, header, switch_order, enable_code2, offsets, layout):
+    position = 0
+    if header:
+        data = header.encode("utf-8")
+        f.write(data)
+        position = len(data)
+    batch = []
+    for entry in entries:
+        data = format_entry(entry, switch_order, enable_code2, layout).encode("utf-8")
+        if offsets is not None:
+            offsets.append(position)
+        position += len(data)
+        batch.append(data)
+        if len(batch) >= WRITE_BATCH:
+            f.write(b"".join(batch))
+            batch.clear()
+    f.write(b"".join(batch))
+
+
+def tombstone_line(raw):
+    """与原行字节数相同的作废行：# 加空格，保留原来的换行符，Rime 会当作注释跳过"""
+    content = raw.rstrip(b"\r\n")
+    return b"#" + b" " * (len(content) - 1) + raw[len(content):]
@@ -0,0 +1,112 @@
+"""分区分析与内存中直接计算的结果一致"""
+import os
+import random
+import sys
+import tempfile
+import unittest
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from synth import synthetic_entries  # noqa: E402
+from rime_dict.analysis import DEDUPE_KEYS, KEEP_POLICIES, analyze, skip_entries, weight_digits  # noqa: E402
+
+
+def sample_entries():
+    """合成词条中混入完全重复、只有权重或编码2不同的词条"""
+    rng = random.Random(0)
+    entries = list(synthetic_entries(3000, code2=True, seed=3))
+    for _ in range(1500):
+        word, code, weight, code2 = rng.choice(entries)
+        change = rng.random()
+        if change < 0.3:
+            weight = rng.choice((weight, "", "abc", str(rng.randint(0, 10 ** 7))))
+        elif change < 0.4:
+            code2 = code2 + "x"
+        entries.insert(rng.randrange(len(entries) + 1), (word, code, weight, code2))
+    return entries
+
+
+def expected_drop(entries, dedupe, keep):
+    """逐条判断应删除的序号"""
+    if dedupe == "entry":
+        seen = set()
+        drop = []
+        for seq, entry in enumerate(entries):
+            if entry in seen:
+                drop.append(seq)
+            seen.add(entry)
+        return drop
+    best = {}
+    for seq, (word, code, weight, code2) in enumerate(entries):
+        value = int(weight) if weight.isdecimal() else -1
+        if (word, code) not in best or keep == "max-weight" and value > best[word, code][1]:
+            best[word, code] = (seq, value)
+    kept = {seq for seq, _ in best.values()}
+    return [seq for seq in range(len(entries)) if seq not in kept]
+
+
+class SpillAnalysisTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.entries = sample_entries()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def analyze(self, spill, **kwargs):
+        # 很小的内存预算迫使分析按编码分区写入临时文件，并再分区到最深一层
+        memory_limit = 1 if spill else 1 << 40
+        result = analyze(iter(self.entries), memory_limit=memory_limit, tmp_dir=self.tmp.name, **kwargs)
+        self.assertEqual(result.spilled, spill)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+        return result
+
+    def test_groups_match_in_memory(self):
+        spilled = self.analyze(True)
+        in_memory = self.analyze(False)
+        groups = {}
+        for word, code, weight, code2 in self.entries:
+            groups.setdefault((word, code), []).append(weight)
+        words_per_code = Counter(code for _, code in groups)
+        for result in (spilled, in_memory):
+            self.assertEqual(result.entries, len(self.entries))
+            self.assertEqual(result.duplicates, len(self.entries) - len(set(self.entries)))
+            self.assertEqual(result.conflicts, sum(len(set(weights)) > 1 for weights in groups.values()))
+            self.assertEqual(result.codes, len(words_per_code))
+            self.assertEqual(result.candidate_counts, Counter(words_per_code.values()))
+            self.assertEqual(result.weights, Counter(weight_digits(entry[2]) for entry in self.entries))
+            self.assertIsNone(result.drop)
+        self.assertEqual(spilled.crowded_codes, in_memory.crowded_codes)
+        self.assertEqual(sorted(count for _, count in spilled.top_codes),
+                         sorted(count for _, count in in_memory.top_codes))
+
+    def test_dedupe_drop(self):
+        for dedupe in DEDUPE_KEYS:
+            for keep in KEEP_POLICIES:
+                with self.subTest(dedupe=dedupe, keep=keep):
+                    drop = expected_drop(self.entries, dedupe, keep)
+                    self.assertTrue(drop)
+                    for spill in (True, False):
+                        result = self.analyze(spill, dedupe=dedupe, keep=keep)
+                        self.assertEqual(list(result.drop), drop)
+                    dropped = set(drop)
+                    kept = list(skip_entries(iter(self.entries), result.drop))
+                    self.assertEqual(kept, [entry for seq, entry in enumerate(self.entries) if seq not in dropped])
+
+    def test_skip_entries(self):
+        entries = ["a", "b", "c", "d", "e"]
+        self.assertEqual(list(skip_entries(entries, [])), entries)
+        self.assertEqual(list(skip_entries(entries, [0, 2, 4])), ["b", "d"])
+        self.assertEqual(list(skip_entries(entries, range(5))), [])
+
+    def test_unknown_options(self):
+        with self.assertRaises(ValueError):
+            analyze(iter(self.entries), dedupe="word")
+        with self.assertRaises(ValueError):
+            analyze(iter(self.entries), dedupe="entry", keep="last")
+
+
+if __name__ == "__main__":
+    unittest.main()
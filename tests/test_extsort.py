@@ -0,0 +1,83 @@
+"""外部归并排序与 sorted() 的结果一致"""
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from synth import synthetic_entries  # noqa: E402
+from rime_dict import extsort  # noqa: E402
+from rime_dict.extsort import SORT_KEYS, entry_size, external_sort  # noqa: E402
+
+
+def sample_entries():
+    """大量键相同而其余列不同的词条，用来检查排序是否稳定"""
+    rng = random.Random(0)
+    entries = []
+    for i, (word, code, weight, stem) in enumerate(synthetic_entries(3000, code2=True, seed=5)):
+        if i % 7 == 0:
+            weight = rng.choice(("", "abc", "0", "100"))
+        entries.append((word, code, weight, stem))
+    return entries
+
+
+class ExternalSortTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.entries = sample_entries()
+        # 每段只能缓冲约 50 条，得到几十个临时文件
+        self.memory_limit = entry_size(self.entries[0]) * 50
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assertNoRunsLeft(self):
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_matches_sorted_for_each_key(self):
+        for key, key_func in SORT_KEYS.items():
+            with self.subTest(key=key):
+                result = list(external_sort(iter(self.entries), key, self.memory_limit, self.tmp.name))
+                self.assertEqual(result, sorted(self.entries, key=key_func))
+                self.assertNoRunsLeft()
+
+    def test_spills_runs(self):
+        written = []
+        write_run = extsort._write_run
+
+        def counting_write_run(directory, entries):
+            written.append(directory)
+            return write_run(directory, entries)
+
+        with mock.patch.object(extsort, "_write_run", counting_write_run):
+            list(external_sort(iter(self.entries), "code", self.memory_limit, self.tmp.name))
+        self.assertGreater(len(written), 10)
+
+    def test_multi_level_merge(self):
+        # 同时归并的文件数很少时要先分批归并，仍然稳定
+        with mock.patch.object(extsort, "MAX_MERGE_FILES", 3):
+            for key, key_func in SORT_KEYS.items():
+                with self.subTest(key=key):
+                    result = list(external_sort(iter(self.entries), key, self.memory_limit, self.tmp.name))
+                    self.assertEqual(result, sorted(self.entries, key=key_func))
+                    self.assertNoRunsLeft()
+
+    def test_in_memory(self):
+        result = list(external_sort(iter(self.entries), "weight", tmp_dir=self.tmp.name))
+        self.assertEqual(result, sorted(self.entries, key=SORT_KEYS["weight"]))
+        self.assertNoRunsLeft()
+
+    def test_runs_removed_when_aborted(self):
+        results = external_sort(iter(self.entries), "word", self.memory_limit, self.tmp.name)
+        next(results)
+        self.assertNotEqual(os.listdir(self.tmp.name), [])
+        results.close()
+        self.assertNoRunsLeft()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+"""convert 在 Rime、CSV、搜狗和 QQ 格式之间往返转换不丢失内容"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from rime_dict.cli import main
+from rime_dict.formats import SOURCE_FORMATS, TARGET_FORMATS, csv_layout
+from rime_dict.parser import iter_dict_entries
+
+
+HEADER = """# 注释
+---
+name: test
+version: "1"
+columns:
+  - text
+  - code
+  - stem
+  - weight
+...
+"""
+ENTRIES = [
+    ("你好", "ni hao", "10", "nh"),
+    ('"引号",逗号', "yin hao", "0100", ""),
+    ("世界", "shi jie", "1", "sj"),
+    ("中", "zhong", "0", "z"),
+]
+
+
+class ConvertRoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = self.path("source.dict.yaml")
+        with open(self.source, "w", encoding="utf-8", newline="\n") as f:
+            f.write(HEADER + "".join(f"{word}\t{code}\t{stem}\t{weight}\n" for word, code, weight, stem in ENTRIES))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def convert(self, *args):
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(main(["convert", *args]), 0)
+
+    def entries(self, path):
+        return list(iter_dict_entries(path, enable_code2=True))
+
+    def test_rime_to_rime_keeps_header_and_stem(self):
+        target = self.path("copy.dict.yaml")
+        self.convert(self.source, "-o", target)
+        with open(self.source, "rb") as f, open(target, "rb") as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_csv(self):
+        for switch in ([], ["--switch-order"]):
+            with self.subTest(switch=switch):
+                csv_path = self.path("out.csv")
+                target = self.path("back.dict.yaml")
+                self.convert(*switch, self.source, "-o", csv_path)
+                with open(csv_path, encoding="utf-8") as f:
+                    self.assertEqual(csv_layout(f.readline())[3], 3)
+                self.convert(csv_path, "-o", target)
+                self.assertEqual(self.entries(target), ENTRIES)
+
+    def test_txt(self):
+        txt_path = self.path("out.txt")
+        target = self.path("back.dict.yaml")
+        self.convert(self.source, "-o", txt_path)
+        self.convert("--code2", txt_path, "-o", target)
+        self.assertEqual(self.entries(target), ENTRIES)
+
+    def test_qq_keeps_weight(self):
+        qq_path = self.path("qq.txt")
+        target = self.path("back.dict.yaml")
+        self.convert("--to", "qq", self.source, "-o", qq_path)
+        self.convert("--from", "qq", qq_path, "-o", target)
+        # QQ 格式没有编码2这一列
+        self.assertEqual([entry[:3] for entry in self.entries(target)], [entry[:3] for entry in ENTRIES])
+
+    def test_sogou_keeps_word_and_code(self):
+        sogou_path = self.path("sogou.txt")
+        target = self.path("back.dict.yaml")
+        self.convert("--to", "sogou", self.source, "-o", sogou_path)
+        self.convert("--from", "sogou", sogou_path, "-o", target)
+        # 搜狗格式只有词汇和编码
+        self.assertEqual([entry[:2] for entry in self.entries(target)], [entry[:2] for entry in ENTRIES])
+
+    def test_single_lines(self):
+        for name, format_line in TARGET_FORMATS.items():
+            parse = SOURCE_FORMATS[name]
+            if parse is None:
+                continue
+            with self.subTest(format=name):
+                for entry in ENTRIES:
+                    parsed = parse(format_line(entry, enable_code2=True))
+                    fields = {"csv": 4, "qq": 3, "sogou": 2}[name]
+                    self.assertEqual(parsed[:fields], entry[:fields])
+
+
+if __name__ == "__main__":
+    unittest.main()
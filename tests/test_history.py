@@ -0,0 +1,192 @@
+"""撤销、重做和保存在词典旁的撤销历史"""
+import json
+import os
+import tempfile
+import unittest
+
+from rime_dict.history import HISTORY_SUFFIX, HISTORY_VERSION
+from rime_dict.model import BULK_REINDEX_THRESHOLD, DictModel
+
+
+HEADER = "---\nname: test\nversion: \"1\"\n...\n"
+ENTRIES = [("你好", "nihao", "1", ""), ("世界", "shijie", "2", ""), ("再见", "zaijian", "3", "")]
+
+
+class HistoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "test.dict.yaml")
+        self.history_path = self.path + HISTORY_SUFFIX
+        with open(self.path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(HEADER + "".join("\t".join(entry[:3]) + "\n" for entry in ENTRIES))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open(self):
+        return DictModel(self.path, persist_history=True).load()
+
+    def entries(self, model):
+        return sorted(model.get(entry_id) for entry_id in model.ids())
+
+    def records(self):
+        with open(self.history_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+
+class UndoRedoTest(HistoryTestCase):
+
+    def test_each_kind_of_step(self):
+        model = DictModel(self.path).load()
+        states = [self.entries(model)]
+        model.add("早上", "zaoshang", "5")
+        states.append(self.entries(model))
+        model.update(model.find_code("nihao"), "你好吗", "nihaoma", "9")
+        states.append(self.entries(model))
+        model.delete([model.find_code("shijie"), model.find_code("zaoshang")])
+        states.append(self.entries(model))
+        model.import_entries([("世界", "shijie", "7", ""), ("晚上", "wanshang", "4", "")], policy="overwrite")
+        states.append(self.entries(model))
+
+        for state in reversed(states[:-1]):
+            self.assertIsNotNone(model.undo())
+            self.assertEqual(self.entries(model), state)
+        self.assertIsNone(model.undo())
+        for state in states[1:]:
+            self.assertIsNotNone(model.redo())
+            self.assertEqual(self.entries(model), state)
+        self.assertIsNone(model.redo())
+
+    def test_bulk_delete(self):
+        with open(self.path, "a", encoding="utf-8", newline="\n") as f:
+            f.writelines(f"词{i}\tci{i}\t{i}\n" for i in range(BULK_REINDEX_THRESHOLD * 2))
+        model = DictModel(self.path).load()
+        before = self.entries(model)
+        self.assertEqual(model.delete(list(model.ids())[1:]), len(before) - 1)
+        model.undo()
+        self.assertEqual(self.entries(model), before)
+        self.assertEqual(len(model.search_partial("ci")), BULK_REINDEX_THRESHOLD * 2)
+        model.redo()
+        self.assertEqual(len(model), 1)
+
+    def test_new_step_clears_redo(self):
+        model = DictModel(self.path).load()
+        model.add("早上", "zaoshang", "5")
+        model.undo()
+        self.assertTrue(model.history.can_redo())
+        model.add("晚上", "wanshang", "4")
+        self.assertFalse(model.history.can_redo())
+
+    def test_step_after_other_edit_finds_entry_by_content(self):
+        model = DictModel(self.path).load()
+        model.update(model.find_code("nihao"), "你好吗", "nihaoma", "9")
+        step = model.history.pop_undo()
+        # 编号对不上时按内容查找
+        step.ids[0] = -1
+        model.history.push(step)
+        model.undo()
+        self.assertEqual(self.entries(model), sorted(ENTRIES))
+
+
+class PersistedHistoryTest(HistoryTestCase):
+
+    def test_reopen_restores_undo_and_redo(self):
+        model = self.open()
+        model.add("早上", "zaoshang", "5")
+        model.update(model.find_code("nihao"), "你好吗", "nihaoma", "9")
+        model.undo()
+        model.save()
+        saved = self.entries(model)
+
+        reopened = self.open()
+        self.assertEqual(self.entries(reopened), saved)
+        self.assertTrue(reopened.history.can_redo())
+        reopened.redo()
+        self.assertIn(("你好吗", "nihaoma", "9", ""), self.entries(reopened))
+        reopened.undo()
+        reopened.undo()
+        self.assertEqual(self.entries(reopened), sorted(ENTRIES))
+        self.assertFalse(reopened.history.can_undo())
+
+    def test_save_appends(self):
+        model = self.open()
+        model.add("早上", "zaoshang", "5")
+        model.save()
+        with open(self.history_path, "rb") as f:
+            first = f.read()
+        model.delete([model.find_code("shijie")])
+        model.undo()
+        model.save()
+        with open(self.history_path, "rb") as f:
+            second = f.read()
+        # 第一次保存整体写入，第二次只在末尾追加新的操作和词典文件的标记
+        self.assertTrue(second.startswith(first))
+        self.assertEqual([record.get("op") for record in self.records()],
+                         [None, "step", "stamp", "push", "undo", "stamp"])
+        self.assertEqual(self.records()[0], {"version": HISTORY_VERSION})
+
+        reopened = self.open()
+        reopened.redo()
+        self.assertNotIn(("世界", "shijie", "2", ""), self.entries(reopened))
+        reopened.undo()
+        reopened.undo()
+        self.assertEqual(self.entries(reopened), sorted(ENTRIES))
+
+    def test_close_compacts(self):
+        model = self.open()
+        model.add("早上", "zaoshang", "5")
+        model.save()
+        model.add("晚上", "wanshang", "4")
+        model.undo()
+        model.save()
+        model.close_history()
+        self.assertEqual([(record.get("op"), record.get("stack")) for record in self.records()],
+                         [(None, None), ("step", "undo"), ("step", "redo"), ("stamp", None)])
+        reopened = self.open()
+        self.assertTrue(reopened.history.can_undo() and reopened.history.can_redo())
+
+    def test_unsaved_edits_not_compacted(self):
+        model = self.open()
+        model.add("早上", "zaoshang", "5")
+        model.save()
+        model.add("晚上", "wanshang", "4")
+        with open(self.history_path, "rb") as f:
+            before = f.read()
+        model.close_history()
+        with open(self.history_path, "rb") as f:
+            self.assertEqual(f.read(), before)
+
+    def test_file_changed_elsewhere(self):
+        model = self.open()
+        model.add("早上", "zaoshang", "5")
+        model.save()
+        with open(self.path, "a", encoding="utf-8", newline="\n") as f:
+            f.write("晚上\twanshang\t4\n")
+        self.assertFalse(self.open().history.can_undo())
+
+    def test_partial_last_record(self):
+        model = self.open()
+        model.add("早上", "zaoshang", "5")
+        model.save()
+        model.add("晚上", "wanshang", "4")
+        model.save()
+        # 第二次追加写到一半时退出：最后的标记丢失，与词典文件对不上
+        with open(self.history_path, "rb") as f:
+            data = f.read()
+        with open(self.history_path, "wb") as f:
+            f.write(data[:data.rindex(b'{"op": "stamp"') + 5])
+        self.assertFalse(self.open().history.can_undo())
+
+    def test_cleared_history_removes_file(self):
+        model = self.open()
+        model.add("早上", "zaoshang", "5")
+        model.save()
+        self.assertTrue(os.path.exists(self.history_path))
+        model.history.clear()
+        model.save()
+        self.assertFalse(os.path.exists(self.history_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""保存中途退出后按编辑日志恢复"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from rime_dict.journal import EditJournal
+from rime_dict.model import DictModel
+
+
+HEADER = "---\nname: test\nversion: \"1\"\n...\n"
+
+
+class Killed(BaseException):
+    """模拟进程在两次写入之间被杀掉"""
+
+
+class CrashDuringSaveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "test.dict.yaml")
+        with open(self.path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(HEADER + "你好\tnihao\t1\n世界\tshijie\t1\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def entries(self):
+        model = DictModel(self.path, journal=True).load()
+        return model, sorted(model.get(entry_id) for entry_id in model.ids())
+
+    def test_killed_between_append_and_tombstone(self):
+        model = DictModel(self.path, journal=True).load()
+        model.update(model.find_code("nihao"), "你好呀", "nihao", "10")
+        real_fsync = os.fsync
+        calls = []
+
+        def fsync(fd):
+            real_fsync(fd)
+            calls.append(fd)
+            if len(calls) == 1:
+                raise Killed()
+
+        with mock.patch("os.fsync", fsync), self.assertRaises(Killed):
+            model.save()
+
+        with open(self.path, encoding="utf-8") as f:
+            content = f.read()
+        # 新行已追加，旧行还没有作废
+        self.assertIn("你好\tnihao\t1\n", content)
+        self.assertIn("你好呀\tnihao\t10\n", content)
+
+        model, entries = self.entries()
+        self.assertEqual(model.replayed, 1)
+        self.assertEqual(entries, [("世界", "shijie", "1", ""), ("你好呀", "nihao", "10", "")])
+        model.save()
+        self.assertFalse(model.journal.exists())
+        self.assertEqual(self.entries()[1], entries)
+
+    def test_replay_when_tombstone_written_without_new_line(self):
+        # 早先的保存方式先作废旧行再追加：旧行已作废、新行没写入
+        with open(self.path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(HEADER + "#" + " " * 15 + "\n世界\tshijie\t1\n")
+        EditJournal(self.path).append([{"op": "update", "id": 0, "old": ["你好", "nihao", "1", ""],
+                                        "new": ["你好呀", "nihao", "10", ""]}])
+        model, entries = self.entries()
+        self.assertEqual(model.replayed, 1)
+        self.assertEqual(entries, [("世界", "shijie", "1", ""), ("你好呀", "nihao", "10", "")])
+
+    def test_replay_after_complete_save_is_noop(self):
+        model = DictModel(self.path, journal=True).load()
+        model.update(model.find_code("nihao"), "你好呀", "nihao", "10")
+        records = list(model.journal.records())
+        model.save()
+        # 保存成功后、删除日志前退出
+        model.journal.append(records)
+        model, entries = self.entries()
+        self.assertEqual(model.replayed, 0)
+        self.assertEqual(entries, [("世界", "shijie", "1", ""), ("你好呀", "nihao", "10", "")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""只读浏览的 MappedDict 与 DictModel 读到的词条相同"""
+import os
+import tempfile
+import unittest
+
+from rime_dict.mapped import MappedDict
+from rime_dict.model import DictModel
+
+
+HEADER = "---\nname: test\nversion: \"1\"\n...\n"
+# 注释、作废行、空行和各种格式错误的行混在词条之间
+BODY = (
+    "你好\tnihao\t1\n"
+    "# 注释\n"
+    "#" + " " * 10 + "\n"
+    "\n"
+    "  \t \n"
+    "没有制表符\n"
+    "\t只有编码\n"
+    "词汇\t\n"
+    "　\t全角空格\n"
+    "  # 缩进的注释\tx\n"
+    "a#b\tab\t3\n"
+    " 前有空格\tqian\t4\r\n"
+    "世界\tshijie\t2\r\n"
+    "\r\n"
+    "最后\tzuihou"
+)
+
+
+class MappedDictTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text, encoding="utf-8"):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding=encoding, newline="") as f:
+            f.write(text)
+        return path
+
+    def assertSameEntries(self, path):
+        model = DictModel(path).load()
+        expected = [model.get(entry_id) for entry_id in model.ids()]
+        mapped = MappedDict(path).load()
+        try:
+            self.assertEqual(len(mapped), len(expected))
+            self.assertEqual([mapped.get(row) for row in mapped.all_ids()], expected)
+        finally:
+            mapped.close()
+        return expected
+
+    def test_skips_what_dict_model_skips(self):
+        expected = self.assertSameEntries(self.write("test.dict.yaml", HEADER + BODY))
+        self.assertEqual([entry[0] for entry in expected], ["你好", "a#b", "前有空格", "世界", "最后"])
+
+    def test_gbk(self):
+        self.assertSameEntries(self.write("gbk.dict.yaml", HEADER + BODY, "gbk"))
+
+    def test_txt(self):
+        self.assertSameEntries(self.write("test.txt", "# 头部注释\n#\n" + BODY))
+
+
+if __name__ == "__main__":
+    unittest.main()
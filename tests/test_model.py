@@ -0,0 +1,226 @@
+"""DictModel 的增删改、保存和查询"""
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from synth import synthetic_entries, write_synthetic  # noqa: E402
+from rime_dict.model import BULK_REINDEX_THRESHOLD, DictModel  # noqa: E402
+
+
+HEADER = "---\nname: test\nversion: \"1\"\n...\n"
+
+
+class ModelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "test.dict.yaml")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text, newline="\n"):
+        with open(self.path, "w", encoding="utf-8", newline=newline) as f:
+            f.write(text)
+
+    def read_bytes(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def live(self, model):
+        return {entry_id: model.get(entry_id) for entry_id in model.ids()}
+
+
+def random_edits(model, steps, seed):
+    """对 model 做 steps 次随机的添加、修改、删除（含超过 BULK_REINDEX_THRESHOLD 条的批量删除）、撤销和重做"""
+    rng = random.Random(seed)
+    fresh = synthetic_entries(steps * 2, seed=seed + 1)
+    for _ in range(steps):
+        ids = list(model.ids())
+        action = rng.random()
+        if action < 0.25 or not ids:
+            # 一部分新词条与已有词条完全相同，或只有编码相同
+            entry = next(fresh)
+            if ids and rng.random() < 0.3:
+                entry = model.get(rng.choice(ids))
+            model.add(*entry)
+        elif action < 0.5:
+            entry_id = rng.choice(ids)
+            word, code, weight, code2 = next(fresh)
+            if rng.random() < 0.5:
+                code = model.get(entry_id)[1]
+            model.update(entry_id, word, code, weight, code2)
+        elif action < 0.65:
+            model.delete(rng.sample(ids, min(len(ids), rng.randint(1, 5))))
+        elif action < 0.68:
+            model.delete(rng.sample(ids, min(len(ids), BULK_REINDEX_THRESHOLD + 1)))
+        elif action < 0.85:
+            model.undo()
+        else:
+            model.redo()
+
+
+class PatchSaveTest(ModelTestCase):
+
+    def test_crlf_file_keeps_crlf(self):
+        self.write(HEADER + "你好\tnihao\t1\n世界\tshijie\t1\n再见\tzaijian\t1\n", newline="\r\n")
+        model = DictModel(self.path).load()
+        model.update(model.find_code("nihao"), "你好吗", "nihaoma", "100")
+        model.update(model.find_code("shijie"), "世界", "shijie", "2")
+        model.add("再", "zai", "3")
+        model.save()
+        data = self.read_bytes()
+        self.assertNotIn(b"\n", data.replace(b"\r\n", b""))
+        self.assertTrue(data.endswith("你好吗\tnihaoma\t100\r\n再\tzai\t3\r\n".encode("utf-8")))
+
+        reloaded = DictModel(self.path).load()
+        self.assertEqual(sorted(reloaded.get(entry_id) for entry_id in reloaded.ids()),
+                         sorted(model.get(entry_id) for entry_id in model.ids()))
+
+    def test_crlf_file_without_final_newline(self):
+        self.write(HEADER + "你好\tnihao\t1\n世界\tshijie\t1", newline="\r\n")
+        model = DictModel(self.path).load()
+        model.add("再", "zai", "3")
+        model.save()
+        self.assertTrue(self.read_bytes().endswith("世界\tshijie\t1\r\n再\tzai\t3\r\n".encode("utf-8")))
+        self.assertEqual(len(DictModel(self.path).load()), 3)
+
+    def test_lf_file_keeps_lf(self):
+        self.write(HEADER + "你好\tnihao\t1\n")
+        model = DictModel(self.path).load()
+        model.update(model.find_code("nihao"), "你好吗", "nihaoma", "100")
+        model.save()
+        self.assertNotIn(b"\r", self.read_bytes())
+
+
+class KeyIndexConsistencyTest(ModelTestCase):
+
+    def assertIndexesMatch(self, model):
+        live = self.live(model)
+        by_code, by_word = {}, {}
+        for entry_id, entry in live.items():
+            by_code.setdefault(entry[1], []).append(entry_id)
+            by_word.setdefault(entry[0], []).append(entry_id)
+        for code, ids in by_code.items():
+            self.assertEqual(sorted(model.ids_by_code(code)), ids)
+            self.assertEqual(model.find_code(code), ids[0])
+        for word, ids in by_word.items():
+            self.assertEqual(sorted(model.ids_by_word(word)), ids)
+        for entry_id, entry in live.items():
+            self.assertEqual(sorted(model.find(entry)), [i for i, other in live.items() if other == entry])
+        # 已删除或改过的键不再出现
+        for entry in synthetic_entries(200, seed=99):
+            if entry[1] not in by_code:
+                self.assertEqual(model.ids_by_code(entry[1]), ())
+                self.assertIsNone(model.find_code(entry[1]))
+            if entry[0] not in by_word:
+                self.assertEqual(model.ids_by_word(entry[0]), ())
+
+    def test_indexes_follow_edits_and_undo(self):
+        write_synthetic(self.path, 1000)
+        model = DictModel(self.path).load()
+        model.build_indexes()
+        # 总步数少于撤销历史的上限，全部撤销后应与文件一致
+        for seed in range(5):
+            random_edits(model, 15, seed)
+            self.assertIndexesMatch(model)
+        while model.undo() is not None:
+            pass
+        self.assertIndexesMatch(model)
+        self.assertEqual(self.live(model), self.live(DictModel(self.path).load()))
+
+
+class SearchIndexTest(ModelTestCase):
+
+    def queries(self, model):
+        """单字、单个字母、词汇和编码的片段，以及肯定查不到的内容"""
+        rng = random.Random(0)
+        texts = {"中", "的", "a", "n", "z", "zh", "ng", "不存在", "q", "\U0010ffff"}
+        for entry_id in rng.sample(list(model.ids()), 30):
+            word, code = model.get(entry_id)[:2]
+            texts.update((word[:1], word[-2:], word, code[:1], code[:3], code[1:4], code))
+        return sorted(texts)
+
+    def assertSearchMatches(self, model):
+        live = self.live(model)
+        for text in self.queries(model):
+            self.assertEqual(list(model.search_prefix(text)),
+                             [entry_id for entry_id, entry in live.items() if entry[1].startswith(text)], text)
+            self.assertEqual(list(model.search_partial(text)),
+                             [entry_id for entry_id, entry in live.items() if text in entry[0] or text in entry[1]],
+                             text)
+
+    def test_search_follows_edits(self):
+        write_synthetic(self.path, 1000)
+        model = DictModel(self.path).load()
+        self.assertSearchMatches(model)
+        for seed in range(5):
+            random_edits(model, 15, seed)
+            self.assertSearchMatches(model)
+
+    def test_single_character_after_update_and_delete(self):
+        self.write(HEADER + "你好\tnihao\t1\n好人\thaoren\t1\n人们\trenmen\t1\n")
+        model = DictModel(self.path).load()
+        self.assertEqual(model.search_partial("好"), [0, 1])
+        # 修改后的编号留在旧的倒排表中，要核对后排除
+        model.update(0, "你们", "nimen", "1")
+        model.delete([1])
+        self.assertEqual(model.search_partial("好"), [])
+        self.assertEqual(model.search_partial("们"), [0, 2])
+        model.undo()
+        self.assertEqual(model.search_partial("好"), [1])
+        model.undo()
+        self.assertEqual(model.search_partial("好"), [0, 1])
+        self.assertEqual(model.search_partial("n"), [0, 1, 2])
+        self.assertEqual(model.search_prefix("ni"), [0])
+
+
+class ImportPolicyTest(ModelTestCase):
+
+    ORIGINAL = [("你好", "nihao", "10", ""), ("世界", "shijie", "2", ""), ("再见", "zaijian", "3", "")]
+    IMPORTED = [
+        ("你好", "nihao", "20", ""),  # 词汇和编码都相同，权重更高
+        ("事件", "shijie", "5", ""),  # 编码冲突，权重更高
+        ("新词", "xinci", "1", ""),  # 新编码
+        ("再见", "zaijian", "1", ""),  # 词汇和编码都相同，权重更低
+    ]
+    # 导入方式 -> (导入后的词条, (read, added, updated, skipped, conflicts))
+    CASES = {
+        "skip": (ORIGINAL + [("新词", "xinci", "1", "")], (4, 1, 0, 3, 1)),
+        "overwrite": ([("你好", "nihao", "20", ""), ("事件", "shijie", "5", ""), ("再见", "zaijian", "1", ""),
+                       ("新词", "xinci", "1", "")], (4, 1, 3, 0, 1)),
+        "keep-both": (ORIGINAL + [("事件", "shijie", "5", ""), ("新词", "xinci", "1", "")], (4, 2, 0, 2, 1)),
+        "max-weight": ([("你好", "nihao", "20", ""), ("事件", "shijie", "5", ""), ("再见", "zaijian", "3", ""),
+                        ("新词", "xinci", "1", "")], (4, 1, 2, 1, 1)),
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.write(HEADER + "".join("\t".join(entry[:3]) + "\n" for entry in self.ORIGINAL))
+
+    def test_policies(self):
+        for policy, (expected, counts) in self.CASES.items():
+            with self.subTest(policy=policy):
+                model = DictModel(self.path).load()
+                result = model.import_entries(iter(self.IMPORTED), policy)
+                self.assertEqual(result[:5], counts)
+                self.assertEqual(sorted(self.live(model).values()), sorted(expected))
+                model.save()
+                self.assertEqual(sorted(self.live(DictModel(self.path).load()).values()), sorted(expected))
+                # 整个导入是一步
+                model.undo()
+                self.assertEqual(sorted(self.live(model).values()), sorted(self.ORIGINAL))
+                model.save()
+
+    def test_unknown_policy(self):
+        model = DictModel(self.path).load()
+        with self.assertRaises(ValueError):
+            model.import_entries(iter(self.IMPORTED), "replace")
+
+
+if __name__ == "__main__":
+    unittest.main()
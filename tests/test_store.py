@@ -0,0 +1,91 @@
+"""EntryStore 与元组列表的行为一致"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from synth import synthetic_entries  # noqa: E402
+from rime_dict.store import EntryStore, canonical_weight  # noqa: E402
+
+
+# 不能按整数无损保存的权重，要按原文写回
+ODD_WEIGHTS = ("", "0100", "-0", "abc", "1e5", "99999999999", "-2147483648", "２")
+
+
+def entries_with_odd_weights(lines, seed):
+    rng = random.Random(seed)
+    for word, code, weight, stem in synthetic_entries(lines, code2=True, seed=seed):
+        if rng.random() < 0.05:
+            weight = rng.choice(ODD_WEIGHTS)
+        if rng.random() < 0.5:
+            stem = ""
+        yield word, code, weight, stem
+
+
+class EntryStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.entries = list(entries_with_odd_weights(5000, seed=1))
+        self.store = EntryStore()
+        self.store.extend(self.entries)
+
+    def assertMatches(self, store, expected):
+        self.assertEqual(len(store), len(expected))
+        self.assertEqual(list(store), expected)
+        self.assertEqual([store[i] for i in range(len(expected))], expected)
+        self.assertEqual(list(store.ids()), [i for i, entry in enumerate(expected) if entry is not None])
+
+    def test_append_and_get(self):
+        self.assertMatches(self.store, self.entries)
+        self.assertEqual(self.store[-1], self.entries[-1])
+        self.store.append(("词", "ci", "7", "c"))
+        self.assertEqual(self.store[len(self.entries)], ("词", "ci", "7", "c"))
+
+    def test_set_and_delete(self):
+        expected = list(self.entries)
+        rng = random.Random(2)
+        replacements = list(entries_with_odd_weights(2000, seed=3))
+        for i, entry in enumerate(replacements):
+            entry_id = rng.randrange(len(expected))
+            if i % 3 == 0:
+                entry = None
+            self.store[entry_id] = entry
+            expected[entry_id] = entry
+        self.store[-1] = None
+        expected[-1] = None
+        self.assertMatches(self.store, expected)
+        for entry_id, entry in enumerate(expected):
+            self.assertEqual(self.store.is_deleted(entry_id), entry is None)
+            if entry is not None:
+                self.assertEqual(self.store.word(entry_id), entry[0])
+                self.assertEqual(self.store.code(entry_id), entry[1])
+
+    def test_copy_is_snapshot(self):
+        self.store[0] = None
+        expected = [None] + self.entries[1:]
+        snapshot = self.store.copy()
+        self.store[1] = ("改", "gai", "0100", "g")
+        self.store[2] = None
+        self.store.append(("新", "xin", "1", ""))
+        self.assertMatches(snapshot, expected)
+        self.assertEqual(self.store[1], ("改", "gai", "0100", "g"))
+        self.assertEqual(len(self.store), len(expected) + 1)
+
+    def test_ids_with_code(self):
+        self.store[0] = None
+        expected = [i for i, entry in enumerate(self.entries) if i and "zh" in entry[1]]
+        self.assertEqual(self.store.ids_with_code(lambda code: "zh" in code), expected)
+        self.assertEqual(self.store.ids_with_code(lambda code: False), [])
+
+    def test_canonical_weight(self):
+        self.assertEqual(canonical_weight("0"), 0)
+        self.assertEqual(canonical_weight("100"), 100)
+        self.assertEqual(canonical_weight("-5"), -5)
+        for weight in ODD_WEIGHTS:
+            self.assertIsNone(canonical_weight(weight), weight)
+
+
+if __name__ == "__main__":
+    unittest.main()